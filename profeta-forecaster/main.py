@@ -118,7 +118,16 @@ async def generate_forecast(request: ForecastRequest):
             analysis_id=request.analysis_id,
             forecast_days=request.forecast_days,
             by_product=request.by_product,
-            by_category=request.by_category
+            by_category=request.by_category,
+            feature_set=request.feature_set,
+            xgboost_mode=request.xgboost_mode,
+            xgboost_strategy=request.xgboost_strategy,
+            fit_profile=request.fit_profile,
+            prophet_granularity=request.prophet_granularity,
+            prophet_hierarchy=request.prophet_hierarchy,
+            hierarchy_top_n=request.hierarchy_top_n,
+            prophet_lite_mode=request.prophet_lite_mode,
+            forecast_cascade=request.forecast_cascade,
         )
         
         logger.info(f"✅ Forecast gerado com sucesso!")
@@ -2,11 +2,13 @@
 Prophet Forecaster - Core forecasting logic
 """
 
+import math
+import time
 import pandas as pd
 import numpy as np
-from prophet import Prophet
 from calendar import monthrange
 from collections import defaultdict
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -24,8 +26,23 @@ from schemas.forecast import (
     CategoryForecast,
     ForecastResponse
 )
+from services.calendar_features import BrazilianCalendar
+from services.cpu_budget import cpu_budget
+from services.executor_backend import (
+    SharedFrames,
+    backtest_prophet,
+    create_executor,
+    executor_mode,
+    fit_prophet_forecast,
+    train_xgboost_product,
+)
 from services.feature_engineer import FeatureEngineer
+from services.fit_profiles import FitProfile, get_fit_profile, series_frequency
+from services.baselines import BaselineResult, baseline_forecaster
+from services.intermittent import intermittent_forecaster
 from services.model_router import model_router
+from services.prophet_lite import prophet_lite
+from services.series_profiles import SeriesProfile, profile_frame, profile_series, series_profiles, stack_series
 
 # suppress_stdout_stderr removido: causava "I/O operation on closed file" com ThreadPoolExecutor
 # (race condition ao redirecionar sys.stdout/stderr em múltiplas threads)
@@ -102,6 +119,22 @@ def calculate_forecast_metrics(actual: pd.Series, predicted: pd.Series) -> dict:
         }
 
 
+@dataclass
+class CategoryFits:
+    """Fits Prophet das categorias: produtos, séries agregadas, forecasts e backtests por categoria."""
+    categories: Dict[str, List[Dict]] = field(default_factory=dict)
+    aggregated: Dict[str, pd.DataFrame] = field(default_factory=dict)
+    fits: Dict[str, pd.DataFrame] = field(default_factory=dict)
+    backtests: Dict[str, pd.DataFrame] = field(default_factory=dict)
+
+
+@dataclass
+class BaselineCascade:
+    """Baselines de todas as séries e os produtos escalados para XGBoost/Prophet."""
+    results: Dict[str, BaselineResult] = field(default_factory=dict)
+    escalated: set = field(default_factory=set)
+
+
 class ProphetForecaster:
     """Classe para forecasting com Prophet"""
     
@@ -121,7 +154,16 @@ class ProphetForecaster:
         analysis_id: str,
         forecast_days: List[int] = [30, 60, 90],
         by_product: bool = True,
-        by_category: bool = True
+        by_category: bool = True,
+        feature_set: str = "full",
+        xgboost_mode: str = "per_product",
+        xgboost_strategy: str = "recursive",
+        fit_profile: str = "balanced",
+        prophet_granularity: str = "daily",
+        prophet_hierarchy: str = "independent",
+        hierarchy_top_n: int = 20,
+        prophet_lite_mode: str = "off",
+        forecast_cascade: bool = False,
     ) -> ForecastResponse:
         """
         Gera forecast para uma análise
@@ -131,18 +173,45 @@ class ProphetForecaster:
             forecast_days: Lista de horizontes (ex: [30, 60, 90])
             by_product: Forecast por produto
             by_category: Forecast por categoria
+            feature_set: Conjunto de features do XGBoost ('full' ou 'lean')
+            xgboost_mode: 'per_product' (um modelo por produto) ou 'global' (um modelo para todos)
+            xgboost_strategy: 'recursive' (realimenta os lags) ou 'direct' (multi-horizonte)
+            fit_profile: 'fast', 'balanced' ou 'accurate' (services.fit_profiles)
+            prophet_granularity: 'daily', 'weekly' (ajuste semanal + desagregação por dia
+                da semana) ou 'auto' (semanal só em históricos diários de 3+ anos)
+            prophet_hierarchy: 'independent' (um Prophet por produto) ou 'top_down' (Prophet
+                nas categorias e nos hierarchy_top_n produtos de maior volume; os demais
+                recebem o forecast da categoria × participação histórica)
+            hierarchy_top_n: Produtos ajustados individualmente no modo 'top_down'
+            prophet_lite_mode: 'off', 'candidate' (Prophet-lite em lote como terceiro modelo
+                do router) ou 'replace' (Prophet-lite no lugar do Prophet/Stan)
+            forecast_cascade: Avalia baselines vetorizados (sazonal ingênuo, média móvel, SES)
+                em todas as séries primeiro; features, XGBoost e Prophet só para os produtos
+                em que os baselines falham (MAPE) ou de alto volume
         
         Returns:
             ForecastResponse com previsões
         """
-        import time
-        
         # ===== TIMING: FORECAST TOTAL START =====
         forecast_total_start = time.time()
+        profile = get_fit_profile(fit_profile).with_env_overrides()
         
         logger.info("=" * 60)
         logger.info("PROPHET FORECAST - INICIANDO")
         logger.info("=" * 60)
+        logger.info(f"🎚️ Perfil de ajuste: {profile.name}")
+        if prophet_granularity not in self.PROPHET_GRANULARITIES:
+            raise ValueError(
+                f"prophet_granularity inválido: {prophet_granularity} (opções: {self.PROPHET_GRANULARITIES})"
+            )
+        if prophet_hierarchy not in self.PROPHET_HIERARCHIES:
+            raise ValueError(
+                f"prophet_hierarchy inválido: {prophet_hierarchy} (opções: {self.PROPHET_HIERARCHIES})"
+            )
+        if prophet_lite_mode not in self.PROPHET_LITE_MODES:
+            raise ValueError(
+                f"prophet_lite_mode inválido: {prophet_lite_mode} (opções: {self.PROPHET_LITE_MODES})"
+            )
         logger.info(f"📊 Buscando produtos para análise {analysis_id}")
 
         # ===== TIMING: FETCH PRODUTOS START =====
@@ -160,12 +229,14 @@ class ProphetForecaster:
         # Tentar buscar dados reais primeiro
         sales_df = self._fetch_sales_history(product_ids)
 
+        # Perfil de cada série em um único groupby: validação, plano de modelos e clamps
+        profile_table = profile_series(sales_df, key_column="product_id")
         if sales_df.empty:
             logger.warning("⚠️  Sem dados reais em sales_history, usando sintético como fallback")
             historical_data = self._generate_synthetic_data(products)
             use_synthetic = True
         else:
-            historical_data = self._sales_to_historical_dict(sales_df, product_ids)
+            historical_data = self._sales_to_historical_dict(sales_df, product_ids, profile_table)
             if not historical_data:
                 logger.warning("⚠️  Nenhum produto com dados válidos, usando sintético como fallback")
                 historical_data = self._generate_synthetic_data(products)
@@ -174,29 +245,33 @@ class ProphetForecaster:
                 logger.info("✅ Usando dados REAIS do sales_history")
                 use_synthetic = False
 
+        if use_synthetic:
+            profile_table = profile_series(stack_series(historical_data))
+        profile_table = profile_table[profile_table.index.isin(list(historical_data))]
+        product_profiles = series_profiles(profile_table)
+
         logger.info(f"Linhas de histórico (agregado): {sum(len(df) for df in historical_data.values())}")
         if historical_data:
             all_ds = pd.concat([df["ds"] for df in historical_data.values()])
             logger.info(f"Período: {all_ds.min()} a {all_ds.max()}")
         logger.info(f"Usando dados sintéticos: {use_synthetic}")
         logger.info("=" * 60)
-        
-        # ============================================
-        # DECISÃO: USAR PROPHET OU APENAS XGBOOST?
-        # ============================================
-        # Avaliar qualidade dos dados para decidir se roda Prophet
-        sample_df = list(historical_data.values())[0] if historical_data else pd.DataFrame()
-        prophet_decision = self._should_use_prophet(sample_df)
-        
-        logger.info("=" * 60)
-        logger.info("[Prophet Toggle] Avaliando dados...")
-        logger.info(f"[Prophet Toggle] {prophet_decision['reason']}")
-        if prophet_decision['use_prophet']:
-            logger.info(f"[Prophet Toggle] ✅ Prophet ATIVADO ({prophet_decision['data_points']} pontos {prophet_decision['data_frequency']})")
-        else:
-            logger.info(f"[Prophet Toggle] ⏭️ Prophet DESATIVADO — apenas XGBoost será usado")
-        logger.info("=" * 60)
 
+        # Cascata: baselines em lote para todos; modelos caros só para os escalados
+        cascade = self._run_baseline_cascade(products, historical_data, forecast_days, profile) if forecast_cascade else None
+
+        # Plano por produto (perfil vetorizado das séries): só os modelos escolhidos são agendados
+        model_plan, cascade = self._plan_product_models(
+            products, historical_data, forecast_days, profile, cascade, profile_table
+        )
+        prophet_ids = set(model_plan.index[model_plan["prophet"]])
+        xgboost_ids = set(model_plan.index[model_plan["xgboost"]])
+        model_products = [p for p in products if p["id"] in xgboost_ids]
+
+        # Calendário BR (feriados móveis + datas comerciais) calculado uma vez para toda a execução:
+        # histórico completo + horizonte, compartilhado por features XGBoost e holidays do Prophet
+        calendar = BrazilianCalendar.for_series(historical_data, horizon_days=max(forecast_days))
+        
         # ============================================
         # FASE 2: Feature Engineering
         # ============================================
@@ -206,11 +281,10 @@ class ProphetForecaster:
         if not use_synthetic and not sales_df.empty:
             logger.info("🔧 Calculando features para XGBoost...")
 
-            from services.feature_engineer import FeatureEngineer
-            feature_engineer = FeatureEngineer()
+            feature_engineer = FeatureEngineer(calendar=calendar)
             feature_store_records = []
 
-            for product in products:
+            for product in model_products:
                 try:
                     # Filtrar histórico deste produto
                     product_sales = sales_df[sales_df["product_id"] == product["id"]].copy()
@@ -224,7 +298,9 @@ class ProphetForecaster:
                     df_features = product_sales[["ds", "y"]].copy()
 
                     # Calcular features
-                    features_df = feature_engineer.calculate_features(df_features, product)
+                    features_df = feature_engineer.calculate_features(
+                        df_features, product, feature_set=feature_set
+                    )
 
                     if len(features_df) > 0:
                         # Preparar para inserir no DB
@@ -276,120 +352,222 @@ class ProphetForecaster:
         # ============================================
         # ===== TIMING: XGBOOST START =====
         xgb_start = time.time()
+        xgb_registry_stats = None
         
         if not use_synthetic and not sales_df.empty and by_product:
-            logger.info("🤖 Treinando modelos XGBoost por produto (PARALELO)...")
+            logger.info(f"🤖 Treinando modelos XGBoost (modo {xgboost_mode}, estratégia {xgboost_strategy}, PARALELO)...")
 
             from services.xgboost_service import XGBoostForecaster
-            xgb_forecaster = XGBoostForecaster()
-            
-            # Função isolada para treinar um produto (roda em paralelo)
-            def train_single_product_xgboost(product: Dict) -> Optional[Dict]:
+
+            # Orçamento de CPU: no modo por produto, workers × nthread = CPUs;
+            # no modo global, um único modelo usa todas as CPUs
+            total_products = len(model_products)
+            if xgboost_mode == "global":
+                xgb_plan = None
+                xgb_forecaster = XGBoostForecaster(
+                    feature_set=feature_set,
+                    nthread=cpu_budget.cpus,
+                    strategy=xgboost_strategy,
+                    **profile.xgboost_settings,
+                )
+            else:
+                xgb_plan = cpu_budget.plan("xgboost", total_products)
+                xgb_forecaster = XGBoostForecaster(
+                    feature_set=feature_set,
+                    nthread=xgb_plan.threads_per_worker,
+                    strategy=xgboost_strategy,
+                    **profile.xgboost_settings,
+                )
+
+            def load_product_features(product: Dict) -> Optional[pd.DataFrame]:
                 """
-                Treina XGBoost para um único produto.
-                Retorna resultado ou None se falhar/pular.
+                Busca as features de um produto no feature_store e junta o target 'y'.
+                Retorna None se não houver dados suficientes.
                 """
-                try:
-                    product_id = str(product["id"])
-                    product_name = product.get("cleaned_name", product.get("original_name", product_id))
-                    
-                    # Buscar features deste produto
-                    features_query = (
-                        self.supabase.table("feature_store")
-                        .select("*")
-                        .eq("product_id", product_id)
-                        .order("feature_date", desc=False)
-                        .execute()
-                    )
+                product_id = str(product["id"])
+                product_name = product.get("cleaned_name", product.get("original_name", product_id))
+
+                # Buscar features deste produto
+                features_query = (
+                    self.supabase.table("feature_store")
+                    .select("*")
+                    .eq("product_id", product_id)
+                    .order("feature_date", desc=False)
+                    .execute()
+                )
 
-                    if not features_query.data or len(features_query.data) < 6:
-                        logger.warning(
-                            f"⏭️ XGBoost pulado para {product_name}: poucos dados ({len(features_query.data) if features_query.data else 0} pontos)"
-                        )
-                        return None
+                if not features_query.data or len(features_query.data) < 6:
+                    logger.warning(
+                        f"⏭️ XGBoost pulado para {product_name}: poucos dados ({len(features_query.data) if features_query.data else 0} pontos)"
+                    )
+                    return None
 
-                    # Converter para DataFrame
-                    features_df = pd.DataFrame(features_query.data)
-                    features_df["ds"] = pd.to_datetime(features_df["feature_date"])
+                # Converter para DataFrame
+                features_df = pd.DataFrame(features_query.data)
+                features_df["ds"] = pd.to_datetime(features_df["feature_date"])
+
+                # Buscar vendas reais para 'y' (na mesma granularidade das features)
+                product_sales = sales_df[sales_df["product_id"] == product["id"]].copy()
+                product_sales = feature_engineer.resample_to_modeling_frequency(product_sales[["ds", "y"]])
+
+                # Merge features com vendas reais
+                features_df = features_df.merge(
+                    product_sales[["ds", "y"]],
+                    on="ds",
+                    how="left",
+                )
 
-                    # Buscar vendas reais para 'y'
-                    product_sales = sales_df[sales_df["product_id"] == product["id"]].copy()
-                    product_sales = product_sales.sort_values("ds")
+                # Remover NaN em y
+                features_df = features_df.dropna(subset=["y"])
 
-                    # Merge features com vendas reais
-                    features_df = features_df.merge(
-                        product_sales[["ds", "y"]],
-                        on="ds",
-                        how="left",
+                if len(features_df) < 6:
+                    logger.warning(
+                        f"⏭️ XGBoost pulado para {product_name}: dados insuficientes após merge"
                     )
+                    return None
 
-                    # Remover NaN em y
-                    features_df = features_df.dropna(subset=["y"])
+                return features_df
 
-                    if len(features_df) < 6:
-                        logger.warning(
-                            f"⏭️ XGBoost pulado para {product_name}: dados insuficientes após merge"
-                        )
-                        return None
+            xgb_settings = {
+                "feature_set": feature_set,
+                "engine": xgb_forecaster.engine,
+                "nthread": xgb_forecaster.params["n_jobs"],
+                "strategy": xgb_forecaster.strategy,
+                **profile.xgboost_settings,
+            }
 
-                    # Preparar dados
-                    X, y = xgb_forecaster.prepare_training_data(features_df)
+            def product_xgboost_result(product: Dict, trained: Dict) -> Dict:
+                """Resultado de train_xgboost_product com identificação do produto."""
+                product_id = str(product["id"])
+                product_name = product.get("cleaned_name", product.get("original_name", product_id))
+                mape_str = f"{trained['mape']:.1f}%" if trained["mape"] is not None else "N/A"
+                logger.info(f"✅ XGBoost para {product_name}: MAPE={mape_str}, MAE={trained['mae']:.1f}" if trained["mae"] is not None else f"✅ XGBoost para {product_name}: MAPE={mape_str}")
+                return {"product_id": product_id, "product_name": product_name, **trained}
 
-                    # Treinar modelo
-                    result = xgb_forecaster.train_model(X, y, validate=True)
+            # Função isolada para treinar um produto (roda em paralelo)
+            def train_single_product_xgboost(product: Dict) -> Optional[Dict]:
+                """
+                Treina XGBoost para um único produto.
+                Retorna resultado ou None se falhar/pular.
+                """
+                try:
+                    features_df = load_product_features(product)
+                    if features_df is None:
+                        return None
 
-                    # Gerar previsões
-                    forecast = xgb_forecaster.predict(
-                        result["model"],
-                        features_df,
-                        n_periods=3,  # 30, 60, 90 dias (3 meses)
+                    # Preparar, treinar e prever (30, 60, 90 dias = 3 meses)
+                    trained = train_xgboost_product(
+                        features_df, xgb_settings, n_periods=3, product_id=str(product["id"])
                     )
-
-                    mape_str = f"{result['mape']:.1f}%" if result["mape"] is not None else "N/A"
-                    logger.info(f"✅ XGBoost para {product_name}: MAPE={mape_str}, MAE={result['mae']:.1f}" if result["mae"] is not None else f"✅ XGBoost para {product_name}: MAPE={mape_str}")
-
-                    return {
-                        "product_id": product_id,
-                        "product_name": product_name,
-                        "mape": result["mape"],
-                        "mae": result["mae"],
-                        "forecast": forecast.to_dict("records"),
-                        "feature_importance": result["feature_importance"],
-                        "training_samples": len(X),
-                    }
+                    return product_xgboost_result(product, trained)
 
                 except Exception as e:
                     logger.error(f"❌ Erro XGBoost para produto {product.get('id', 'unknown')}: {e}")
                     import traceback
                     logger.error(traceback.format_exc())
                     return None
-            
-            # Paralelizar com ThreadPoolExecutor (mesmo padrão do Prophet)
-            total_products = len(products)
-            max_workers = min(8, total_products)
-            logger.info(f"⚡ Usando {max_workers} workers paralelos para XGBoost")
-            
+
+            def safe_load_product_features(product: Dict) -> Optional[pd.DataFrame]:
+                try:
+                    return load_product_features(product)
+                except Exception as e:
+                    logger.error(f"❌ Erro ao carregar features do produto {product.get('id', 'unknown')}: {e}")
+                    return None
+
+            def load_all_product_features() -> Dict[str, pd.DataFrame]:
+                """Carrega as features de todos os produtos (I/O em paralelo)."""
+                features_by_product: Dict[str, pd.DataFrame] = {}
+                with ThreadPoolExecutor(max_workers=cpu_budget.io_workers(total_products)) as executor:
+                    future_to_product = {
+                        executor.submit(safe_load_product_features, product): product
+                        for product in model_products
+                    }
+                    for future in as_completed(future_to_product):
+                        product = future_to_product[future]
+                        features_df = future.result()
+                        if features_df is not None:
+                            features_by_product[str(product["id"])] = features_df
+                return features_by_product
+
             xgboost_results = []
             completed = 0
-            
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_product = {
-                    executor.submit(train_single_product_xgboost, product): product
-                    for product in products
-                }
-                
-                for future in as_completed(future_to_product):
-                    product = future_to_product[future]
-                    completed += 1
+
+            if xgboost_mode == "global":
+                # Modo global: carregar features de todos os produtos e treinar UM modelo
+                # para a análise inteira
+                features_by_product = load_all_product_features()
+
+                if features_by_product:
                     try:
-                        result = future.result()
-                        if result is not None:
-                            xgboost_results.append(result)
-                            logger.info(f"  ✓ [{completed}/{total_products}] {result['product_name']}: XGBoost concluído")
-                        else:
-                            logger.debug(f"  ⏭️ [{completed}/{total_products}] {product.get('cleaned_name', product['id'])}: pulado")
+                        categories = {
+                            str(p["id"]): p.get("refined_category", "Sem Categoria") for p in products
+                        }
+                        global_result = xgb_forecaster.train_global_model(features_by_product, categories)
+                        global_forecasts = xgb_forecaster.predict_global(
+                            global_result, features_by_product, categories, n_periods=3
+                        )
+                        for product in products:
+                            product_id = str(product["id"])
+                            if product_id not in global_forecasts:
+                                continue
+                            product_metrics = global_result["product_metrics"][product_id]
+                            xgboost_results.append({
+                                "product_id": product_id,
+                                "product_name": product.get("cleaned_name", product.get("original_name", product_id)),
+                                "mape": product_metrics["mape"],
+                                "mae": product_metrics["mae"],
+                                "forecast": global_forecasts[product_id].to_dict("records"),
+                                "feature_importance": global_result["feature_importance"],
+                                "training_samples": product_metrics["training_samples"],
+                            })
+                        logger.info(f"✅ XGBoost global: {len(xgboost_results)} produtos com um único modelo")
                     except Exception as e:
-                        logger.warning(f"  ✗ [{completed}/{total_products}] {product.get('id', 'unknown')}: {e}")
+                        logger.error(f"❌ Erro no XGBoost global: {e}")
+                        import traceback
+                        logger.error(traceback.format_exc())
+            elif executor_mode() == "process":
+                # Modo processo: features carregadas no processo principal (I/O) e enviadas
+                # aos workers por memória compartilhada
+                features_by_product = load_all_product_features()
+                products_by_id = {str(p["id"]): p for p in products}
+                pool_start = time.time()
+                with SharedFrames(features_by_product) as shared, create_executor(xgb_plan) as executor:
+                    future_to_product = {
+                        executor.submit(train_xgboost_product, shared.ref(product_id), xgb_settings, 3, product_id): products_by_id[product_id]
+                        for product_id in features_by_product
+                    }
+                    for future in as_completed(future_to_product):
+                        product = future_to_product[future]
+                        completed += 1
+                        try:
+                            result = product_xgboost_result(product, future.result())
+                            xgboost_results.append(result)
+                            logger.info(f"  ✓ [{completed}/{len(future_to_product)}] {result['product_name']}: XGBoost concluído")
+                        except Exception as e:
+                            logger.warning(f"  ✗ [{completed}/{len(future_to_product)}] {product.get('id', 'unknown')}: {e}")
+                cpu_budget.record(xgb_plan, len(future_to_product), time.time() - pool_start)
+            else:
+                # Paralelizar com ThreadPoolExecutor (mesmo padrão do Prophet)
+                pool_start = time.time()
+                with create_executor(xgb_plan, "thread") as executor:
+                    future_to_product = {
+                        executor.submit(train_single_product_xgboost, product): product
+                        for product in model_products
+                    }
+
+                    for future in as_completed(future_to_product):
+                        product = future_to_product[future]
+                        completed += 1
+                        try:
+                            result = future.result()
+                            if result is not None:
+                                xgboost_results.append(result)
+                                logger.info(f"  ✓ [{completed}/{total_products}] {result['product_name']}: XGBoost concluído")
+                            else:
+                                logger.debug(f"  ⏭️ [{completed}/{total_products}] {product.get('cleaned_name', product['id'])}: pulado")
+                        except Exception as e:
+                            logger.warning(f"  ✗ [{completed}/{total_products}] {product.get('id', 'unknown')}: {e}")
+                cpu_budget.record(xgb_plan, total_products, time.time() - pool_start)
 
             # Salvar previsões XGBoost no banco
             if xgboost_results:
@@ -453,7 +631,14 @@ class ProphetForecaster:
                             "mae": float(res["mae"]) if res["mae"] is not None else None,
                             "feature_importance": convert_to_native(res["feature_importance"]),
                             "training_samples": int(res.get("training_samples", 0)),
-                            "hyperparameters": convert_to_native(xgb_forecaster.params),
+                            "hyperparameters": convert_to_native({
+                                **xgb_forecaster.params,
+                                "n_estimators": res.get("n_estimators", xgb_forecaster.params["n_estimators"]),
+                                "mode": xgboost_mode,
+                                "strategy": xgboost_strategy,
+                                "engine": xgb_forecaster.engine,
+                                "profile": profile.name,
+                            }),
                         })
 
                     self.supabase.table("model_metadata").upsert(
@@ -470,9 +655,27 @@ class ProphetForecaster:
             else:
                 logger.warning("⚠️ Nenhum modelo XGBoost treinado")
 
+            # Registro de modelos: quantos produtos reaproveitaram o modelo salvo
+            registry_status = [res.get("registry") for res in xgboost_results if res.get("registry")]
+            if registry_status:
+                hits = registry_status.count("hit")
+                extended = registry_status.count("extend")
+                xgb_registry_stats = {
+                    "lookups": len(registry_status),
+                    "hits": hits,
+                    "extended": extended,
+                    "trained": registry_status.count("miss"),
+                    "hit_ratio": round(hits / len(registry_status), 3),
+                    "reuse_ratio": round((hits + extended) / len(registry_status), 3),
+                }
+                logger.info(
+                    f"♻️ Registro XGBoost: {hits} hits, {extended} estendidos, "
+                    f"{xgb_registry_stats['trained']} treinados (hit ratio {xgb_registry_stats['hit_ratio']:.0%})"
+                )
+
             # ===== TIMING: XGBOOST END =====
             xgb_sec = time.time() - xgb_start
-            logger.info(f"✅ XGBoost forecasting concluído ({xgb_sec:.2f}s)")
+            logger.info(f"✅ XGBoost forecasting concluído (modo {xgboost_mode}, estratégia {xgboost_strategy}, {xgb_sec:.2f}s)")
         else:
             xgb_sec = time.time() - xgb_start
             logger.info(f"⏭️ XGBoost omitido ({xgb_sec:.2f}s)")
@@ -487,39 +690,66 @@ class ProphetForecaster:
         prophet_start = time.time()
         prophet_product_sec = 0
         prophet_category_sec = 0
+
+        # Top-down: categorias ajustadas uma vez, antes dos produtos (que alocam a partir delas)
+        category_fits = None
+        if prophet_hierarchy == "top_down" and by_product and prophet_ids:
+            prophet_category_start = time.time()
+            category_fits = self._fit_categories(
+                products, historical_data, forecast_days, calendar, profile, prophet_granularity, prophet_lite_mode
+            )
+            prophet_category_sec = time.time() - prophet_category_start
         
-        # Forecast por produto (condicional baseado na decisão)
-        if by_product and prophet_decision['use_prophet']:
-            logger.info("🔮 Gerando forecast por produto (Prophet)...")
+        # Forecast por produto: Prophet (+ XGBoost) nos planejados para Prophet, baselines
+        # nos resolvidos pela cascata e apenas XGBoost nos demais
+        if by_product:
+            response.product_forecasts = []
+        baseline_ids = set(cascade.results) - cascade.escalated if cascade else set()
+        prophet_products = [p for p in products if p["id"] in prophet_ids or p["id"] in baseline_ids]
+        if by_product and prophet_products:
+            logger.info(f"🔮 Gerando forecast por produto (Prophet: {len(prophet_ids)}, baselines: {len(baseline_ids)})...")
             prophet_product_start = time.time()
             response.product_forecasts = self._forecast_by_product(
-                products,
+                prophet_products,
                 historical_data,
                 forecast_days,
+                calendar,
+                profile,
+                prophet_granularity,
+                category_fits,
+                hierarchy_top_n,
+                prophet_lite_mode,
+                cascade,
+                product_profiles,
             )
             prophet_product_sec = time.time() - prophet_product_start
-        elif by_product:
-            logger.info(f"⏭️ Prophet PULADO para produtos — {prophet_decision['reason']}")
-            # Gerar forecast APENAS com XGBoost (sem rodar Prophet)
-            response.product_forecasts = self._forecast_by_product_xgboost_only(
-                products,
+        xgboost_only_products = [p for p in model_products if p["id"] not in prophet_ids]
+        if by_product and xgboost_only_products:
+            logger.info(f"⏭️ Prophet PULADO para {len(xgboost_only_products)} produtos — apenas XGBoost (plano por série)")
+            response.product_forecasts += self._forecast_by_product_xgboost_only(
+                xgboost_only_products,
                 historical_data,
                 forecast_days,
             )
         
         # Forecast por categoria (condicional baseado na decisão)
         xgb_category_sec = 0
-        if by_category and prophet_decision['use_prophet']:
+        if by_category and prophet_ids:
             logger.info("🔮 Gerando forecast por categoria (Prophet)...")
             prophet_category_start = time.time()
             response.category_forecasts = self._forecast_by_category(
                 products,
                 historical_data,
-                forecast_days
+                forecast_days,
+                calendar,
+                profile,
+                prophet_granularity,
+                category_fits,
+                prophet_lite_mode,
             )
-            prophet_category_sec = time.time() - prophet_category_start
+            prophet_category_sec += time.time() - prophet_category_start
         elif by_category:
-            logger.info(f"⏭️ Prophet PULADO para categorias — {prophet_decision['reason']}")
+            logger.info("⏭️ Prophet PULADO para categorias — nenhum produto planejado para Prophet")
             logger.info("🏷️ Gerando categorias via XGBoost agregado (Prophet desativado)...")
             xgb_category_start = time.time()
             # Agregar forecasts dos produtos por categoria
@@ -540,6 +770,8 @@ class ProphetForecaster:
             "forecast_horizons": forecast_days,
             "generated_at": datetime.now().isoformat()
         }
+        if xgb_registry_stats:
+            response.stats["xgboost_registry"] = xgb_registry_stats
         
         # ===== TIMING: FORECAST TOTAL END =====
         forecast_total_sec = time.time() - forecast_total_start
@@ -548,16 +780,18 @@ class ProphetForecaster:
         logger.info("=" * 60)
         logger.info("[Forecast] TIMING SUMMARY")
         
-        if prophet_decision['use_prophet']:
+        if prophet_ids:
             logger.info(f"[Forecast] Total: {forecast_total_sec:.1f}s | FE: {fe_sec:.1f}s | XGB: {xgb_sec:.1f}s | Prophet: {prophet_sec:.1f}s")
             if prophet_product_sec > 0:
-                logger.info(f"[Forecast] Prophet produtos: {prophet_product_sec:.1f}s | {len(products)} produtos | {prophet_product_sec/max(1, len(products)):.2f}s/produto")
+                logger.info(f"[Forecast] Prophet produtos: {prophet_product_sec:.1f}s | {len(prophet_ids)} produtos | {prophet_product_sec/max(1, len(prophet_ids)):.2f}s/produto")
+            if xgboost_only_products:
+                logger.info(f"[Forecast] {len(xgboost_only_products)} produtos apenas com XGBoost (plano por série)")
             if prophet_category_sec > 0:
                 logger.info(f"[Forecast] Prophet categorias (PARALELO): {prophet_category_sec:.1f}s")
         else:
             logger.info(f"[Forecast] Total: {forecast_total_sec:.1f}s | FE: {fe_sec:.1f}s | XGB: {xgb_sec:.1f}s | XGB Cat: {xgb_category_sec:.1f}s | Prophet: DESATIVADO")
-            logger.info(f"[Forecast] Motivo: {prophet_decision['reason']}")
-            logger.info(f"[Forecast] {len(products)} produtos processados apenas com XGBoost")
+            logger.info("[Forecast] Motivo: nenhuma série adequada ao Prophet (plano por série)")
+            logger.info(f"[Forecast] {len(model_products)} produtos processados apenas com XGBoost")
             if xgb_category_sec > 0:
                 logger.info(f"[Forecast] Categorias XGBoost agregadas: {xgb_category_sec:.1f}s | {len(response.category_forecasts or [])} categorias")
         
@@ -781,10 +1015,28 @@ class ProphetForecaster:
         products: List[Dict],
         historical_data: Dict[str, pd.DataFrame],
         forecast_days: List[int],
+        calendar: BrazilianCalendar,
+        profile: Optional[FitProfile] = None,
+        granularity: str = "daily",
+        category_fits: Optional[CategoryFits] = None,
+        top_n: int = 20,
+        lite_mode: str = "off",
+        cascade: Optional[BaselineCascade] = None,
+        product_profiles: Optional[Dict[str, SeriesProfile]] = None,
     ) -> List[ProductForecast]:
         """
         Gera forecast para cada produto em paralelo usando ThreadPoolExecutor.
         Threads compartilham memória e funcionam bem com Prophet/Stan.
+        Feriados vêm do calendário compartilhado da execução.
+        Com granularity 'weekly'/'auto', séries diárias são ajustadas por semana e
+        desagregadas pelo perfil de dia da semana da categoria.
+        Com category_fits (modo top-down), só os top_n produtos de maior volume são
+        ajustados; os demais recebem o forecast da categoria × participação histórica.
+        Com lite_mode 'candidate', o Prophet-lite (em lote) entra no router como terceiro
+        modelo; com 'replace', substitui o Prophet/Stan (nenhum fit do Stan).
+        Com cascade, só os produtos escalados vão para Prophet/Prophet-lite; o baseline
+        de cada produto também é candidato no router (e o único nos não escalados).
+        product_profiles (calculados uma vez na execução) alimentam clamps e validações.
         """
         max_days = max(forecast_days)
         tasks = []
@@ -796,7 +1048,8 @@ class ProphetForecaster:
                 )
                 continue
             df = historical_data[product_id]
-            if len(df) < self.MIN_POINTS:
+            # Séries curtas só seguem com o resultado da cascata (baseline/intermitente)
+            if len(df) < self.MIN_POINTS and (cascade is None or product_id not in cascade.results):
                 logger.warning(
                     f"⚠️  Pulando {product.get('cleaned_name', product['original_name'])}: poucos dados ({len(df)} pontos)"
                 )
@@ -807,69 +1060,77 @@ class ProphetForecaster:
             return []
 
         total = len(tasks)
-        max_workers = min(8, total)
         logger.info(f"🔮 Gerando forecast para {total} produtos (PARALELO)...")
-        logger.info(f"⚡ Usando {max_workers} workers paralelos")
-
-        def train_one(product: Dict, df: pd.DataFrame, max_d: int) -> Tuple[str, Optional[pd.DataFrame]]:
-            """Treina Prophet para um produto (roda em thread). Retorna (product_id, forecast_result) ou (product_id, None)."""
-            # Silenciar warnings verbosos do Stan e Prophet
-            import logging
-            logging.getLogger("cmdstanpy").setLevel(logging.ERROR)
-            logging.getLogger("prophet").setLevel(logging.ERROR)
-            product_id = product["id"]
-            try:
-                model = Prophet(
-                    yearly_seasonality=True,
-                    weekly_seasonality=True,
-                    daily_seasonality=False,
-                    interval_width=0.8,
-                    changepoint_prior_scale=0.05,
-                    seasonality_prior_scale=10.0,
-                )
-                try:
-                    model.add_country_holidays(country_name="BR")
-                except Exception:
-                    pass
-                # Treinar modelo (warnings do Stan podem aparecer nos logs)
-                model.fit(df)
-                future = model.make_future_dataframe(periods=max_d)
-                forecast_result = model.predict(future)
-                return (product_id, forecast_result)
-            except Exception as e:
-                logger.error(f"Erro ao treinar produto {product_id}: {e}")
-                return (product_id, None)
 
-        results_by_id: Dict[str, Tuple[pd.DataFrame, pd.DataFrame]] = {}
-        completed = 0
+        names = {product["id"]: product.get("cleaned_name", product["original_name"]) for product, _, _ in tasks}
+        series = {product["id"]: df for product, df, _ in tasks}
+        category_of = {product["id"]: product.get("refined_category", "Sem Categoria") for product, _, _ in tasks}
+        if cascade is not None:
+            series = {product_id: df for product_id, df in series.items() if product_id in cascade.escalated}
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_product = {
-                executor.submit(train_one, product, df, max_days): product
-                for product, df, max_days in tasks
+        lite_fits, lite_backtests = {}, {}
+        if lite_mode != "off":
+            lite_fits, lite_backtests = self._run_prophet_lite(
+                "prophet_lite_products", series, max_days, calendar, profile
+            )
+        if lite_mode == "replace":
+            series = {}
+
+        # Top-down: Prophet só nos top_n por volume (e onde a categoria não tem fit)
+        allocated_fits, allocated_backtests = {}, {}
+        if category_fits is not None and series:
+            by_volume = sorted(series, key=lambda product_id: series[product_id]["y"].sum(), reverse=True)
+            fitted_ids = set(by_volume[:top_n]) | {
+                product_id for product_id in series if category_of[product_id] not in category_fits.fits
             }
-            for future in as_completed(future_to_product):
-                product = future_to_product[future]
-                product_id = product["id"]
-                completed += 1
-                try:
-                    pid, forecast_result = future.result()
-                    if forecast_result is not None:
-                        results_by_id[product_id] = (forecast_result, historical_data[product_id])
-                        logger.info(
-                            f"  ✓ [{completed}/{total}] {product.get('cleaned_name', product['original_name'])}: forecast gerado"
-                        )
-                    else:
-                        logger.warning(f"  ✗ [{completed}/{total}] {product_id}: pulado (dados insuficientes ou erro)")
-                except Exception as e:
-                    logger.warning(f"  ✗ [{completed}/{total}] {product_id}: {e}")
+            allocated_fits, allocated_backtests = self._allocate_top_down(
+                [product_id for product_id in series if product_id not in fitted_ids],
+                category_of,
+                historical_data,
+                category_fits,
+            )
+            series = {product_id: df for product_id, df in series.items() if product_id not in allocated_fits}
+            logger.info(
+                f"🌳 Hierarquia top-down: {len(series)} produtos ajustados + {len(category_fits.fits)} categorias "
+                f"(Prophet) | {len(allocated_fits)} alocados pela participação na categoria"
+            )
+
+        weekly_keys = self._weekly_candidates(series, granularity)
+        weekly_profiles = {}
+        if weekly_keys:
+            dow_profiles = self._category_day_of_week_profiles(products, historical_data)
+            weekly_profiles = {key: dow_profiles[category_of[key]] for key in weekly_keys}
+
+        fits, backtests = self._run_prophet_pool(
+            "prophet_products",
+            series,
+            max_days,
+            calendar,
+            names,
+            profile=profile,
+            weekly_profiles=weekly_profiles,
+        ) if series else ({}, {})
+        fits.update(allocated_fits)
+        backtests.update(allocated_backtests)
 
         forecasts = []
         for product in products:
             product_id = product["id"]
-            if product_id not in results_by_id:
+            baseline = cascade.results.get(product_id) if cascade is not None else None
+            if product_id not in fits and product_id not in lite_fits and baseline is None:
                 continue
-            forecast_result, df = results_by_id[product_id]
+            df = historical_data[product_id]
+            series_profile = (product_profiles or {}).get(product_id) or profile_frame(df)
+            fit = fits.get(product_id)
+            lite_fit = lite_fits.get(product_id)
+            baseline_only = cascade is not None and product_id not in cascade.escalated
+            # Métricas e componentes: Prophet/Stan, Prophet-lite (quando substitui) ou baseline
+            if fit is not None:
+                forecast_result, main_backtest = fit, backtests.get(product_id)
+            elif lite_fit is not None:
+                forecast_result, main_backtest = lite_fit, lite_backtests.get(product_id)
+            else:
+                forecast_result, main_backtest = baseline.forecast, baseline.backtest
             product_name = product.get("cleaned_name", product["original_name"])
             category = product.get("refined_category", "Sem Categoria")
             historical = [
@@ -879,16 +1140,43 @@ class ProphetForecaster:
                 )
                 for _, row in df.tail(30).iterrows()
             ]
-            prophet_30d = self._extract_forecast_period(forecast_result, df, 30)
-            prophet_60d = self._extract_forecast_period(forecast_result, df, 60)
-            prophet_90d = self._extract_forecast_period(forecast_result, df, 90)
-            metrics = self._calculate_metrics(df, forecast_result, product)
+            prophet_30d, prophet_60d, prophet_90d = (
+                [self._extract_forecast_period(fit, df, days) for days in (30, 60, 90)] if fit is not None else ([], [], [])
+            )
+            lite_30d, lite_60d, lite_90d = (
+                [self._extract_forecast_period(lite_fit, df, days) for days in (30, 60, 90)]
+                if lite_fit is not None
+                else ([], [], [])
+            )
+            baseline_30d, baseline_60d, baseline_90d = (
+                [self._extract_forecast_period(baseline.forecast, df, days) for days in (30, 60, 90)]
+                if baseline is not None
+                else ([], [], [])
+            )
+            metrics = self._calculate_metrics(df, forecast_result, product, calendar, main_backtest)
+            lite_backtest = lite_backtests.get(product_id)
+            lite_accuracy = (
+                calculate_forecast_metrics(lite_backtest["y"], lite_backtest["yhat"])
+                if lite_backtest is not None
+                else {}
+            )
+            lite_mape = lite_accuracy.get("mape")
+            baseline_accuracy = (
+                calculate_forecast_metrics(baseline.backtest["y"], baseline.backtest["yhat"])
+                if baseline is not None and baseline.backtest is not None
+                else {}
+            )
+            baseline_mape = baseline_accuracy.get("mape")
 
             # Model Router: escolher melhor modelo por horizonte (XGBoost, Prophet ou Ensemble)
             product_id_str = str(product_id)
-            xgb_raw = self._fetch_xgboost_forecasts(product_id_str)
-            xgb_metrics = self._fetch_xgboost_metrics(product_id_str)
-            if not xgb_raw:
+            # Não escalados não treinaram XGBoost nesta execução (linhas antigas não valem)
+            xgb_raw = self._fetch_xgboost_forecasts(product_id_str) if not baseline_only else []
+            xgb_metrics = self._fetch_xgboost_metrics(product_id_str) if not baseline_only else None
+            if baseline_only:
+                engine = baseline.forecast.attrs.get("engine", "baseline")
+                logger.info(f"  [{product_name}] resolvido pelo {engine} ({baseline.method}, MAPE {baseline_mape})")
+            elif not xgb_raw:
                 logger.info(
                     f"  [{product_name}] sem dados XGBoost no forecasts_xgboost - usando Prophet"
                 )
@@ -916,15 +1204,18 @@ class ProphetForecaster:
             if prophet_90d:
                 prophet_90d_mean = sum(p.predicted_quantity for p in prophet_90d) / len(prophet_90d)
                 logger.info(f"  [{product_name}] Prophet 90d média: {prophet_90d_mean:.1f}")
+            if lite_90d:
+                lite_90d_mean = sum(p.predicted_quantity for p in lite_90d) / len(lite_90d)
+                logger.info(f"  [{product_name}] Prophet-lite 90d média: {lite_90d_mean:.1f} (MAPE {lite_mape})")
             if xgb_90d:
                 xgb_90d_mean = sum(p.get("predicted_quantity", 0) for p in xgb_90d) / len(xgb_90d)
                 logger.info(f"  [{product_name}] XGBoost 90d média: {xgb_90d_mean:.1f}")
 
-            prophet_mape = metrics.mape
+            prophet_mape = metrics.mape if fit is not None else None
             xgb_mape = xgb_metrics.get("mape") if xgb_metrics else None
 
             # Sinalizar se dados são mensais para _select_best_forecast
-            self._current_df_is_monthly = self._is_historical_monthly(df)
+            self._current_df_is_monthly = self._is_historical_monthly(series_profile)
 
             forecast_30d_final = self._select_best_forecast(
                 prophet_forecast=to_dict_list(prophet_30d),
@@ -933,6 +1224,10 @@ class ProphetForecaster:
                 xgboost_mape=xgb_mape,
                 horizon=30,
                 product_name=product_name,
+                lite_forecast=to_dict_list(lite_30d),
+                lite_mape=lite_mape,
+                baseline_forecast=to_dict_list(baseline_30d),
+                baseline_mape=baseline_mape,
             )
             forecast_60d_final = self._select_best_forecast(
                 prophet_forecast=to_dict_list(prophet_60d),
@@ -941,6 +1236,10 @@ class ProphetForecaster:
                 xgboost_mape=xgb_mape,
                 horizon=60,
                 product_name=product_name,
+                lite_forecast=to_dict_list(lite_60d),
+                lite_mape=lite_mape,
+                baseline_forecast=to_dict_list(baseline_60d),
+                baseline_mape=baseline_mape,
             )
             forecast_90d_final = self._select_best_forecast(
                 prophet_forecast=to_dict_list(prophet_90d),
@@ -949,38 +1248,39 @@ class ProphetForecaster:
                 xgboost_mape=xgb_mape,
                 horizon=90,
                 product_name=product_name,
+                lite_forecast=to_dict_list(lite_90d),
+                lite_mape=lite_mape,
+                baseline_forecast=to_dict_list(baseline_90d),
+                baseline_mape=baseline_mape,
             )
 
-            historical_mean = (
-                sum(h.quantity for h in historical) / len(historical) if historical else 0.0
-            )
             forecast_30d_final = self._validate_forecast_values(
-                forecast_30d_final, xgb_30d, product_name, 30, historical_mean
+                forecast_30d_final, xgb_30d, product_name, 30, series_profile
             )
             forecast_60d_final = self._validate_forecast_values(
-                forecast_60d_final, xgb_60d, product_name, 60, historical_mean
+                forecast_60d_final, xgb_60d, product_name, 60, series_profile
             )
             forecast_90d_final = self._validate_forecast_values(
-                forecast_90d_final, xgb_90d, product_name, 90, historical_mean
+                forecast_90d_final, xgb_90d, product_name, 90, series_profile
             )
 
             self._current_df_is_monthly = False
 
             # === CLAMP: limitar previsões diárias antes de agregar ===
-            forecast_30d_final = self._clamp_daily_forecasts(forecast_30d_final, df)
-            forecast_60d_final = self._clamp_daily_forecasts(forecast_60d_final, df)
-            forecast_90d_final = self._clamp_daily_forecasts(forecast_90d_final, df)
+            forecast_30d_final = self._clamp_daily_forecasts(forecast_30d_final, series_profile)
+            forecast_60d_final = self._clamp_daily_forecasts(forecast_60d_final, series_profile)
+            forecast_90d_final = self._clamp_daily_forecasts(forecast_90d_final, series_profile)
 
             # Se dados históricos são mensais, agregar previsões diárias em mensais (mesma escala no gráfico)
-            if self._is_historical_monthly(df):
+            if self._is_historical_monthly(series_profile):
                 forecast_30d_final = self._aggregate_daily_to_monthly(forecast_30d_final)
                 forecast_60d_final = self._aggregate_daily_to_monthly(forecast_60d_final)
                 forecast_90d_final = self._aggregate_daily_to_monthly(forecast_90d_final)
 
                 # === CLAMP MENSAL: rede de segurança pós-agregação ===
-                forecast_30d_final = self._clamp_monthly_forecasts(forecast_30d_final, df)
-                forecast_60d_final = self._clamp_monthly_forecasts(forecast_60d_final, df)
-                forecast_90d_final = self._clamp_monthly_forecasts(forecast_90d_final, df)
+                forecast_30d_final = self._clamp_monthly_forecasts(forecast_30d_final, series_profile)
+                forecast_60d_final = self._clamp_monthly_forecasts(forecast_60d_final, series_profile)
+                forecast_90d_final = self._clamp_monthly_forecasts(forecast_90d_final, series_profile)
                 logger.info(
                     f"  [{product_name}] Previsões agregadas para mensal (mesma escala que histórico)"
                 )
@@ -989,17 +1289,17 @@ class ProphetForecaster:
             forecast_30d_for_product = (
                 to_forecast_data_points(forecast_30d_final)
                 if forecast_30d_final
-                else prophet_30d
+                else prophet_30d or lite_30d or baseline_30d
             )
             forecast_60d_for_product = (
                 to_forecast_data_points(forecast_60d_final)
                 if forecast_60d_final
-                else prophet_60d
+                else prophet_60d or lite_60d or baseline_60d
             )
             forecast_90d_for_product = (
                 to_forecast_data_points(forecast_90d_final)
                 if forecast_90d_final
-                else prophet_90d
+                else prophet_90d or lite_90d or baseline_90d
             )
 
             # Atualizar metrics com MAPE do modelo escolhido (30d) para refletir no dashboard
@@ -1008,6 +1308,8 @@ class ProphetForecaster:
                 prophet_mape=prophet_mape,
                 time_horizon=30,
                 context="forecast",
+                prophet_lite_mape=lite_mape,
+                baseline_mape=baseline_mape,
             )
             if selection_30d.model == "xgboost" and xgb_metrics and xgb_metrics.get("mape") is not None:
                 metrics = ForecastMetrics(
@@ -1019,13 +1321,34 @@ class ProphetForecaster:
                     accuracy_level=metrics.accuracy_level,
                     sample_size=metrics.sample_size,
                 )
-            elif selection_30d.model == "ensemble" and xgb_metrics and xgb_metrics.get("mape") is not None and prophet_mape is not None:
+            elif selection_30d.model == "baseline" and not baseline_only:
+                metrics = ForecastMetrics(
+                    mape=baseline_mape,
+                    rmse=metrics.rmse,
+                    mae=baseline_accuracy.get("mae"),
+                    trend=metrics.trend,
+                    seasonality_strength=metrics.seasonality_strength,
+                    accuracy_level=baseline_accuracy.get("accuracy_level"),
+                    sample_size=baseline_accuracy.get("sample_size"),
+                )
+            elif selection_30d.model == "prophet_lite" and fit is not None:
+                metrics = ForecastMetrics(
+                    mape=lite_mape,
+                    rmse=metrics.rmse,
+                    mae=lite_accuracy.get("mae"),
+                    trend=metrics.trend,
+                    seasonality_strength=metrics.seasonality_strength,
+                    accuracy_level=lite_accuracy.get("accuracy_level"),
+                    sample_size=lite_accuracy.get("sample_size"),
+                )
+            elif selection_30d.model == "ensemble" and xgb_metrics and xgb_metrics.get("mape") is not None and (prophet_mape is not None or lite_mape is not None):
                 w = selection_30d.weights or {"xgboost": 0.5, "prophet": 0.5}
+                seasonal = "prophet_lite" if "prophet_lite" in w else "prophet"
                 xgb_w = w.get("xgboost", 0.5)
-                prophet_w = w.get("prophet", 0.5)
+                prophet_w = w.get(seasonal, 0.5)
                 ensemble_mape = (
                     (xgb_metrics.get("mape") or 0) * xgb_w
-                    + (prophet_mape or 0) * prophet_w
+                    + ((lite_mape if seasonal == "prophet_lite" else prophet_mape) or 0) * prophet_w
                 )
                 metrics = ForecastMetrics(
                     mape=round(ensemble_mape, 2),
@@ -1081,7 +1404,6 @@ class ProphetForecaster:
         Usado quando Prophet está desativado (dados mensais/esparsos).
         Mais rápido e consistente: soma dos produtos = forecast da categoria.
         """
-        import time
         cat_start = time.time()
         
         logger.info("🏷️ Gerando forecast por categoria (XGBoost agregado)...")
@@ -1198,122 +1520,490 @@ class ProphetForecaster:
         
         return category_forecasts
 
-    def _forecast_single_category(
+    def _run_prophet_pool(
         self,
-        category: str,
-        cat_products: List[Dict],
-        historical_data: Dict[str, pd.DataFrame],
-        forecast_days: List[int]
-    ) -> Optional[CategoryForecast]:
+        section: str,
+        series: Dict[str, pd.DataFrame],
+        periods: int,
+        calendar: BrazilianCalendar,
+        names: Dict[str, str],
+        warm_keys: Optional[Dict[str, str]] = None,
+        profile: Optional[FitProfile] = None,
+        weekly_profiles: Optional[Dict[str, np.ndarray]] = None,
+    ) -> Tuple[Dict[str, pd.DataFrame], Dict[str, pd.DataFrame]]:
         """
-        Gera forecast para UMA categoria (para rodar em paralelo via ThreadPoolExecutor).
+        Ajusta Prophet (forecast) e o modelo de backtest de cada série no mesmo pool.
+
+        Os backtests são tarefas independentes do ajuste principal: rodam em paralelo
+        com os outros fits em vez de em série depois, na montagem dos resultados.
+
+        Args:
+            section: Seção do orçamento de CPU ('prophet_products', 'prophet_categories')
+            series: {chave: DataFrame ds, y}
+            periods: Dias previstos à frente
+            calendar: Calendário compartilhado (holidays do Prophet)
+            names: {chave: nome} para os logs
+            warm_keys: {chave: identidade estável da série} para warm start do Stan
+                (None = a própria chave)
+            profile: Perfil de ajuste (None = 'balanced' com overrides do ambiente)
+            weekly_profiles: {chave: participação por dia da semana} das séries diárias
+                ajustadas por semana; forecast e backtest voltam desagregados por dia
+
+        Returns:
+            ({chave: forecast}, {chave: previsões do backtest (ds, y, yhat)})
         """
-        # Silenciar warnings do Prophet/Stan
-        import logging
-        logging.getLogger("cmdstanpy").setLevel(logging.ERROR)
-        logging.getLogger("prophet").setLevel(logging.ERROR)
-        
-        try:
-            # Agregar dados históricos
-            aggregated_df = self._aggregate_historical_data(
-                cat_products,
-                historical_data
+        # Séries semanais agregadas (só com semanas completas suficientes)
+        model_series = dict(series)
+        weekly_profiles = dict(weekly_profiles or {})
+        for key in list(weekly_profiles):
+            weekly_df = self._weekly_series(series[key])
+            if len(weekly_df) >= self.MIN_POINTS:
+                model_series[key] = weekly_df
+            else:
+                del weekly_profiles[key]
+        if weekly_profiles:
+            logger.info(
+                f"📅 [{section}] {len(weekly_profiles)}/{len(series)} séries ajustadas por semana "
+                f"(desagregação pelo perfil de dia da semana)"
             )
-            
-            if aggregated_df.empty:
-                return None
+        weekly_periods = math.ceil(periods / 7) + 2  # + semana parcial do fim do histórico
+
+        backtest_keys = [key for key, df in model_series.items() if len(df) >= self.MIN_POINTS_FOR_BACKTESTING]
+        total = len(series)
+        n_tasks = total + len(backtest_keys)
+        # Cada fit do Prophet roda um processo cmdstan: um worker por CPU disponível
+        plan = cpu_budget.plan(section, n_tasks)
+        mode = executor_mode()
+        profile = profile or get_fit_profile().with_env_overrides()
+        warm_keys = warm_keys or {key: key for key in series}
+
+        fits: Dict[str, pd.DataFrame] = {}
+        backtests: Dict[str, pd.DataFrame] = {}
+        completed = 0
+        pool_start = time.time()
 
-            if len(aggregated_df) < self.MIN_POINTS:
-                logger.warning(
-                    f"  ⚠️  Categoria {category}: poucos dados agregados ({len(aggregated_df)} pontos, mínimo {self.MIN_POINTS}), pulando"
-                )
-                return None
+        # Modo processo: séries vão aos workers por memória compartilhada
+        shared = SharedFrames(model_series) if mode == "process" else None
+        try:
+            with create_executor(plan, mode) as executor:
+                def source(key):
+                    return shared.ref(key) if shared else model_series[key]
+
+                future_to_task = {
+                    executor.submit(
+                        fit_prophet_forecast,
+                        source(key),
+                        weekly_periods if key in weekly_profiles else periods,
+                        calendar.prophet_holidays(),
+                        profile,
+                        warm_keys[key],
+                        "W-MON" if key in weekly_profiles else "D",
+                    ): (key, "fit")
+                    for key in model_series
+                }
+                future_to_task.update({
+                    executor.submit(
+                        backtest_prophet,
+                        source(key),
+                        self._backtest_validation_size(len(model_series[key])),
+                        calendar.prophet_holidays(),
+                        profile,
+                        warm_keys[key],
+                    ): (key, "backtest")
+                    for key in backtest_keys
+                })
+
+                for future in as_completed(future_to_task):
+                    key, kind = future_to_task[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if kind == "fit":
+                            completed += 1
+                            logger.error(f"Erro ao treinar {key}: {e}")
+                            logger.warning(f"  ✗ [{completed}/{total}] {key}: pulado (dados insuficientes ou erro)")
+                        else:
+                            logger.warning(f"  ⚠️ Backtest de {names.get(key, key)} falhou: {e}")
+                        continue
+
+                    if kind == "backtest":
+                        backtests[key] = result
+                        continue
+                    completed += 1
+                    fits[key] = result
+                    stats = result.attrs
+                    fit_info = (
+                        "modelo do cache"
+                        if stats.get("cache") == "hit"
+                        else f"fit {'warm ' if stats.get('warm_start') else ''}{stats.get('fit_seconds', 0):.2f}s"
+                    )
+                    logger.info(
+                        f"  ✓ [{completed}/{total}] {names.get(key, key)}: forecast gerado "
+                        f"({stats.get('frequency')}, {stats.get('n_params')} parâmetros: "
+                        f"{stats.get('n_regressors')} sazonais/feriados + {stats.get('n_changepoints')} changepoints; {fit_info})"
+                    )
+        finally:
+            if shared:
+                shared.close()
+        cpu_budget.record(plan, n_tasks, time.time() - pool_start)
+
+        cache_hits = sum(1 for forecast in fits.values() if forecast.attrs.get("cache") == "hit")
+        if cache_hits:
+            logger.info(f"♻️ [{section}] Cache Prophet: {cache_hits}/{len(fits)} modelos reaproveitados (sem fit)")
+
+        # Previsões semanais → diárias (o pós-processamento trabalha com a série diária)
+        for key, dow_profile in weekly_profiles.items():
+            if key in fits:
+                fits[key] = self._disaggregate_weekly(fits[key], dow_profile)
+            if key in backtests:
+                daily_pred = self._disaggregate_weekly(backtests[key][["ds", "yhat"]], dow_profile)
+                backtests[key] = series[key][["ds", "y"]].merge(daily_pred, on="ds", how="inner")
+
+        return fits, backtests
+
+    def _run_prophet_lite(
+        self,
+        section: str,
+        series: Dict[str, pd.DataFrame],
+        periods: int,
+        calendar: BrazilianCalendar,
+        profile: Optional[FitProfile] = None,
+    ) -> Tuple[Dict[str, pd.DataFrame], Dict[str, pd.DataFrame]]:
+        """
+        Forecast e backtest do Prophet-lite para todas as séries, em lote no processo
+        principal (mínimos quadrados com matrizes de design compartilhadas por grade de datas).
 
-            # Treinar Prophet
-            model = Prophet(
-                yearly_seasonality=True,
-                weekly_seasonality=True,
-                daily_seasonality=False,
-                interval_width=0.8,
-                changepoint_prior_scale=0.05,
-                seasonality_prior_scale=10.0,
+        Returns:
+            ({chave: forecast}, {chave: previsões do backtest (ds, y, yhat)}), como _run_prophet_pool
+        """
+        start = time.time()
+        profile = profile or get_fit_profile().with_env_overrides()
+        holidays = calendar.prophet_holidays()
+        fits = prophet_lite.forecast(series, periods, holidays, profile)
+        backtests = prophet_lite.backtest(
+            series,
+            {
+                key: self._backtest_validation_size(len(df))
+                for key, df in series.items()
+                if len(df) >= self.MIN_POINTS_FOR_BACKTESTING
+            },
+            holidays,
+            profile,
+        )
+        logger.info(
+            f"⚡ [{section}] Prophet-lite: {len(fits)} forecasts + {len(backtests)} backtests "
+            f"em {time.time() - start:.2f}s"
+        )
+        return fits, backtests
+
+    def _run_baseline_cascade(
+        self,
+        products: List[Dict],
+        historical_data: Dict[str, pd.DataFrame],
+        forecast_days: List[int],
+        profile: Optional[FitProfile] = None,
+    ) -> BaselineCascade:
+        """
+        Primeiro nível da cascata: baselines em lote para todas as séries e decisão de
+        quais produtos seguem para features, XGBoost e Prophet.
+
+        Escalados: sem MAPE do baseline (histórico curto ou só zeros na validação), MAPE
+        acima de CASCADE_MAPE_THRESHOLD, ou entre os produtos de maior volume que somam
+        CASCADE_VOLUME_SHARE das vendas.
+        """
+        start = time.time()
+        series = {
+            product["id"]: historical_data[product["id"]]
+            for product in products
+            if product["id"] in historical_data and len(historical_data[product["id"]]) >= self.MIN_POINTS
+        }
+        results = self._baseline_results(series, forecast_days, profile)
+
+        volumes = pd.Series({key: float(df["y"].sum()) for key, df in series.items()}).sort_values(ascending=False)
+        share_before = volumes.cumsum().shift(fill_value=0) / max(volumes.sum(), 1e-9)
+        high_volume = set(share_before[share_before < self.CASCADE_VOLUME_SHARE].index)
+        inaccurate = {
+            key for key, result in results.items()
+            if result.mape is None or result.mape > self.CASCADE_MAPE_THRESHOLD
+        }
+        # Produtos fora dos baselines (histórico curto) seguem o fluxo normal
+        escalated = high_volume | inaccurate | {p["id"] for p in products if p["id"] not in results}
+
+        methods = pd.Series([result.method for result in results.values()]).value_counts().to_dict()
+        logger.info(
+            f"🪜 Cascata: baselines para {len(results)} séries em {time.time() - start:.2f}s {methods} | "
+            f"{len(products) - len(escalated)} resolvidos pelo baseline, {len(escalated)} escalados "
+            f"({len(inaccurate)} MAPE > {self.CASCADE_MAPE_THRESHOLD:.0f}%, {len(high_volume)} alto volume)"
+        )
+        return BaselineCascade(results=results, escalated=escalated)
+
+    def _baseline_results(
+        self,
+        series: Dict[str, pd.DataFrame],
+        forecast_days: List[int],
+        profile: Optional[FitProfile] = None,
+    ) -> Dict[str, BaselineResult]:
+        """Melhor baseline (backtest + forecast) de cada série, em lote."""
+        profile = profile or get_fit_profile().with_env_overrides()
+        return baseline_forecaster.evaluate(
+            series,
+            max(forecast_days),
+            {key: self._backtest_validation_size(len(df)) for key, df in series.items()},
+            profile.uncertainty.interval_width,
+        )
+
+    def _intermittent_results(
+        self,
+        series: Dict[str, pd.DataFrame],
+        forecast_days: List[int],
+        profile: Optional[FitProfile] = None,
+    ) -> Dict[str, BaselineResult]:
+        """Croston/SBA/TSB (o melhor por série) para as séries intermitentes, em lote."""
+        profile = profile or get_fit_profile().with_env_overrides()
+        return intermittent_forecaster.evaluate(
+            series,
+            max(forecast_days),
+            {
+                key: self._backtest_validation_size((df["ds"].max() - df["ds"].min()).days + 1)
+                for key, df in series.items()
+            },
+            profile.uncertainty.interval_width,
+        )
+
+    def _plan_product_models(
+        self,
+        products: List[Dict],
+        historical_data: Dict[str, pd.DataFrame],
+        forecast_days: List[int],
+        profile: Optional[FitProfile] = None,
+        cascade: Optional[BaselineCascade] = None,
+        profile_table: Optional[pd.DataFrame] = None,
+    ) -> Tuple[pd.DataFrame, Optional[BaselineCascade]]:
+        """
+        Plano de modelos por produto a partir do perfil vetorizado de todas as séries
+        (ModelRouter.plan_models): Prophet só em séries diárias/semanais longas e não
+        intermitentes, XGBoost onde há meses suficientes para as features, Croston/SBA/TSB
+        nas esparsas ou com muitos zeros.
+
+        Produtos resolvidos pela cascata não recebem modelos; os intermitentes ficam com o
+        motor intermitente e os que nenhum modelo atende, com o baseline.
+        profile_table (profile_series) evita reperfilar as séries quando já calculada.
+
+        Returns:
+            (plano indexado pelo id do produto, cascata atualizada)
+        """
+        start = time.time()
+        series = {p["id"]: historical_data[p["id"]] for p in products if p["id"] in historical_data}
+        if profile_table is None:
+            profile_table = profile_series(stack_series(series))
+        plan = model_router.plan_models(profile_table.loc[list(series)])
+
+        if cascade is not None:
+            resolved = ~plan.index.isin(list(cascade.escalated))
+            plan.loc[resolved, ["prophet", "xgboost"]] = False
+            plan.loc[resolved, "est_seconds"] = 0.0
+            plan.loc[resolved & ~plan["intermittent"], "reason"] = "Resolvido pelo baseline"
+
+        # Sem modelo planejado: motor intermitente ou baseline (caminho dos não escalados)
+        unplanned = set(plan.index[~(plan["prophet"] | plan["xgboost"])])
+        intermittent = set(plan.index[plan["intermittent"]])
+        if unplanned:
+            cascade = cascade or BaselineCascade(escalated=set(plan.index))
+            cascade.escalated -= unplanned
+            baseline_series = {
+                key: series[key]
+                for key in unplanned - intermittent - set(cascade.results)
+                if len(series[key]) >= self.MIN_POINTS
+            }
+            cascade.results.update(self._baseline_results(baseline_series, forecast_days, profile))
+            cascade.results.update(
+                self._intermittent_results({key: series[key] for key in intermittent}, forecast_days, profile)
             )
-            try:
-                model.add_country_holidays(country_name="BR")
-            except Exception:
-                pass
 
-            model.fit(aggregated_df)
-            
-            # Gerar forecasts
-            max_days = max(forecast_days)
-            future = model.make_future_dataframe(periods=max_days)
-            forecast_result = model.predict(future)
-            
-            # Extrair dados
-            historical = [
-                HistoricalDataPoint(
-                    date=row['ds'].isoformat(),
-                    quantity=float(row['y'])
-                )
-                for _, row in aggregated_df.tail(30).iterrows()
-            ]
-            
-            forecast_30d = self._extract_forecast_period(forecast_result, aggregated_df, 30)
-            forecast_60d = self._extract_forecast_period(forecast_result, aggregated_df, 60)
-            forecast_90d = self._extract_forecast_period(forecast_result, aggregated_df, 90)
+        n_prophet = int(plan["prophet"].sum())
+        n_xgboost_only = int((plan["xgboost"] & ~plan["prophet"]).sum())
+        full_cost = len(plan) * (
+            2 * model_router.task_seconds("prophet_products") + model_router.task_seconds("xgboost")
+        )
+        logger.info(
+            f"🧭 Plano de modelos ({time.time() - start:.2f}s): {n_prophet} Prophet + XGBoost, "
+            f"{n_xgboost_only} só XGBoost, {len(intermittent)} intermitentes (Croston/SBA/TSB), "
+            f"{len(unplanned - intermittent)} sem modelo (baseline) | custo estimado "
+            f"{plan['est_seconds'].sum():.1f}s de CPU (vs {full_cost:.1f}s com Prophet + XGBoost em todos)"
+        )
+        logger.info(f"🧭 Motivos: {plan['reason'].value_counts().head(5).to_dict()}")
+        return plan, cascade
 
-            def _to_dict_list_fc(pts):
-                return [
-                    {"date": p.date, "predicted_quantity": p.predicted_quantity, "lower_bound": p.lower_bound, "upper_bound": p.upper_bound}
-                    for p in pts
-                ]
+    def _weekly_candidates(self, series: Dict[str, pd.DataFrame], granularity: str) -> List[str]:
+        """Chaves ajustadas por semana: séries diárias ('weekly') ou só as longas ('auto')."""
+        if granularity == "daily":
+            return []
+        keys = []
+        for key, df in series.items():
+            if series_frequency(df["ds"]) != "daily":
+                continue
+            span_days = (df["ds"].max() - df["ds"].min()).days
+            if granularity == "auto" and span_days < self.WEEKLY_AGGREGATION_MIN_DAYS:
+                continue
+            keys.append(key)
+        return keys
 
-            # === CLAMP diário antes de agregar ===
-            forecast_30d_dict = self._clamp_daily_forecasts(_to_dict_list_fc(forecast_30d), aggregated_df)
-            forecast_60d_dict = self._clamp_daily_forecasts(_to_dict_list_fc(forecast_60d), aggregated_df)
-            forecast_90d_dict = self._clamp_daily_forecasts(_to_dict_list_fc(forecast_90d), aggregated_df)
-
-            # Se dados agregados são mensais, agregar previsões diárias em mensais
-            if self._is_historical_monthly(aggregated_df):
-                forecast_30d_agg = self._aggregate_daily_to_monthly(forecast_30d_dict)
-                forecast_60d_agg = self._aggregate_daily_to_monthly(forecast_60d_dict)
-                forecast_90d_agg = self._aggregate_daily_to_monthly(forecast_90d_dict)
-
-                # === CLAMP mensal pós-agregação ===
-                forecast_30d_agg = self._clamp_monthly_forecasts(forecast_30d_agg, aggregated_df)
-                forecast_60d_agg = self._clamp_monthly_forecasts(forecast_60d_agg, aggregated_df)
-                forecast_90d_agg = self._clamp_monthly_forecasts(forecast_90d_agg, aggregated_df)
-
-                forecast_30d = [ForecastDataPoint(**d) for d in forecast_30d_agg]
-                forecast_60d = [ForecastDataPoint(**d) for d in forecast_60d_agg]
-                forecast_90d = [ForecastDataPoint(**d) for d in forecast_90d_agg]
-                logger.debug(f"  [{category}] Previsões agregadas para mensal (categoria)")
-            
-            # Calcular métricas
-            metrics = self._calculate_metrics(aggregated_df, forecast_result, {"seasonality": "year-round"})
-            
-            return CategoryForecast(
-                category=category,
-                product_count=len(cat_products),
-                historical_data=historical,
-                forecast_30d=forecast_30d,
-                forecast_60d=forecast_60d,
-                forecast_90d=forecast_90d,
-                metrics=metrics
+    def _category_day_of_week_profiles(
+        self,
+        products: List[Dict],
+        historical_data: Dict[str, pd.DataFrame],
+    ) -> Dict[str, np.ndarray]:
+        """
+        Participação de cada dia da semana (seg=0 … dom=6) nas vendas diárias de cada
+        categoria, calculada uma vez por execução. Sem vendas diárias: perfil uniforme.
+        """
+        totals: Dict[str, np.ndarray] = {}
+        for product in products:
+            total = totals.setdefault(product.get("refined_category", "Sem Categoria"), np.zeros(7))
+            df = historical_data.get(product["id"])
+            if df is None or df.empty or series_frequency(df["ds"]) != "daily":
+                continue
+            np.add.at(total, df["ds"].dt.dayofweek.to_numpy(), df["y"].to_numpy(dtype=float))
+
+        return {
+            category: total / total.sum() if total.sum() > 0 else np.full(7, 1 / 7)
+            for category, total in totals.items()
+        }
+
+    @staticmethod
+    def _weekly_series(df: pd.DataFrame) -> pd.DataFrame:
+        """Soma semanal (seg–dom, rotulada pela segunda), só com as semanas completas do histórico."""
+        weekly = df.set_index("ds")["y"].resample("W-MON", label="left", closed="left").sum()
+        complete = (weekly.index >= df["ds"].min()) & (weekly.index + pd.Timedelta(days=6) <= df["ds"].max())
+        return weekly[complete].rename_axis("ds").reset_index()
+
+    @staticmethod
+    def _disaggregate_weekly(weekly: pd.DataFrame, dow_profile: np.ndarray) -> pd.DataFrame:
+        """
+        Expande previsões semanais (ds = segunda) em diárias: yhat pela participação de
+        cada dia da semana; a tendência em partes iguais (1/7). A meia-largura dos
+        intervalos escala por share·√7 (ruído diário independente: a variância da semana
+        é a soma das 7 variâncias diárias).
+        """
+        daily = weekly.loc[weekly.index.repeat(7)].reset_index(drop=True)
+        daily["ds"] = daily["ds"] + pd.to_timedelta(np.tile(np.arange(7), len(weekly)), unit="D")
+        share = dow_profile[daily["ds"].dt.dayofweek.to_numpy()]
+        weekly_yhat = daily["yhat"].to_numpy()
+        daily["yhat"] = weekly_yhat * share
+        for column in ("yhat_lower", "yhat_upper"):
+            if column in daily:
+                daily[column] = daily["yhat"] + (daily[column].to_numpy() - weekly_yhat) * share * np.sqrt(7)
+        if "trend" in daily:
+            daily["trend"] = daily["trend"] / 7
+        daily.attrs = dict(weekly.attrs)
+        return daily
+
+    @staticmethod
+    def _backtest_validation_size(n_points: int) -> int:
+        """Backtesting proporcional ao tamanho dos dados (25% ou mínimo 6 pontos)."""
+        return max(6, n_points // 4)
+
+    def _aggregate_category_series(
+        self,
+        category: str,
+        cat_products: List[Dict],
+        historical_data: Dict[str, pd.DataFrame],
+    ) -> Optional[pd.DataFrame]:
+        """Série agregada da categoria (ds, y), ou None se não houver dados suficientes."""
+        aggregated_df = self._aggregate_historical_data(
+            cat_products,
+            historical_data
+        )
+
+        if aggregated_df.empty:
+            return None
+
+        if len(aggregated_df) < self.MIN_POINTS:
+            logger.warning(
+                f"  ⚠️  Categoria {category}: poucos dados agregados ({len(aggregated_df)} pontos, mínimo {self.MIN_POINTS}), pulando"
             )
-        except Exception as e:
-            logger.error(f"  ✗ Erro ao processar categoria {category}: {e}")
             return None
+        return aggregated_df
 
-    def _forecast_by_category(
+    def _category_forecast_from_fit(
+        self,
+        category: str,
+        cat_products: List[Dict],
+        aggregated_df: pd.DataFrame,
+        forecast_result: pd.DataFrame,
+        calendar: BrazilianCalendar,
+        backtest: Optional[pd.DataFrame] = None,
+    ) -> CategoryForecast:
+        """Pós-processamento do forecast de uma categoria (extração, clamps, métricas)."""
+        # Extrair dados
+        historical = [
+            HistoricalDataPoint(
+                date=row['ds'].isoformat(),
+                quantity=float(row['y'])
+            )
+            for _, row in aggregated_df.tail(30).iterrows()
+        ]
+        
+        forecast_30d = self._extract_forecast_period(forecast_result, aggregated_df, 30)
+        forecast_60d = self._extract_forecast_period(forecast_result, aggregated_df, 60)
+        forecast_90d = self._extract_forecast_period(forecast_result, aggregated_df, 90)
+
+        def _to_dict_list_fc(pts):
+            return [
+                {"date": p.date, "predicted_quantity": p.predicted_quantity, "lower_bound": p.lower_bound, "upper_bound": p.upper_bound}
+                for p in pts
+            ]
+
+        # === CLAMP diário antes de agregar ===
+        series_profile = profile_frame(aggregated_df)
+        forecast_30d_dict = self._clamp_daily_forecasts(_to_dict_list_fc(forecast_30d), series_profile)
+        forecast_60d_dict = self._clamp_daily_forecasts(_to_dict_list_fc(forecast_60d), series_profile)
+        forecast_90d_dict = self._clamp_daily_forecasts(_to_dict_list_fc(forecast_90d), series_profile)
+
+        # Se dados agregados são mensais, agregar previsões diárias em mensais
+        if self._is_historical_monthly(series_profile):
+            forecast_30d_agg = self._aggregate_daily_to_monthly(forecast_30d_dict)
+            forecast_60d_agg = self._aggregate_daily_to_monthly(forecast_60d_dict)
+            forecast_90d_agg = self._aggregate_daily_to_monthly(forecast_90d_dict)
+
+            # === CLAMP mensal pós-agregação ===
+            forecast_30d_agg = self._clamp_monthly_forecasts(forecast_30d_agg, series_profile)
+            forecast_60d_agg = self._clamp_monthly_forecasts(forecast_60d_agg, series_profile)
+            forecast_90d_agg = self._clamp_monthly_forecasts(forecast_90d_agg, series_profile)
+
+            forecast_30d = [ForecastDataPoint(**d) for d in forecast_30d_agg]
+            forecast_60d = [ForecastDataPoint(**d) for d in forecast_60d_agg]
+            forecast_90d = [ForecastDataPoint(**d) for d in forecast_90d_agg]
+            logger.debug(f"  [{category}] Previsões agregadas para mensal (categoria)")
+        
+        # Calcular métricas
+        metrics = self._calculate_metrics(
+            aggregated_df, forecast_result, {"seasonality": "year-round"}, calendar, backtest
+        )
+        
+        return CategoryForecast(
+            category=category,
+            product_count=len(cat_products),
+            historical_data=historical,
+            forecast_30d=forecast_30d,
+            forecast_60d=forecast_60d,
+            forecast_90d=forecast_90d,
+            metrics=metrics
+        )
+
+    def _fit_categories(
         self,
         products: List[Dict],
         historical_data: Dict[str, pd.DataFrame],
-        forecast_days: List[int]
-    ) -> List[CategoryForecast]:
+        forecast_days: List[int],
+        calendar: BrazilianCalendar,
+        profile: Optional[FitProfile] = None,
+        granularity: str = "daily",
+        lite_mode: str = "off",
+    ) -> CategoryFits:
         """
-        Gera forecast agregado por categoria (PARALELO com ThreadPoolExecutor)
+        Agrega as séries por categoria e ajusta Prophet (forecast + backtest) em paralelo.
+        Com lite_mode 'replace', as categorias usam o Prophet-lite em lote.
         """
         # Agrupar produtos por categoria
         categories = {}
@@ -1324,49 +2014,133 @@ class ProphetForecaster:
             categories[category].append(product)
         
         if not categories:
-            return []
-        
-        # Paralelizar usando ThreadPoolExecutor (mesmo padrão dos produtos)
-        total_categories = len(categories)
-        max_workers = min(8, total_categories)
-        
-        logger.info(f"🔮 Gerando forecast para {total_categories} categorias (PARALELO)...")
-        logger.info(f"⚡ Usando {max_workers} workers paralelos")
+            return CategoryFits()
         
+        logger.info(f"🔮 Gerando forecast para {len(categories)} categorias (PARALELO)...")
+
+        # Séries agregadas no processo principal; os workers só ajustam o Prophet
+        aggregated = {}
+        for category, cat_products in categories.items():
+            aggregated_df = self._aggregate_category_series(category, cat_products, historical_data)
+            if aggregated_df is not None:
+                aggregated[category] = aggregated_df
+
+        if lite_mode == "replace":
+            fits, backtests = self._run_prophet_lite(
+                "prophet_lite_categories", aggregated, max(forecast_days), calendar, profile
+            )
+            return CategoryFits(categories=categories, aggregated=aggregated, fits=fits, backtests=backtests)
+
+        weekly_keys = self._weekly_candidates(aggregated, granularity)
+        weekly_profiles = {}
+        if weekly_keys:
+            dow_profiles = self._category_day_of_week_profiles(products, historical_data)
+            weekly_profiles = {category: dow_profiles[category] for category in weekly_keys}
+
+        # Paralelizar no mesmo pool dos produtos (fits + backtests)
+        fits, backtests = self._run_prophet_pool(
+            "prophet_categories",
+            aggregated,
+            max(forecast_days),
+            calendar,
+            {category: category for category in aggregated},
+            # Nome da categoria se repete entre análises: identifica pelos produtos
+            {
+                category: f"category:{category}:" + ",".join(sorted(str(p["id"]) for p in categories[category]))
+                for category in aggregated
+            },
+            profile=profile,
+            weekly_profiles=weekly_profiles,
+        ) if aggregated else ({}, {})
+
+        return CategoryFits(categories=categories, aggregated=aggregated, fits=fits, backtests=backtests)
+
+    def _forecast_by_category(
+        self,
+        products: List[Dict],
+        historical_data: Dict[str, pd.DataFrame],
+        forecast_days: List[int],
+        calendar: BrazilianCalendar,
+        profile: Optional[FitProfile] = None,
+        granularity: str = "daily",
+        category_fits: Optional[CategoryFits] = None,
+        lite_mode: str = "off",
+    ) -> List[CategoryForecast]:
+        """
+        Gera forecast agregado por categoria (PARALELO com ThreadPoolExecutor)
+
+        Args:
+            category_fits: Fits já calculados (modo hierárquico top-down); None = ajusta aqui
+        """
+        if category_fits is None:
+            category_fits = self._fit_categories(
+                products, historical_data, forecast_days, calendar, profile, granularity, lite_mode
+            )
+
+        # Pós-processamento (extração, clamps, métricas) com fit e backtest já prontos
         forecasts = []
-        completed = 0
-        
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submeter todas as categorias para processamento paralelo
-            future_to_category = {
-                executor.submit(
-                    self._forecast_single_category,
-                    category,
-                    cat_products,
-                    historical_data,
-                    forecast_days
-                ): category
-                for category, cat_products in categories.items()
-            }
-            
-            # Coletar resultados conforme completam
-            for future in as_completed(future_to_category):
-                category_name = future_to_category[future]
-                completed += 1
-                try:
-                    result = future.result()
-                    if result is not None:
-                        forecasts.append(result)
-                        logger.info(f"  ✓ [{completed}/{total_categories}] {category_name}: forecast gerado")
-                    else:
-                        logger.warning(f"  ✗ [{completed}/{total_categories}] {category_name}: pulado (dados insuficientes)")
-                except Exception as e:
-                    logger.error(f"  ✗ [{completed}/{total_categories}] {category_name}: erro - {str(e)}")
+        for category_name, forecast_result in category_fits.fits.items():
+            try:
+                forecasts.append(
+                    self._category_forecast_from_fit(
+                        category_name,
+                        category_fits.categories[category_name],
+                        category_fits.aggregated[category_name],
+                        forecast_result,
+                        calendar,
+                        category_fits.backtests.get(category_name),
+                    )
+                )
+            except Exception as e:
+                logger.error(f"  ✗ Erro ao processar categoria {category_name}: {e}")
         
-        logger.info(f"✅ Forecast categorias concluído: {len(forecasts)}/{total_categories} categorias processadas")
+        logger.info(
+            f"✅ Forecast categorias concluído: {len(forecasts)}/{len(category_fits.categories)} categorias processadas"
+        )
         
         return forecasts
-    
+
+    def _allocate_top_down(
+        self,
+        product_ids: List[str],
+        category_of: Dict[str, str],
+        historical_data: Dict[str, pd.DataFrame],
+        category_fits: CategoryFits,
+    ) -> Tuple[Dict[str, pd.DataFrame], Dict[str, pd.DataFrame]]:
+        """
+        Forecast top-down: forecast (e backtest) da categoria × participação histórica do
+        produto nas vendas da categoria nos últimos HIERARCHY_SHARE_DAYS dias.
+
+        Returns:
+            ({produto: forecast}, {produto: backtest ds, y, yhat}) dos produtos alocados
+        """
+        fits, backtests = {}, {}
+        for product_id in product_ids:
+            category = category_of[product_id]
+            forecast = category_fits.fits.get(category)
+            if forecast is None:
+                continue
+            aggregated_df = category_fits.aggregated[category]
+            df = historical_data[product_id]
+
+            window_start = aggregated_df["ds"].max() - pd.Timedelta(days=self.HIERARCHY_SHARE_DAYS)
+            category_total = aggregated_df.loc[aggregated_df["ds"] > window_start, "y"].sum()
+            product_total = df.loc[df["ds"] > window_start, "y"].sum()
+            share = float(product_total / category_total) if category_total > 0 else 0.0
+
+            allocated = forecast.copy()
+            for column in ("yhat", "yhat_lower", "yhat_upper", "trend"):
+                allocated[column] = allocated[column] * share
+            allocated.attrs = {**forecast.attrs, "allocation_share": share}
+            fits[product_id] = allocated
+
+            backtest = category_fits.backtests.get(category)
+            if backtest is not None:
+                backtests[product_id] = df[["ds", "y"]].merge(
+                    backtest[["ds"]].assign(yhat=backtest["yhat"] * share), on="ds", how="inner"
+                )
+        return fits, backtests
+
     def _aggregate_historical_data(
         self,
         products: List[Dict],
@@ -1430,9 +2204,17 @@ class ProphetForecaster:
         self,
         historical: pd.DataFrame,
         forecast: pd.DataFrame,
-        product: Dict
+        product: Dict,
+        calendar: BrazilianCalendar,
+        backtest: Optional[pd.DataFrame] = None,
     ) -> ForecastMetrics:
-        """Calcula métricas do forecast"""
+        """
+        Calcula métricas do forecast
+
+        Args:
+            backtest: Previsões de validação (ds, y, yhat) já calculadas no pool;
+                se None e houver pontos suficientes, o backtest é feito aqui
+        """
         # Detectar tendência
         trend_values = forecast["trend"].tail(30).values
         if trend_values[-1] > trend_values[0] * 1.1:
@@ -1452,35 +2234,17 @@ class ProphetForecaster:
             seasonality_strength = 0.2
 
         # Métricas de acurácia via backtesting (ajustado para dados mensais: mínimo 20 pontos)
-        MIN_POINTS_FOR_BACKTESTING = 20  # Aceita dados mensais (ex: 20 meses)
         mape_val, mae_val = None, None
         accuracy_level_val, sample_size_val = None, None
-        if len(historical) >= MIN_POINTS_FOR_BACKTESTING:
-            # Backtesting proporcional ao tamanho dos dados
-            # Para 20 pontos mensais: últimos 6 meses para validação (25% ou mínimo 6)
-            validation_size = max(6, len(historical) // 4)
-            train_df = historical.iloc[:-validation_size].copy()
-            validation_df = historical.iloc[-validation_size:].copy()
-            logger.info(
-                f"📊 Backtesting: {len(train_df)} treino, {len(validation_df)} validação"
-            )
-            validation_model = Prophet(
-                yearly_seasonality=True,
-                weekly_seasonality=len(train_df) >= 14,
-                daily_seasonality=False,
-                changepoint_prior_scale=0.05,
-                seasonality_prior_scale=10.0,
-            )
-            try:
-                validation_model.add_country_holidays(country_name="BR")
-            except Exception:
-                pass
-            validation_model.fit(train_df)
-            future_ds = validation_df[["ds"]].copy()
-            validation_forecast = validation_model.predict(future_ds)
-            validation_actual = validation_df.set_index("ds")["y"]
-            validation_pred = validation_forecast.set_index("ds")["yhat"]
-            acc = calculate_forecast_metrics(validation_actual, validation_pred)
+        if len(historical) >= self.MIN_POINTS_FOR_BACKTESTING:
+            if backtest is None:
+                backtest = backtest_prophet(
+                    historical,
+                    self._backtest_validation_size(len(historical)),
+                    calendar.prophet_holidays(),
+                )
+            validation = backtest.set_index("ds")
+            acc = calculate_forecast_metrics(validation["y"], validation["yhat"])
             mape_val = acc.get("mape")
             mae_val = acc.get("mae")
             accuracy_level_val = acc.get("accuracy_level")
@@ -1778,15 +2542,39 @@ class ProphetForecaster:
         xgboost_mape: Optional[float],
         horizon: int,
         product_name: str = "",
+        lite_forecast: Optional[List[Dict]] = None,
+        lite_mape: Optional[float] = None,
+        baseline_forecast: Optional[List[Dict]] = None,
+        baseline_mape: Optional[float] = None,
     ) -> List[Dict]:
         """
         Usa Model Router para escolher melhor forecast.
         Retorna no formato esperado: [{'date': '...', 'predicted_quantity': N, 'lower_bound': N, 'upper_bound': N}]
         Fallback para XGBoost se Prophet não rodou.
+        Com lite_forecast, o Prophet-lite disputa o papel sazonal com o Prophet (menor MAPE).
+        Com baseline_forecast, o baseline vence quando nenhum modelo tem MAPE menor.
         """
         try:
+            th = 30 if horizon <= 45 else (60 if horizon <= 75 else 90)
+            # Prophet/Stan ausente: o Prophet-lite ocupa o papel sazonal
+            if not prophet_forecast:
+                prophet_mape = None
+            seasonal_forecasts = {"prophet": prophet_forecast, "prophet_lite": lite_forecast or []}
+
+            if baseline_forecast:
+                selection = model_router.select_model(
+                    xgboost_mape if xgboost_forecast else None,
+                    prophet_mape,
+                    th,
+                    prophet_lite_mape=lite_mape,
+                    baseline_mape=baseline_mape,
+                )
+                if selection.model == "baseline" or not (prophet_forecast or lite_forecast or xgboost_forecast):
+                    logger.info(f"  [{product_name}] {horizon}d: Baseline ({selection.reason})")
+                    return baseline_forecast
+
             # Se Prophet não rodou (toggle desativado), usar APENAS XGBoost
-            if not prophet_forecast or len(prophet_forecast) == 0:
+            if not prophet_forecast and not lite_forecast:
                 if xgboost_forecast and len(xgboost_forecast) > 0:
                     logger.debug(f"  [{product_name}] {horizon}d: XGBoost (Prophet não executado)")
                     return self._xgboost_to_prophet_format(xgboost_forecast) if isinstance(xgboost_forecast[0], dict) and 'date' in xgboost_forecast[0] else xgboost_forecast
@@ -1801,38 +2589,44 @@ class ProphetForecaster:
                     logger.info(f"  [{product_name}] Histórico mensal + horizonte {horizon}d → usando só XGBoost")
                     return self._xgboost_to_prophet_format(xgboost_forecast) if isinstance(xgboost_forecast[0], dict) and 'date' in xgboost_forecast[0] else xgboost_forecast
 
-            # Se não tem XGBoost, usar Prophet
+            # Se não tem XGBoost, usar Prophet (ou o Prophet-lite, se mais acurado)
             if not xgboost_forecast or xgboost_mape is None:
-                if prophet_forecast:
-                    logger.debug(f"  [{product_name}] {horizon}d: Prophet (sem XGBoost)")
+                selection = model_router.select_model(None, prophet_mape, th, prophet_lite_mape=lite_mape)
+                if selection.model == "prophet_lite" or not prophet_forecast:
+                    logger.debug(f"  [{product_name}] {horizon}d: Prophet-lite (sem XGBoost)")
+                    return seasonal_forecasts["prophet_lite"]
+                logger.debug(f"  [{product_name}] {horizon}d: Prophet (sem XGBoost)")
                 return prophet_forecast
 
             # Se não tem Prophet (mas passou pela primeira verificação), usar XGBoost
-            if prophet_mape is None:
+            if prophet_mape is None and lite_mape is None:
                 logger.debug(f"  [{product_name}] {horizon}d: XGBoost (Prophet sem métricas)")
                 return self._xgboost_to_prophet_format(xgboost_forecast)
 
             # Usar Model Router (time_horizon deve ser 30, 60 ou 90)
-            th = 30 if horizon <= 45 else (60 if horizon <= 75 else 90)
             selection = model_router.select_model(
                 xgboost_mape=xgboost_mape,
                 prophet_mape=prophet_mape,
                 time_horizon=th,
                 context="forecast",
+                prophet_lite_mape=lite_mape,
             )
 
             if selection.model == "xgboost":
                 logger.info(f"  [{product_name}] {horizon}d: XGBoost ({selection.reason})")
                 return self._xgboost_to_prophet_format(xgboost_forecast)
-            elif selection.model == "prophet":
-                logger.info(f"  [{product_name}] {horizon}d: Prophet ({selection.reason})")
-                return prophet_forecast
+            elif selection.model in seasonal_forecasts:
+                label = "Prophet-lite" if selection.model == "prophet_lite" else "Prophet"
+                logger.info(f"  [{product_name}] {horizon}d: {label} ({selection.reason})")
+                return seasonal_forecasts[selection.model]
             elif selection.model == "ensemble":
                 logger.info(f"  [{product_name}] {horizon}d: Ensemble ({selection.reason})")
+                weights = selection.weights or {"xgboost": 0.5, "prophet": 0.5}
+                seasonal = "prophet_lite" if "prophet_lite" in weights else "prophet"
                 return self._calculate_ensemble(
-                    prophet_forecast,
+                    seasonal_forecasts[seasonal],
                     xgboost_forecast,
-                    selection.weights or {"xgboost": 0.5, "prophet": 0.5},
+                    {"xgboost": weights.get("xgboost", 0.5), "prophet": weights.get(seasonal, 0.5)},
                 )
             else:
                 return prophet_forecast
@@ -1849,12 +2643,16 @@ class ProphetForecaster:
         xgb_data: List[Dict],
         product_name: str,
         horizon: int,
-        historical_mean: float,
+        series_profile: SeriesProfile,
     ) -> List[Dict]:
-        """Se forecast selecionado tem valores ~0 mas XGBoost tem valores razoáveis, usar XGBoost."""
+        """
+        Se forecast selecionado tem valores ~0 (frente à média recente do histórico) mas
+        XGBoost tem valores razoáveis, usar XGBoost.
+        """
         if not forecast_data:
             return xgb_data if xgb_data else forecast_data
 
+        historical_mean = series_profile.recent_mean
         pred_key = "predicted_quantity"
         forecast_mean = (
             sum(p.get(pred_key, 0) for p in forecast_data) / len(forecast_data)
@@ -1880,7 +2678,7 @@ class ProphetForecaster:
     def _clamp_daily_forecasts(
         self,
         daily_forecast: List[Dict],
-        df: pd.DataFrame,
+        series_profile: SeriesProfile,
         max_multiplier: float = 3.0,
     ) -> List[Dict]:
         """
@@ -1888,22 +2686,14 @@ class ProphetForecaster:
         Se histórico é mensal, estima máximo diário = max_mensal / 30.
         Impede que Prophet gere picos absurdos que explodem ao agregar mensalmente.
         """
-        if not daily_forecast or df is None or len(df) < 2:
+        if not daily_forecast or series_profile.n_points < 2:
             return daily_forecast
 
-        hist_values = df["y"].dropna().tolist()
-        if not hist_values or max(hist_values) <= 0:
+        max_hist = series_profile.max_value
+        if not max_hist > 0:
             return daily_forecast
 
-        # Detectar se histórico é mensal ou diário
-        avg_gap = 1
-        if len(df) >= 2:
-            date_range_days = (df["ds"].max() - df["ds"].min()).days
-            avg_gap = date_range_days / max(1, len(df) - 1)
-
-        max_hist = max(hist_values)
-
-        if avg_gap > 20:
+        if series_profile.avg_gap > 20:
             # Histórico mensal → estimar máximo diário
             max_daily = max_hist / 30.0
         else:
@@ -1930,33 +2720,25 @@ class ProphetForecaster:
     def _clamp_monthly_forecasts(
         self,
         monthly_forecast: List[Dict],
-        df: pd.DataFrame,
+        series_profile: SeriesProfile,
         max_multiplier: float = 2.5,
     ) -> List[Dict]:
         """
         Rede de segurança pós-agregação: nenhum mês pode exceder
         max_multiplier * (máximo mensal histórico).
         """
-        if not monthly_forecast or df is None or len(df) < 2:
+        if not monthly_forecast or series_profile.n_points < 2:
             return monthly_forecast
 
-        hist_values = df["y"].dropna().tolist()
-        if not hist_values or max(hist_values) <= 0:
+        if not series_profile.max_value > 0:
             return monthly_forecast
 
-        # Detectar se histórico é mensal ou diário
-        date_range_days = (df["ds"].max() - df["ds"].min()).days
-        avg_gap = date_range_days / max(1, len(df) - 1)
-
-        if avg_gap > 20:
+        if series_profile.avg_gap > 20:
             # Já mensal
-            max_monthly = max(hist_values)
+            max_monthly = series_profile.max_value
         else:
-            # Diário → agrupar por mês e pegar máximo
-            df_copy = df.copy()
-            df_copy["month"] = df_copy["ds"].dt.to_period("M")
-            monthly_sums = df_copy.groupby("month")["y"].sum()
-            max_monthly = monthly_sums.max() if len(monthly_sums) > 0 else max(hist_values)
+            # Diário → máximo das somas por mês
+            max_monthly = series_profile.max_monthly
 
         cap = max_monthly * max_multiplier
 
@@ -1976,87 +2758,19 @@ class ProphetForecaster:
 
         return clamped
 
-    def _should_use_prophet(self, sales_df: pd.DataFrame) -> dict:
-        """
-        Decide se Prophet deve ser executado baseado na qualidade/frequência dos dados.
-        
-        Prophet precisa de:
-        - Dados frequentes (diários ou semanais, não mensais)
-        - Volume mínimo de pontos (>= 90 para capturar sazonalidade)
-        
-        Returns:
-            {
-                'use_prophet': bool,
-                'reason': str,
-                'data_frequency': str,
-                'data_points': int
-            }
-        """
-        if sales_df is None or len(sales_df) == 0:
-            return {
-                'use_prophet': False,
-                'reason': 'Sem dados de vendas',
-                'data_frequency': 'unknown',
-                'data_points': 0
-            }
-        
-        data_points = len(sales_df)
-        
-        # Detectar se dados são mensais
-        if self._is_historical_monthly(sales_df):
-            return {
-                'use_prophet': False,
-                'reason': f'Dados mensais ({data_points} pontos). Prophet otimizado para dados diários. Usando apenas XGBoost.',
-                'data_frequency': 'monthly',
-                'data_points': data_points
-            }
-        
-        # Calcular gap médio entre pontos
-        date_range_days = (sales_df['ds'].max() - sales_df['ds'].min()).days
-        avg_gap = date_range_days / max(1, data_points - 1)
-        
-        if avg_gap <= 2:
-            frequency = 'daily'
-        elif avg_gap <= 10:
-            frequency = 'weekly'
-        else:
-            frequency = 'sparse'
-        
-        # Prophet precisa de >= 90 pontos E dados frequentes para sazonalidade
-        min_points = 90
-        use_prophet = data_points >= min_points and frequency in ('daily', 'weekly')
-        
-        if not use_prophet:
-            reason = f'Dados insuficientes para Prophet ({data_points} pontos {frequency}, mínimo {min_points} diários/semanais). Usando apenas XGBoost.'
-        else:
-            reason = f'Dados adequados para Prophet ({data_points} pontos {frequency}). Rodando Prophet + XGBoost para melhor acurácia.'
-        
-        return {
-            'use_prophet': use_prophet,
-            'reason': reason,
-            'data_frequency': frequency,
-            'data_points': data_points
-        }
-
-    def _is_historical_monthly(self, df: pd.DataFrame) -> bool:
+    def _is_historical_monthly(self, series_profile: SeriesProfile) -> bool:
         """
         Detecta se dados históricos são mensais (poucos pontos, intervalo grande entre datas).
         Usado para agregar previsões diárias em mensais e manter mesma escala no gráfico.
         """
-        if df is None or len(df) < 2:
+        if series_profile.n_points < 2:
             return False
-        date_range_days = (df["ds"].max() - df["ds"].min()).days
-        n_points = len(df)
-        # Média de dias entre pontos consecutivos
-        avg_gap = date_range_days / max(1, n_points - 1)
-        # Se intervalo médio > 25 dias e poucos pontos, tratar como mensal
-        is_monthly = avg_gap > 25 and n_points <= 36
-        if is_monthly:
+        if series_profile.is_monthly:
             logger.debug(
-                f"  Dados históricos detectados como mensais: {n_points} pts, "
-                f"range {date_range_days}d, avg_gap={avg_gap:.0f}d"
+                f"  Dados históricos detectados como mensais: {series_profile.n_points} pts, "
+                f"range {series_profile.span_days}d"
             )
-        return is_monthly
+        return series_profile.is_monthly
 
     def _aggregate_daily_to_monthly(
         self, daily_forecast: List[Dict]
@@ -2182,55 +2896,86 @@ class ProphetForecaster:
     # Constantes de validação (aceitam dados mensais: 12 meses = 1 ano)
     MIN_POINTS = 12  # mínimo de pontos (ex.: 12 meses)
     MIN_DAYS = 180   # range mínimo em dias (~6 meses)
+    MIN_POINTS_FOR_BACKTESTING = 20  # backtesting aceita dados mensais (ex: 20 meses)
+
+    # Séries diárias ajustadas por semana e desagregadas pelo perfil de dia da semana
+    PROPHET_GRANULARITIES = ("daily", "weekly", "auto")
+    WEEKLY_AGGREGATION_MIN_DAYS = 3 * 365  # modo 'auto': só históricos diários de 3+ anos
 
-    def _validate_sales_data(self, df: pd.DataFrame) -> bool:
+    # Modo hierárquico top-down: só as categorias (e os top-N produtos) são ajustados
+    PROPHET_HIERARCHIES = ("independent", "top_down")
+    HIERARCHY_SHARE_DAYS = 90  # janela da participação do produto na categoria
+
+    # Prophet-lite (services.prophet_lite): desligado, candidato no router ou no lugar do Stan
+    PROPHET_LITE_MODES = ("off", "candidate", "replace")
+
+    # Cascata de baselines: escala para os modelos caros quando o melhor baseline tem
+    # MAPE acima do limite ou o produto está entre os que somam essa fração do volume
+    CASCADE_MAPE_THRESHOLD = 30.0
+    CASCADE_VOLUME_SHARE = 0.5
+
+    # Motivos de rejeição da validação em lote ('' = válido)
+    SALES_VALIDATION_REASONS = ("poucos_pontos", "range_curto", "valores_negativos")
+
+    def _validate_sales_profiles(self, profile_table: pd.DataFrame) -> pd.Series:
         """
-        Valida se dados de vendas são adequados para Prophet.
+        Valida todas as séries de uma vez a partir do perfil (profile_series) e devolve o
+        motivo de rejeição por produto ('' = válido).
 
         Critérios ajustados para aceitar dados mensais:
         - Mínimo 12 pontos (ex.: 1 ano de dados mensais)
         - Range mínimo 180 dias (~6 meses)
         - Sem valores negativos
         """
-        if df is None or df.empty or len(df) < self.MIN_POINTS:
-            logger.warning(
-                f"Poucos dados: {len(df) if df is not None else 0} pontos (mínimo: {self.MIN_POINTS})"
-            )
-            return False
-
-        date_range = (df["ds"].max() - df["ds"].min()).days
-        if date_range < self.MIN_DAYS:
-            logger.warning(
-                f"Range de datas muito pequeno: {date_range} dias (mínimo: {self.MIN_DAYS})"
-            )
-            return False
-
-        if (df["y"] < 0).any():
-            logger.warning("Dados contêm valores negativos")
-            return False
-
-        logger.info(f"✅ Dados válidos: {len(df)} pontos, {date_range} dias de range")
-        return True
+        reasons = np.select(
+            [
+                profile_table["n_points"].to_numpy() < self.MIN_POINTS,
+                profile_table["span_days"].to_numpy() < self.MIN_DAYS,
+                profile_table["min_value"].to_numpy(dtype=float) < 0,
+            ],
+            list(self.SALES_VALIDATION_REASONS),
+            default="",
+        )
+        return pd.Series(reasons, index=profile_table.index, dtype=object)
 
     def _sales_to_historical_dict(
-        self, sales_df: pd.DataFrame, product_ids: List[str]
+        self,
+        sales_df: pd.DataFrame,
+        product_ids: List[str],
+        profile_table: Optional[pd.DataFrame] = None,
     ) -> Dict[str, pd.DataFrame]:
         """
         Converte DataFrame de sales_history (product_id, ds, y) em
         Dict[product_id, DataFrame com ds, y] apenas para produtos
-        que passam em _validate_sales_data.
+        que passam na validação em lote (_validate_sales_profiles).
+        Os DataFrames por produto só são montados para os válidos.
         """
-        historical_data: Dict[str, pd.DataFrame] = {}
-        for pid in product_ids:
-            product_df = sales_df[sales_df["product_id"] == pid][["ds", "y"]].copy()
-            if product_df.empty:
-                continue
-            product_df = product_df.sort_values("ds").reset_index(drop=True)
-            if self._validate_sales_data(product_df):
-                historical_data[pid] = product_df
-            else:
-                logger.warning(f"Produto {pid}: dados insuficientes ou inválidos, pulando")
+        start = time.time()
+        if profile_table is None:
+            profile_table = profile_series(sales_df, key_column="product_id")
+
+        reasons = self._validate_sales_profiles(profile_table[profile_table.index.isin(product_ids)])
+        valid_ids = set(reasons.index[reasons == ""])
+        rejected = reasons[reasons != ""]
+        if not rejected.empty:
+            logger.warning(
+                f"⚠️ {len(rejected)} produtos com dados insuficientes ou inválidos, pulando: "
+                f"{rejected.value_counts().to_dict()} (mínimo {self.MIN_POINTS} pontos e {self.MIN_DAYS} dias)"
+            )
+            logger.debug(f"Produtos rejeitados: {rejected.to_dict()}")
 
+        valid_sales = sales_df.loc[sales_df["product_id"].isin(valid_ids), ["product_id", "ds", "y"]]
+        valid_sales = valid_sales.sort_values(["product_id", "ds"], kind="stable")
+        groups = {
+            pid: group[["ds", "y"]].reset_index(drop=True)
+            for pid, group in valid_sales.groupby("product_id", sort=False)
+        }
+        historical_data = {pid: groups[pid] for pid in product_ids if pid in groups}
+
+        logger.info(
+            f"✅ Dados válidos: {len(historical_data)}/{len(reasons)} produtos "
+            f"(validação em lote {time.time() - start:.2f}s)"
+        )
         return historical_data
 
     async def _fetch_products(self, analysis_id: str) -> List[Dict]:
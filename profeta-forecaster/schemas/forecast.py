@@ -3,7 +3,7 @@ Pydantic schemas para forecasting
 """
 
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
 
 
@@ -22,6 +22,43 @@ class ForecastRequest(BaseModel):
         default=True,
         description="Gerar forecast por categoria"
     )
+    feature_set: Literal["full", "lean"] = Field(
+        default="full",
+        description="Conjunto de features do XGBoost (lean = menos features, para catálogos grandes)"
+    )
+    xgboost_mode: Literal["per_product", "global"] = Field(
+        default="per_product",
+        description="XGBoost por produto ou um modelo global para todos os produtos da análise"
+    )
+    xgboost_strategy: Literal["recursive", "direct"] = Field(
+        default="recursive",
+        description="Previsão XGBoost recursiva (realimenta os lags) ou direta (horizonte como feature, um predict)"
+    )
+    fit_profile: Literal["fast", "balanced", "accurate"] = Field(
+        default="balanced",
+        description="Perfil de ajuste: fast (uploads interativos), balanced ou accurate (lotes noturnos)"
+    )
+    prophet_granularity: Literal["daily", "weekly", "auto"] = Field(
+        default="daily",
+        description="Prophet diário, semanal desagregado por dia da semana, ou auto (semanal em históricos diários de 3+ anos)"
+    )
+    prophet_hierarchy: Literal["independent", "top_down"] = Field(
+        default="independent",
+        description="Prophet por produto, ou top_down (categorias + top-N produtos; demais alocados pela participação)"
+    )
+    hierarchy_top_n: int = Field(
+        default=20,
+        ge=0,
+        description="Produtos de maior volume ajustados individualmente no modo top_down"
+    )
+    prophet_lite_mode: Literal["off", "candidate", "replace"] = Field(
+        default="off",
+        description="Prophet-lite em lote (NumPy): desligado, terceiro modelo no router, ou no lugar do Prophet/Stan"
+    )
+    forecast_cascade: bool = Field(
+        default=False,
+        description="Baselines vetorizados primeiro; XGBoost/Prophet só onde falham (MAPE) ou em produtos de alto volume"
+    )
 
 
 class ForecastDataPoint(BaseModel):
@@ -0,0 +1,226 @@
+"""
+Baselines
+Modelos de referência vetorizados (sazonal ingênuo, média móvel, suavização exponencial
+simples) avaliados para todas as séries de uma vez.
+
+As séries de mesma frequência viram uma matriz (séries × tempo) alinhada à direita
+(preenchida com NaN à esquerda); os níveis de cada método são calculados para todos os
+instantes em uma passada e as previsões de cada série são lidas a partir da sua origem
+(fim do treino no backtest, fim do histórico no forecast) por indexação vetorizada.
+
+Os resultados têm o mesmo formato dos forecasts do Prophet (ds, yhat, yhat_lower,
+yhat_upper, trend em datas diárias) e dos backtests (ds, y, yhat), para o router e o
+pós-processamento tratarem os baselines como qualquer outro candidato.
+"""
+
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services.fit_profiles import series_frequency
+
+
+BASELINE_METHODS = ("seasonal_naive", "moving_average", "ses")
+
+# Período sazonal e janela da média móvel por frequência (em passos da série)
+SEASON_LENGTHS = {"daily": 7, "weekly": 52, "monthly": 12}
+MOVING_AVERAGE_WINDOWS = {"daily": 28, "weekly": 8, "monthly": 3}
+DEFAULT_MOVING_AVERAGE_WINDOW = 3
+
+# Fatores de suavização testados na SES (o melhor por série no backtest)
+SES_ALPHAS = (0.1, 0.3, 0.5)
+
+
+@dataclass
+class BaselineResult:
+    """Melhor baseline de uma série: método, MAPE do backtest, forecast e backtest."""
+    method: str
+    mape: Optional[float]
+    forecast: pd.DataFrame
+    backtest: Optional[pd.DataFrame] = None
+
+
+def _right_aligned(values: List[np.ndarray]) -> np.ndarray:
+    """Matriz (séries × tempo) com o último ponto de cada série na última coluna."""
+    width = max(len(y) for y in values)
+    Y = np.full((len(values), width), np.nan)
+    for i, y in enumerate(values):
+        Y[i, width - len(y):] = y
+    return Y
+
+
+def _masked_mape(actual: np.ndarray, predicted: np.ndarray) -> np.ndarray:
+    """MAPE (%) por linha só nos reais > 0, como calculate_forecast_metrics; NaN sem pontos."""
+    valid = np.isfinite(actual) & (actual > 0) & np.isfinite(predicted)
+    ape = np.where(valid, np.abs(actual - predicted) / np.where(valid, actual, 1), 0)
+    count = valid.sum(axis=1)
+    return np.where(count > 0, ape.sum(axis=1) / np.maximum(count, 1) * 100, np.nan)
+
+
+class BaselineForecaster:
+    """Avalia e prevê os baselines de muitas séries de uma vez (por frequência)."""
+
+    def _predictions(
+        self,
+        Y: np.ndarray,
+        origins: np.ndarray,
+        horizon: int,
+        season: int,
+        window: int,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Previsões (séries × horizon) de cada método a partir de origins (exclusivo:
+        usa Y[:, :origin]). Para a SES, uma chave por alpha ('ses@0.3').
+        """
+        n_series, width = Y.shape
+        rows = np.arange(n_series)[:, None]
+        steps = np.arange(horizon)[None, :]
+        last = origins - 1
+
+        # Sazonal ingênuo: repete o último ciclo; sem ciclo completo, o último valor
+        seasonal_idx = origins[:, None] - season + steps % season
+        naive = Y[rows, np.clip(seasonal_idx, 0, width - 1)]
+        naive = np.where((seasonal_idx >= 0) & np.isfinite(naive), naive, Y[np.arange(n_series), last][:, None])
+
+        # Média móvel das últimas `window` observações (somas acumuladas ignorando NaN)
+        filled = np.nan_to_num(Y)
+        cumsum = np.concatenate([np.zeros((n_series, 1)), np.cumsum(filled, axis=1)], axis=1)
+        counts = np.concatenate([np.zeros((n_series, 1)), np.cumsum(np.isfinite(Y), axis=1)], axis=1)
+        start = np.maximum(origins - window, 0)
+        idx = np.arange(n_series)
+        total = cumsum[idx, origins] - cumsum[idx, start]
+        n_obs = counts[idx, origins] - counts[idx, start]
+        moving_average = np.where(n_obs > 0, total / np.maximum(n_obs, 1), np.nan)
+
+        predictions = {
+            "seasonal_naive": naive,
+            "moving_average": np.repeat(moving_average[:, None], horizon, axis=1),
+        }
+
+        # SES: nível de todos os alphas e séries em uma única recursão no tempo
+        alphas = np.array(SES_ALPHAS)[:, None]
+        level = np.full((len(SES_ALPHAS), n_series), np.nan)
+        levels = np.empty((len(SES_ALPHAS), n_series, width))
+        for t in range(width):
+            y_t = Y[:, t][None, :]
+            updated = alphas * y_t + (1 - alphas) * level
+            level = np.where(np.isnan(level), y_t, np.where(np.isnan(y_t), level, updated))
+            levels[:, :, t] = level
+        for a, alpha in enumerate(SES_ALPHAS):
+            predictions[f"ses@{alpha}"] = np.repeat(levels[a, idx, last][:, None], horizon, axis=1)
+        return predictions
+
+    def evaluate(
+        self,
+        series: Dict[str, pd.DataFrame],
+        periods: int,
+        validation_sizes: Dict[str, int],
+        interval_width: float = 0.8,
+    ) -> Dict[str, BaselineResult]:
+        """
+        Backtest de todos os baselines, escolha do melhor por série e forecast de
+        `periods` dias com ele.
+
+        Args:
+            series: {chave: DataFrame ds, y} (qualquer frequência)
+            periods: Dias previstos à frente (forecast diário; séries não diárias são
+                distribuídas pelo intervalo médio entre pontos)
+            validation_sizes: {chave: pontos finais do backtest}
+
+        Returns:
+            {chave: BaselineResult}
+        """
+        groups: Dict[str, Dict[str, Tuple[np.ndarray, np.ndarray]]] = {}
+        for key, df in series.items():
+            if len(df) >= 2:
+                groups.setdefault(series_frequency(df["ds"]), {})[key] = (
+                    df["ds"].to_numpy(dtype="datetime64[ns]"),
+                    df["y"].to_numpy(dtype=float),
+                )
+
+        results = {}
+        for frequency, frames in groups.items():
+            results.update(self._evaluate_group(frequency, frames, periods, validation_sizes, interval_width))
+        return results
+
+    def _evaluate_group(
+        self,
+        frequency: str,
+        arrays: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        periods: int,
+        validation_sizes: Dict[str, int],
+        interval_width: float,
+    ) -> Dict[str, BaselineResult]:
+        """Baselines de uma frequência: arrays = {chave: (ds, y)}."""
+        keys = list(arrays)
+        Y = _right_aligned([arrays[key][1] for key in keys])
+        width = Y.shape[1]
+        lengths = np.array([len(arrays[key][1]) for key in keys])
+        first_day = np.array([arrays[key][0][0] for key in keys], dtype="datetime64[D]")
+        last_day = np.array([arrays[key][0][-1] for key in keys], dtype="datetime64[D]")
+        season = SEASON_LENGTHS.get(frequency, 1)
+        window = MOVING_AVERAGE_WINDOWS.get(frequency, DEFAULT_MOVING_AVERAGE_WINDOW)
+
+        # Backtest: origem = fim do treino de cada série (validação pode não existir)
+        sizes = np.array([validation_sizes.get(key, 0) for key in keys])
+        sizes = np.where(lengths - sizes >= 2, sizes, 0)
+        horizon = max(int(sizes.max()), 1)
+        origins = width - np.maximum(sizes, 1)
+        steps = np.arange(horizon)[None, :]
+        in_validation = steps < sizes[:, None]
+        actual_idx = np.clip(origins[:, None] + steps, 0, width - 1)
+        rows = np.arange(len(keys))
+        actual = np.where(in_validation, Y[rows[:, None], actual_idx], np.nan)
+
+        backtest_predictions = self._predictions(Y, origins, horizon, season, window)
+        candidates = list(backtest_predictions)
+        mapes = np.column_stack([_masked_mape(actual, backtest_predictions[name]) for name in candidates])
+        has_mape = np.isfinite(mapes).any(axis=1)
+        best = np.where(
+            has_mape,
+            np.argmin(np.where(np.isfinite(mapes), mapes, np.inf), axis=1),
+            candidates.index("moving_average"),
+        )
+        chosen = np.stack([backtest_predictions[name] for name in candidates])[best, rows]
+        squared = np.where(in_validation, (actual - chosen) ** 2, 0)
+        rmse = np.where(sizes > 0, np.sqrt(squared.sum(axis=1) / np.maximum(sizes, 1)), np.nanstd(Y, axis=1))
+
+        # Forecast a partir do fim do histórico, em passos da série → dias
+        gaps = np.maximum((last_day - first_day).astype(float) / np.maximum(lengths - 1, 1), 1.0)
+        n_steps = int(np.ceil(periods / gaps.min())) + 1
+        future_predictions = self._predictions(Y, np.full(len(keys), width), n_steps, season, window)
+        day_steps = (np.arange(periods)[None, :] / gaps[:, None]).astype(int)
+        z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+
+        future = np.stack([future_predictions[name] for name in candidates])[best, rows]
+        per_day = future[rows[:, None], day_steps] / gaps[:, None]
+        spread = z * np.nan_to_num(rmse)[:, None] / gaps[:, None]
+
+        future_days = last_day[:, None] + np.arange(1, periods + 1)[None, :]
+
+        results = {}
+        for i, key in enumerate(keys):
+            method = candidates[best[i]]
+            forecast = pd.DataFrame({
+                "ds": future_days[i].astype("datetime64[ns]"),
+                "yhat": per_day[i],
+                "yhat_lower": per_day[i] - spread[i],
+                "yhat_upper": per_day[i] + spread[i],
+                "trend": np.full(periods, per_day[i].mean()),
+            })
+            forecast.attrs.update(engine="baseline", method=method, frequency=frequency)
+
+            backtest = None
+            if sizes[i] > 0:
+                ds, y = arrays[key]
+                backtest = pd.DataFrame({"ds": ds[-sizes[i]:], "y": y[-sizes[i]:], "yhat": chosen[i, :sizes[i]]})
+            mape = float(mapes[i, best[i]]) if np.isfinite(mapes[i, best[i]]) else None
+            results[key] = BaselineResult(method=method.split("@")[0], mape=mape, forecast=forecast, backtest=backtest)
+        return results
+
+
+# Instância global
+baseline_forecaster = BaselineForecaster()
@@ -0,0 +1,204 @@
+"""
+Calendário Brasileiro (dimensão de datas)
+Feriados nacionais (fixos e móveis) e datas comerciais, calculados uma vez por intervalo
+e compartilhados entre as features do XGBoost e os holidays do Prophet.
+"""
+
+import pandas as pd
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+from loguru import logger
+
+
+# Meses de alta temporada no varejo (Black Friday + Natal)
+PEAK_SEASON_MONTHS = [11, 12]
+
+# Feriados nacionais fixos (mês, dia)
+FIXED_NATIONAL_HOLIDAYS = {
+    (1, 1): "Confraternização Universal",
+    (4, 21): "Tiradentes",
+    (5, 1): "Dia do Trabalho",
+    (9, 7): "Independência do Brasil",
+    (10, 12): "Nossa Senhora Aparecida",
+    (11, 2): "Finados",
+    (11, 15): "Proclamação da República",
+    (11, 20): "Dia da Consciência Negra",
+    (12, 25): "Natal",
+}
+
+# Janelas (dias antes, dias depois) das datas comerciais para o Prophet:
+# presentes são comprados nos dias anteriores; Black Friday se estende até a Cyber Monday
+RETAIL_EVENT_WINDOWS = {
+    "Carnaval": (-3, 0),
+    "Páscoa": (-7, 0),
+    "Dia das Mães": (-7, 0),
+    "Dia dos Namorados": (-5, 0),
+    "Dia dos Pais": (-7, 0),
+    "Dia das Crianças": (-7, 0),
+    "Black Friday": (0, 3),
+    "Natal (compras)": (-10, 0),
+}
+
+
+def easter_sunday(year: int) -> date:
+    """Domingo de Páscoa (algoritmo gregoriano anônimo / Meeus-Jones-Butcher)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-ésimo dia da semana do mês (weekday: 0=segunda ... 6=domingo)."""
+    first = date(year, month, 1)
+    offset = (weekday - first.weekday()) % 7
+    return first + timedelta(days=offset + 7 * (n - 1))
+
+
+def brazilian_dates(year: int) -> List[Tuple[date, str, str]]:
+    """
+    Lista as datas relevantes de um ano.
+
+    Returns:
+        Lista de (data, nome, tipo) com tipo 'national' (feriado) ou 'retail' (data comercial)
+    """
+    easter = easter_sunday(year)
+    dates = [(date(year, m, d), name, "national") for (m, d), name in FIXED_NATIONAL_HOLIDAYS.items()]
+
+    # Feriados móveis (relativos à Páscoa)
+    dates += [
+        (easter - timedelta(days=48), "Carnaval (segunda)", "national"),
+        (easter - timedelta(days=47), "Carnaval", "national"),
+        (easter - timedelta(days=2), "Sexta-feira Santa", "national"),
+        (easter + timedelta(days=60), "Corpus Christi", "national"),
+    ]
+
+    # Datas comerciais
+    thanksgiving = nth_weekday(year, 11, 3, 4)  # 4ª quinta-feira de novembro
+    dates += [
+        (easter - timedelta(days=47), "Carnaval", "retail"),
+        (easter, "Páscoa", "retail"),
+        (nth_weekday(year, 5, 6, 2), "Dia das Mães", "retail"),   # 2º domingo de maio
+        (date(year, 6, 12), "Dia dos Namorados", "retail"),
+        (nth_weekday(year, 8, 6, 2), "Dia dos Pais", "retail"),   # 2º domingo de agosto
+        (date(year, 10, 12), "Dia das Crianças", "retail"),
+        (thanksgiving + timedelta(days=1), "Black Friday", "retail"),
+        (date(year, 12, 24), "Natal (compras)", "retail"),
+    ]
+    return dates
+
+
+class BrazilianCalendar:
+    """
+    Dimensão de calendário diária para um intervalo de datas (anos completos).
+
+    Construída uma vez por execução cobrindo histórico + horizonte de previsão;
+    as features são obtidas por join no índice de datas.
+    """
+
+    def __init__(self, start, end):
+        """
+        Args:
+            start: Primeira data necessária (histórico)
+            end: Última data necessária (histórico + horizonte)
+        """
+        start_year = pd.Timestamp(start).year
+        end_year = pd.Timestamp(end).year
+        self.start = pd.Timestamp(year=start_year, month=1, day=1)
+        self.end = pd.Timestamp(year=end_year, month=12, day=31)
+
+        events = [
+            (pd.Timestamp(d), name, kind)
+            for year in range(start_year, end_year + 1)
+            for d, name, kind in brazilian_dates(year)
+        ]
+        self.events = pd.DataFrame(events, columns=["ds", "holiday", "kind"])
+
+        self.daily = self._build_daily_table()
+        self.monthly = self._build_monthly_table()
+        self._prophet_holidays = self._build_prophet_holidays()
+
+        logger.info(
+            f"📆 Calendário BR: {self.start.date()} a {self.end.date()} "
+            f"({len(self.daily)} dias, {len(self.events)} eventos)"
+        )
+
+    @classmethod
+    def for_series(cls, historical_data: Dict[str, pd.DataFrame], horizon_days: int = 0) -> "BrazilianCalendar":
+        """Constrói o calendário cobrindo todas as séries de uma análise + horizonte."""
+        all_ds = pd.concat([df["ds"] for df in historical_data.values()]) if historical_data else pd.Series(dtype="datetime64[ns]")
+        start = all_ds.min() if len(all_ds) else pd.Timestamp.now()
+        end = (all_ds.max() if len(all_ds) else pd.Timestamp.now()) + pd.Timedelta(days=horizon_days)
+        return cls(start, end)
+
+    def covers(self, dates: pd.Series) -> bool:
+        """True se todas as datas estão dentro do calendário."""
+        dates = pd.to_datetime(dates)
+        return len(dates) == 0 or (dates.min() >= self.start and dates.max() <= self.end)
+
+    def _build_daily_table(self) -> pd.DataFrame:
+        """Tabela diária indexada por data."""
+        index = pd.date_range(self.start, self.end, freq="D", name="ds")
+        daily = pd.DataFrame(index=index)
+        daily["month"] = index.month
+        daily["quarter"] = index.quarter
+        daily["day_of_week"] = index.dayofweek
+
+        national = self.events[self.events["kind"] == "national"]
+        retail = self.events[self.events["kind"] == "retail"]
+        daily["is_national_holiday"] = index.isin(national["ds"])
+        daily["is_retail_event"] = index.isin(retail["ds"])
+        daily["is_peak_season"] = daily["month"].isin(PEAK_SEASON_MONTHS)
+        return daily
+
+    def _build_monthly_table(self) -> pd.DataFrame:
+        """Tabela mensal (granularidade do XGBoost) indexada por Period('M')."""
+        by_month = self.daily.groupby(self.daily.index.to_period("M"))
+        monthly = pd.DataFrame({
+            "month": by_month["month"].first(),
+            "quarter": by_month["quarter"].first(),
+            # Mês com data comercial relevante (Carnaval e Páscoa mudam de mês conforme o ano)
+            "is_holiday": by_month["is_retail_event"].any(),
+            "is_peak_season": by_month["is_peak_season"].first(),
+            "holiday_count": by_month["is_national_holiday"].sum(),
+        })
+        return monthly
+
+    def _build_prophet_holidays(self) -> pd.DataFrame:
+        """DataFrame no formato de holidays do Prophet (holiday, ds, lower_window, upper_window)."""
+        holidays = self.events.drop_duplicates(subset=["ds", "holiday"]).copy()
+        windows = holidays["holiday"].map(RETAIL_EVENT_WINDOWS)
+        holidays["lower_window"] = [w[0] if isinstance(w, tuple) else 0 for w in windows]
+        holidays["upper_window"] = [w[1] if isinstance(w, tuple) else 0 for w in windows]
+        return holidays[["holiday", "ds", "lower_window", "upper_window"]].reset_index(drop=True)
+
+    def monthly_features(self, dates: pd.Series) -> pd.DataFrame:
+        """
+        Features mensais de calendário para as datas dadas (join pelo mês).
+
+        Returns:
+            DataFrame alinhado ao índice de `dates` com month, quarter, is_holiday,
+            is_peak_season, holiday_count
+        """
+        periods = pd.to_datetime(dates).dt.to_period("M")
+        features = self.monthly.reindex(periods.values)
+        features.index = dates.index
+        return features
+
+    def prophet_holidays(self) -> pd.DataFrame:
+        """Holidays para Prophet(holidays=...). Cópia: o Prophet altera o DataFrame recebido."""
+        return self._prophet_holidays.copy()
+
+
+# Para testar localmente:
+if __name__ == "__main__":
+    calendar = BrazilianCalendar("2024-01-01", "2026-12-31")
+    print(calendar.events[calendar.events["ds"].dt.year == 2025].sort_values("ds").to_string())
+    print(calendar.monthly.head(12))
@@ -0,0 +1,169 @@
+"""
+CPU Budget
+Orçamento central de CPU para as seções paralelas do forecaster.
+
+Lê a cota do cgroup (pods com limite de vCPU) e a afinidade do processo, dimensiona
+os pools de workers, fixa as threads por modelo (nthread do XGBoost) para não
+oversubscrever, e ajusta o número de workers pela vazão medida em execuções anteriores.
+"""
+
+import math
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from loguru import logger
+
+
+# cgroup v2 ("<quota> <period>" ou "max <period>") e cgroup v1
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read_file(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """Limite de CPUs imposto pelo cgroup (None se não houver cota)."""
+    cpu_max = _read_file(CGROUP_V2_CPU_MAX)
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+
+    quota, period = _read_file(CGROUP_V1_QUOTA), _read_file(CGROUP_V1_PERIOD)
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cpus() -> int:
+    """
+    CPUs efetivamente disponíveis: menor valor entre os.cpu_count(), afinidade do
+    processo e cota do cgroup. FORECAST_CPU_LIMIT sobrescreve a detecção.
+    """
+    override = os.getenv("FORECAST_CPU_LIMIT")
+    if override:
+        return max(1, int(override))
+
+    cpus = os.cpu_count() or 1
+    if hasattr(os, "sched_getaffinity"):
+        cpus = min(cpus, len(os.sched_getaffinity(0)))
+
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, max(1, math.ceil(limit)))
+    return cpus
+
+
+@dataclass
+class PoolPlan:
+    """Dimensionamento de um pool: workers paralelos e threads por modelo."""
+    section: str
+    workers: int
+    threads_per_worker: int
+
+
+class CpuBudget:
+    """
+    Distribui o orçamento de CPU entre as seções paralelas.
+
+    workers × threads_per_worker nunca passa do número de CPUs. O número de workers
+    começa em min(CPUs, tarefas) e é ajustado por subida de encosta sobre a vazão
+    (tarefas/s) medida em cada seção.
+    """
+
+    # Pools de I/O (Supabase) não consomem CPU: tamanho fixo
+    IO_MAX_WORKERS = 8
+
+    # Só mede vazão quando há tarefas suficientes para ocupar os workers
+    MIN_TASKS_PER_WORKER = 2
+
+    def __init__(self, cpus: Optional[int] = None):
+        self.cpus = cpus or available_cpus()
+        self._throughput: Dict[str, Dict[int, float]] = {}
+        self._lock = threading.Lock()
+        logger.info(f"🧮 Orçamento de CPU: {self.cpus} CPUs (cgroup/afinidade/os.cpu_count)")
+
+    def plan(self, section: str, n_tasks: int) -> PoolPlan:
+        """
+        Dimensiona o pool de uma seção CPU-bound.
+
+        Args:
+            section: Nome da seção ('xgboost', 'prophet_products', ...)
+            n_tasks: Número de tarefas a executar
+
+        Returns:
+            PoolPlan com workers e threads por worker
+        """
+        limit = max(1, min(self.cpus, n_tasks))
+        workers = min(self._adapted_workers(section, default=limit), limit)
+        plan = PoolPlan(section=section, workers=workers, threads_per_worker=max(1, self.cpus // workers))
+        logger.info(
+            f"⚡ [{section}] {plan.workers} workers × {plan.threads_per_worker} threads ({n_tasks} tarefas)"
+        )
+        return plan
+
+    def io_workers(self, n_tasks: int) -> int:
+        """Workers para pools de I/O (leituras no Supabase)."""
+        return max(1, min(self.IO_MAX_WORKERS, n_tasks))
+
+    def record(self, plan: PoolPlan, n_tasks: int, seconds: float) -> None:
+        """Registra a vazão medida de uma execução da seção."""
+        if seconds <= 0 or n_tasks < plan.workers * self.MIN_TASKS_PER_WORKER:
+            return
+        throughput = n_tasks / seconds
+        with self._lock:
+            history = self._throughput.setdefault(plan.section, {})
+            previous = history.get(plan.workers)
+            # Média móvel exponencial: execuções diferentes têm séries de tamanhos diferentes
+            history[plan.workers] = throughput if previous is None else 0.5 * previous + 0.5 * throughput
+        logger.debug(f"📈 [{plan.section}] {plan.workers} workers: {throughput:.2f} tarefas/s")
+
+    def seconds_per_task(self, section: str) -> Optional[float]:
+        """
+        Tempo de CPU (worker-segundos) por tarefa da seção, pela melhor vazão medida;
+        None se a seção ainda não foi medida.
+        """
+        with self._lock:
+            history = dict(self._throughput.get(section, {}))
+        if not history:
+            return None
+        workers = max(history, key=history.get)
+        return workers / history[workers]
+
+    def _adapted_workers(self, section: str, default: int) -> int:
+        """Melhor número de workers medido, explorando o vizinho ainda não medido."""
+        with self._lock:
+            history = dict(self._throughput.get(section, {}))
+        if not history:
+            return default
+
+        best = max(history, key=history.get)
+        for candidate in (best - 1, best + 1):
+            if 1 <= candidate <= self.cpus and candidate not in history:
+                return candidate
+        return best
+
+
+# Instância global
+cpu_budget = CpuBudget()
+
+
+# Para testar localmente:
+if __name__ == "__main__":
+    print(f"os.cpu_count(): {os.cpu_count()}")
+    print(f"cgroup: {cgroup_cpu_limit()}")
+    print(f"disponíveis: {available_cpus()}")
+
+    budget = CpuBudget()
+    for n_tasks in (1, 3, 50):
+        print(budget.plan("xgboost", n_tasks))
@@ -0,0 +1,405 @@
+"""
+Executor Backend
+Backend plugável (threads ou processos) para as seções paralelas do forecaster.
+
+No modo 'process' as séries vão para os workers por memória compartilhada
+(multiprocessing.shared_memory): o processo principal escreve as colunas numéricas
+de todas as séries em um único bloco e cada tarefa recebe apenas uma referência
+(nome do bloco + layout das colunas), em vez de um DataFrame serializado com pickle.
+
+As tarefas deste módulo são funções de nível de módulo (serializáveis) e aceitam
+tanto um DataFrame (modo 'thread') quanto uma SharedFrameRef (modo 'process').
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from services.cpu_budget import PoolPlan
+from services.fit_profiles import FitProfile, get_fit_profile, series_frequency
+
+
+EXECUTOR_MODES = ("thread", "process")
+
+# Colunas do forecast do Prophet usadas pelo pós-processamento (reduz o retorno dos workers)
+PROPHET_RESULT_COLUMNS = ["ds", "yhat", "yhat_lower", "yhat_upper", "trend"]
+
+# Alinhamento dos arrays dentro do bloco compartilhado
+_ALIGNMENT = 8
+
+
+def executor_mode() -> str:
+    """Modo configurado em FORECAST_EXECUTOR ('thread' por padrão)."""
+    mode = os.getenv("FORECAST_EXECUTOR", "thread").strip().lower()
+    if mode not in EXECUTOR_MODES:
+        logger.warning(f"⚠️ FORECAST_EXECUTOR inválido ({mode}), usando 'thread'")
+        return "thread"
+    return mode
+
+
+def _process_context() -> multiprocessing.context.BaseContext:
+    """
+    forkserver quando disponível (Linux): workers nascem de um servidor que já
+    importou Prophet/XGBoost, sem herdar as threads do processo da API.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["services.executor_backend"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def create_executor(plan: PoolPlan, mode: Optional[str] = None) -> Executor:
+    """
+    Cria o executor de uma seção conforme o modo configurado.
+
+    Args:
+        plan: Dimensionamento do pool (services.cpu_budget)
+        mode: 'thread' ou 'process' (None = FORECAST_EXECUTOR)
+    """
+    mode = mode or executor_mode()
+    if mode == "process":
+        return ProcessPoolExecutor(max_workers=plan.workers, mp_context=_process_context())
+    return ThreadPoolExecutor(max_workers=plan.workers)
+
+
+# ============================================
+# Transporte de séries por memória compartilhada
+# ============================================
+
+@dataclass(frozen=True)
+class SharedFrameRef:
+    """Referência (serializável) a um DataFrame dentro de um bloco SharedFrames."""
+    shm_name: str
+    columns: Tuple[Tuple[str, str, int, int], ...]  # (coluna, dtype, offset, linhas)
+
+    def read(self) -> pd.DataFrame:
+        """Reconstrói o DataFrame (cópia local; o bloco pode ser liberado depois)."""
+        shm = SharedMemory(name=self.shm_name)
+        try:
+            data = {
+                col: np.ndarray((rows,), dtype=np.dtype(dtype), buffer=shm.buf, offset=offset).copy()
+                for col, dtype, offset, rows in self.columns
+            }
+        finally:
+            shm.close()
+        return pd.DataFrame(data)
+
+
+class SharedFrames:
+    """
+    Bloco de memória compartilhada com várias séries.
+
+    Copia as colunas numéricas, booleanas e de data de cada DataFrame; colunas de
+    texto (UUIDs, categorias) não são transportadas. Use como context manager:
+    o bloco é liberado (unlink) na saída.
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame]):
+        layout: Dict[str, List[Tuple[str, str, int, int]]] = {}
+        arrays: List[Tuple[int, np.ndarray]] = []
+        offset = 0
+
+        for key, df in frames.items():
+            columns = []
+            for col in df.columns:
+                values = df[col].to_numpy()
+                if values.dtype.kind == "M":
+                    values = values.astype("datetime64[ns]")
+                elif values.dtype.kind not in "biuf":
+                    continue
+                values = np.ascontiguousarray(values)
+                columns.append((col, values.dtype.str, offset, len(values)))
+                arrays.append((offset, values))
+                offset += -(-values.nbytes // _ALIGNMENT) * _ALIGNMENT
+            layout[key] = columns
+
+        self.shm = SharedMemory(create=True, size=max(offset, 1))
+        for array_offset, values in arrays:
+            target = np.ndarray(values.shape, dtype=values.dtype, buffer=self.shm.buf, offset=array_offset)
+            target[:] = values
+
+        self._layout = layout
+        logger.debug(f"📦 SharedFrames: {len(frames)} séries, {offset / 1024:.0f} KB")
+
+    def ref(self, key: str) -> SharedFrameRef:
+        return SharedFrameRef(self.shm.name, tuple(self._layout[key]))
+
+    def close(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self) -> "SharedFrames":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+SeriesInput = Union[pd.DataFrame, SharedFrameRef]
+
+
+def _as_frame(series: SeriesInput) -> pd.DataFrame:
+    return series.read() if isinstance(series, SharedFrameRef) else series
+
+
+# ============================================
+# Tarefas dos workers
+# ============================================
+
+def _analytical_intervals(model, forecast: pd.DataFrame, interval_width: float) -> pd.DataFrame:
+    """
+    Intervalos do Prophet (tendência linear) em forma fechada, sem simular caminhos.
+
+    Usa as mesmas fontes de incerteza da simulação: ruído de observação (sigma_obs)
+    e mudanças futuras de tendência (Poisson com a taxa de changepoints do histórico,
+    magnitudes Laplace com escala média |delta|). Após h passos de tamanho d, a
+    variância da tendência é d² · p · 2b² · h(h+1)(2h+1)/6.
+    """
+    t = ((forecast["ds"] - model.start) / model.t_scale).to_numpy(dtype=float)
+    steps = np.cumsum(t > 1)
+    future_t = t[t > 1]
+    step = np.diff(future_t).mean() if len(future_t) > 1 else np.diff(model.history["t"]).mean()
+
+    deltas = model.params["delta"][0]
+    mean_delta = np.mean(np.abs(deltas)) + 1e-8
+    change_likelihood = len(model.changepoints_t) * step
+    trend_var = step ** 2 * change_likelihood * 2 * mean_delta ** 2 * steps * (steps + 1) * (2 * steps + 1) / 6
+    sigma_obs = float(np.ravel(model.params["sigma_obs"])[0])
+
+    z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+    spread = z * model.y_scale * np.sqrt(sigma_obs ** 2 + trend_var)
+    forecast["yhat_lower"] = forecast["yhat"] - spread
+    forecast["yhat_upper"] = forecast["yhat"] + spread
+    return forecast
+
+
+def _fitted_prophet(
+    df: pd.DataFrame,
+    holidays: pd.DataFrame,
+    config: Dict,
+    warm_key: Optional[str] = None,
+    fit_kwargs: Optional[Dict] = None,
+):
+    """
+    Prophet ajustado em df (ds, y): do cache de modelos quando possível, senão fit + save.
+
+    Args:
+        config: Argumentos do construtor do Prophet (FitProfile.prophet_config)
+        warm_key: Identidade estável da série (produto, categoria) entre execuções; no
+            fit, os parâmetros anteriores dessa série iniciam o otimizador (warm start)
+        fit_kwargs: Argumentos do otimizador (ex.: teto de iterações do perfil)
+
+    Returns:
+        (modelo, 'hit' ou 'miss'); o modelo leva fit_seconds (0 no hit) e warm_started
+    """
+    from prophet import Prophet
+    from services.model_registry import prophet_model_cache, prophet_series_hash
+
+    # Silenciar warnings verbosos do Stan e Prophet
+    logging.getLogger("cmdstanpy").setLevel(logging.ERROR)
+    logging.getLogger("prophet").setLevel(logging.ERROR)
+
+    fit_kwargs = fit_kwargs or {}
+    key = prophet_series_hash(df, holidays, {**config, **fit_kwargs})
+    model = prophet_model_cache.load(key)
+    if model is not None:
+        # Feriados atuais cobrem o horizonte pedido (o modelo só usa os nomes do treino)
+        model.holidays = holidays
+        model.fit_seconds, model.warm_started = 0.0, False
+        return model, "hit"
+
+    init = prophet_model_cache.load_params(warm_key, config, df) if warm_key else None
+    model = Prophet(holidays=holidays, **config)
+    # Treinar modelo (warnings do Stan podem aparecer nos logs)
+    # init com formato diferente (ex.: novo feriado no histórico) é descartado pelo Prophet
+    start = time.perf_counter()
+    model.fit(df, init=init, **fit_kwargs) if init else model.fit(df, **fit_kwargs)
+    model.fit_seconds = time.perf_counter() - start
+    model.warm_started = init is not None
+    prophet_model_cache.save(key, model)
+    if warm_key:
+        prophet_model_cache.save_params(warm_key, config, model)
+    return model, "miss"
+
+
+def prophet_fit_stats(model) -> Dict:
+    """Tamanho do problema e custo de um fit: parâmetros estimados por grupo e tempo."""
+    sizes = {name: int(np.size(model.params[name][0])) for name in ("k", "m", "delta", "beta", "sigma_obs")}
+    return {
+        "n_params": sum(sizes.values()),
+        "n_changepoints": sizes["delta"],
+        "n_regressors": sizes["beta"],  # termos de Fourier + feriados
+        "fit_seconds": round(model.fit_seconds, 3),
+        "warm_start": model.warm_started,
+    }
+
+
+def fit_prophet_forecast(
+    series: SeriesInput,
+    periods: int,
+    holidays: pd.DataFrame,
+    profile: Optional[FitProfile] = None,
+    warm_key: Optional[str] = None,
+    freq: str = "D",
+) -> pd.DataFrame:
+    """
+    Ajusta Prophet em uma série (ds, y) e prevê `periods` períodos à frente.
+
+    Args:
+        profile: Perfil de ajuste (sazonalidades, iterações, intervalos; None = 'balanced')
+        warm_key: Identidade da série para warm start a partir do fit anterior
+        freq: Frequência das datas futuras ('D'; 'W-MON' para séries semanais agregadas)
+
+    Returns:
+        Forecast com as colunas de PROPHET_RESULT_COLUMNS (somente datas futuras);
+        attrs: cache ('hit'/'miss'), frequency e prophet_fit_stats do modelo
+    """
+    profile = profile or get_fit_profile()
+    uncertainty = profile.uncertainty
+    df = _as_frame(series)
+    model, cache_status = _fitted_prophet(
+        df[["ds", "y"]],
+        profile.usable_holidays(holidays, df["ds"]),
+        profile.prophet_config(df["ds"]),
+        warm_key,
+        profile.prophet_fit_kwargs,
+    )
+
+    # Intervalos só afetam o predict: ajustados também em modelos vindos do cache
+    model.interval_width = uncertainty.interval_width
+    model.uncertainty_samples = uncertainty.samples if uncertainty.mode == "sampled" else 0
+    # Só o horizonte: o histórico não é usado pelo pós-processamento
+    future = model.make_future_dataframe(periods=periods, freq=freq, include_history=False)
+    forecast = model.predict(future)
+
+    if uncertainty.mode == "analytical":
+        forecast = _analytical_intervals(model, forecast, uncertainty.interval_width)
+    elif uncertainty.mode == "off":
+        forecast["yhat_lower"] = forecast["yhat"]
+        forecast["yhat_upper"] = forecast["yhat"]
+    forecast = forecast[PROPHET_RESULT_COLUMNS]
+    forecast.attrs.update(cache=cache_status, frequency=series_frequency(df["ds"]), **prophet_fit_stats(model))
+    return forecast
+
+
+def backtest_prophet(
+    series: SeriesInput,
+    validation_size: int,
+    holidays: pd.DataFrame,
+    profile: Optional[FitProfile] = None,
+    warm_key: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Backtest do Prophet: ajusta sem os últimos `validation_size` pontos e prevê esse trecho.
+
+    Args:
+        profile: Perfil de ajuste (None = 'balanced')
+        warm_key: Identidade da série para warm start (o backtest guarda seus próprios parâmetros)
+
+    Returns:
+        DataFrame com ds, y (real) e yhat (previsto) do período de validação
+    """
+    profile = profile or get_fit_profile()
+    df = _as_frame(series)
+    train_df = df.iloc[:-validation_size][["ds", "y"]]
+    validation_df = df.iloc[-validation_size:][["ds", "y"]].reset_index(drop=True)
+    logger.info(f"📊 Backtesting: {len(train_df)} treino, {len(validation_df)} validação")
+
+    model, _ = _fitted_prophet(
+        train_df,
+        profile.usable_holidays(holidays, train_df["ds"]),
+        profile.prophet_config(train_df["ds"], weekly=len(train_df) >= 14),
+        f"{warm_key}:backtest" if warm_key else None,
+        profile.prophet_fit_kwargs,
+    )
+    model.uncertainty_samples = 0  # só yhat é usado nas métricas
+    validation_forecast = model.predict(validation_df[["ds"]])
+    validation_df["yhat"] = validation_forecast["yhat"].to_numpy()
+    return validation_df
+
+
+def train_xgboost_product(
+    series: SeriesInput,
+    settings: Dict,
+    n_periods: int = 3,
+    product_id: Optional[str] = None,
+) -> Dict:
+    """
+    Treina e prevê XGBoost para um produto (features + 'y').
+
+    Args:
+        series: Features do produto
+        settings: Argumentos do XGBoostForecaster (feature_set, engine, nthread, strategy,
+            n_estimators, cv_folds)
+        n_periods: Períodos mensais previstos
+        product_id: Se informado, usa o registro de modelos (services.model_registry)
+
+    Returns:
+        Dict com mape, mae, forecast (records), feature_importance, training_samples,
+        n_estimators (árvores do modelo final), registry ('hit'/'extend'/'miss' ou None)
+    """
+    from services.model_registry import xgboost_registry
+    from services.xgboost_service import XGBoostForecaster
+
+    features_df = _as_frame(series)
+    forecaster = XGBoostForecaster(**settings)
+
+    # Preparar dados
+    X, y = forecaster.prepare_training_data(features_df)
+
+    # Treinar modelo (ou reaproveitar do registro)
+    if product_id is not None:
+        result = forecaster.train_model_cached(X, y, product_id, xgboost_registry)
+    else:
+        result = forecaster.train_model(X, y, validate=True)
+
+    # Gerar previsões
+    forecast = forecaster.predict(result["model"], features_df, n_periods=n_periods)
+
+    return {
+        "mape": result["mape"],
+        "mae": result["mae"],
+        "forecast": forecast.to_dict("records"),
+        "feature_importance": result["feature_importance"],
+        "training_samples": len(X),
+        "n_estimators": result["n_estimators"],
+        "registry": result.get("registry"),
+    }
+
+
+# Para testar localmente:
+if __name__ == "__main__":
+    from concurrent.futures import as_completed
+
+    from services.cpu_budget import CpuBudget
+    from services.xgboost_service import synthetic_catalog
+
+    logger.remove()
+    features_by_product, _ = synthetic_catalog(n_products=40, n_months=36)
+    settings = {"feature_set": "full", "engine": "native", "nthread": 1}
+    plan = CpuBudget().plan("xgboost", len(features_by_product))
+
+    for mode in EXECUTOR_MODES:
+        start = time.time()
+        with SharedFrames(features_by_product) as shared, create_executor(plan, mode) as executor:
+            futures = [
+                executor.submit(
+                    train_xgboost_product,
+                    shared.ref(pid) if mode == "process" else df,
+                    settings,
+                )
+                for pid, df in features_by_product.items()
+            ]
+            mapes = [f.result()["mape"] for f in as_completed(futures)]
+        print(f"{mode:8s} {time.time() - start:6.2f}s  ({plan.workers} workers)  MAPE médio={np.mean(mapes):.1f}%")
@@ -5,74 +5,222 @@ Calcula features a partir do histórico de vendas
 
 import pandas as pd
 import numpy as np
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 from loguru import logger
 
+from services.calendar_features import BrazilianCalendar
+from services.fit_profiles import series_frequency
+
+
+# Colunas brutas disponíveis antes de qualquer feature
+BASE_COLUMNS = ("ds", "y")
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """Declaração de uma feature: entradas, custo relativo e função de cálculo."""
+    name: str
+    inputs: Tuple[str, ...]  # colunas base ou outras features
+    compute: Callable[[pd.DataFrame, "FeatureEngineer"], pd.Series]
+    cost: int = 1            # custo relativo (1 = barato)
+    dtype: str = "float"     # float | int | bool (formato no feature_store)
+    lookback: int = 0        # períodos de histórico consumidos (lags)
+    target_scaled: bool = False  # mesma escala de 'y' (normalizada no modelo global)
+
 
 class FeatureEngineer:
     """Calcula features para machine learning."""
 
-    # Feriados importantes no Brasil
-    BRAZILIAN_HOLIDAYS = {
-        1: False,   # Janeiro
-        2: True,    # Fevereiro (Carnaval)
-        3: False,
-        4: True,    # Abril (Páscoa - variável)
-        5: True,    # Maio (Dia das Mães)
-        6: True,    # Junho (Dia dos Namorados, Festa Junina)
-        7: False,
-        8: True,    # Agosto (Dia dos Pais)
-        9: False,
-        10: True,   # Outubro (Dia das Crianças)
-        11: True,   # Novembro (Black Friday)
-        12: True,   # Dezembro (Natal)
+    # Granularidade de modelagem do XGBoost: cada passo de previsão = 1 mês
+    # (predict avança 30 dias por período e _expand_xgboost_to_daily divide por 30)
+    MODELING_FREQUENCY = "monthly"
+
+    # Regras de resample do pandas por granularidade
+    FREQUENCY_RULES = {
+        "daily": "D",
+        "weekly": "W-MON",
+        "monthly": "MS",
     }
 
-    PEAK_SEASON_MONTHS = [11, 12]  # Novembro e Dezembro
+    # Tolerância (dias) para considerar um período das bordas completo
+    # (demais cadências: intervalo mediano entre registros)
+    FREQUENCY_STEP_DAYS = {
+        "daily": 1,
+        "weekly": 7,
+        "monthly": 31,
+    }
+
+    # Mínimo de linhas completas que um lag precisa deixar para treino
+    MIN_ROWS_PER_LAG = 6
+
+    # Conjuntos de features por configuração de modelo (dependências resolvidas pelo registry)
+    FEATURE_SETS = {
+        "full": None,  # todas as features do registry
+        "lean": ("lag_1", "lag_3", "lag_12", "rolling_mean_3m", "month", "linear_trend"),
+    }
+
+    def __init__(self, calendar: Optional[BrazilianCalendar] = None):
+        """
+        Inicializa o feature engineer.
+
+        Args:
+            calendar: Calendário compartilhado da execução (construído sob demanda se ausente)
+        """
+        self.calendar = calendar
+        # Planos de cálculo já resolvidos, por tupla de features pedidas
+        self._plan_cache: Dict[Tuple[str, ...], List[FeatureSpec]] = {}
+
+    def calendar_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Features de calendário por join no mês de cada linha (calendário construído uma vez)."""
+        if self.calendar is None or not self.calendar.covers(df["ds"]):
+            start, end = pd.to_datetime(df["ds"]).min(), pd.to_datetime(df["ds"]).max()
+            if self.calendar is not None:
+                start, end = min(start, self.calendar.start), max(end, self.calendar.end)
+            self.calendar = BrazilianCalendar(start, end)
+        return self.calendar.monthly_features(df["ds"])
+
+    @classmethod
+    def feature_names(cls, feature_set: str = "full") -> List[str]:
+        """Lista as features de um conjunto nomeado (ex.: 'full', 'lean')."""
+        if feature_set not in cls.FEATURE_SETS:
+            raise ValueError(
+                f"Conjunto de features desconhecido: {feature_set} (opções: {list(cls.FEATURE_SETS)})"
+            )
+        names = cls.FEATURE_SETS[feature_set]
+        return list(FEATURE_REGISTRY) if names is None else list(names)
+
+    def resolve_plan(self, feature_names: Sequence[str]) -> List[FeatureSpec]:
+        """
+        Resolve as dependências das features pedidas em ordem topológica.
+
+        O plano é resolvido uma vez por conjunto e reutilizado para todos os produtos.
 
-    def __init__(self):
-        """Inicializa o feature engineer."""
-        pass
+        Args:
+            feature_names: Features pedidas pela configuração do modelo
+
+        Returns:
+            Lista de FeatureSpec na ordem de cálculo (dependências primeiro)
+        """
+        key = tuple(feature_names)
+        if key in self._plan_cache:
+            return self._plan_cache[key]
+
+        plan: List[FeatureSpec] = []
+        resolved = set(BASE_COLUMNS)
+        visiting = set()
+
+        def visit(name: str):
+            if name in resolved:
+                return
+            if name not in FEATURE_REGISTRY:
+                raise ValueError(f"Feature desconhecida: {name}")
+            if name in visiting:
+                raise ValueError(f"Dependência circular na feature {name}")
+            visiting.add(name)
+            spec = FEATURE_REGISTRY[name]
+            for dep in spec.inputs:
+                visit(dep)
+            visiting.discard(name)
+            resolved.add(name)
+            plan.append(spec)
+
+        for name in key:
+            visit(name)
+
+        total_cost = sum(spec.cost for spec in plan)
+        logger.info(
+            f"🧩 Plano de features: {len(key)} pedidas → {len(plan)} calculadas (custo {total_cost})"
+        )
+        self._plan_cache[key] = plan
+        return plan
+
+    def resample_to_modeling_frequency(self, historical: pd.DataFrame) -> pd.DataFrame:
+        """
+        Agrega a série para a granularidade de modelagem (soma das vendas por período).
+
+        Séries já mensais (intervalo de 25 a 45 dias, ver frequency_from_stats) são mantidas
+        como estão (datas originais preservadas); as demais cadências (diária, semanal,
+        quinzenal, trimestral...) são somadas por mês de calendário. Períodos incompletos nas bordas (ex.: mês corrente pela metade) são descartados
+        para não distorcer lag_1 e as médias móveis.
+
+        Args:
+            historical: DataFrame com colunas ['ds', 'y']
+
+        Returns:
+            DataFrame com colunas ['ds', 'y'] na granularidade de modelagem
+        """
+        df = historical[["ds", "y"]].copy()
+        df["ds"] = pd.to_datetime(df["ds"])
+        df = df.sort_values("ds").reset_index(drop=True)
+
+        dates = df["ds"].drop_duplicates()
+        native = series_frequency(dates)
+        if native in (self.MODELING_FREQUENCY, "unknown"):
+            return df
+
+        rule = self.FREQUENCY_RULES[self.MODELING_FREQUENCY]
+        resampled = df.set_index("ds")["y"].resample(rule).sum().reset_index()
+
+        # Descartar períodos incompletos nas bordas
+        step_days = self.FREQUENCY_STEP_DAYS.get(native) or float(dates.diff().dt.days.median())
+        tolerance = pd.Timedelta(days=step_days)
+        first_date, last_date = df["ds"].min(), df["ds"].max()
+        period_end = resampled["ds"] + pd.tseries.frequencies.to_offset(rule) - pd.Timedelta(days=1)
+        complete = (resampled["ds"] + tolerance > first_date) & (period_end - tolerance < last_date)
+        resampled = resampled[complete].reset_index(drop=True)
+
+        logger.info(
+            f"📅 Série {native} agregada para {self.MODELING_FREQUENCY}: "
+            f"{len(df)} → {len(resampled)} pontos"
+        )
+        return resampled
 
     def calculate_features(
         self,
         historical: pd.DataFrame,
-        product: Dict
+        product: Dict,
+        feature_set: str = "full",
+        features: Optional[Sequence[str]] = None,
     ) -> pd.DataFrame:
         """
-        Calcula todas as features para um produto.
+        Calcula as features pedidas para um produto.
+
+        A série é agregada para a granularidade de modelagem (mensal) antes do cálculo,
+        então dados diários geram uma linha por mês e não uma por dia. Só as features do
+        conjunto pedido (e suas dependências) são calculadas.
 
         Args:
             historical: DataFrame com colunas ['ds', 'y']
             product: Dict com info do produto (category, brand, etc.)
+            feature_set: Conjunto nomeado de FEATURE_SETS
+            features: Lista explícita de features (sobrepõe feature_set)
 
         Returns:
             DataFrame com features calculadas por data
         """
         logger.info(f"🔧 Calculando features para produto {product.get('id', 'unknown')}")
 
-        if len(historical) < 3:
-            logger.warning(f"⚠️ Dados insuficientes: {len(historical)} pontos")
-            return pd.DataFrame()
-
-        # Criar DataFrame de features
-        df = historical.copy()
-        df = df.sort_values('ds').reset_index(drop=True)
-
-        # 1. Lag Features
-        df = self._add_lag_features(df)
+        # Criar DataFrame de features na granularidade de modelagem
+        df = self.resample_to_modeling_frequency(historical)
 
-        # 2. Rolling Statistics
-        df = self._add_rolling_features(df)
+        if len(df) < 3:
+            logger.warning(f"⚠️ Dados insuficientes: {len(df)} pontos")
+            return pd.DataFrame()
 
-        # 3. Seasonality Features
-        df = self._add_seasonality_features(df)
+        plan = self.resolve_plan(features if features is not None else self.feature_names(feature_set))
 
-        # 4. Trend Features
-        df = self._add_trend_features(df)
+        # Lags que não deixam linhas suficientes para treino são pulados (e quem depende deles)
+        max_lookback = max(1, len(df) - self.MIN_ROWS_PER_LAG)
+        skipped = set()
+        for spec in plan:
+            if spec.lookback > max_lookback or any(dep in skipped for dep in spec.inputs):
+                skipped.add(spec.name)
+                continue
+            df[spec.name] = spec.compute(df, self)
 
-        # 5. Product Attributes
+        # Product Attributes
         df = self._add_product_attributes(df, product)
 
         # Remover linhas com NaN (primeiras linhas que não têm lags)
@@ -82,54 +230,6 @@ class FeatureEngineer:
 
         return df_clean
 
-    def _add_lag_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Adiciona lag features (vendas de meses anteriores)."""
-        df['lag_1'] = df['y'].shift(1)   # Mês anterior
-        df['lag_3'] = df['y'].shift(3)   # 3 meses atrás
-        df['lag_6'] = df['y'].shift(6)   # 6 meses atrás
-        df['lag_12'] = df['y'].shift(12) # 12 meses atrás (ano anterior)
-
-        return df
-
-    def _add_rolling_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Adiciona estatísticas móveis (média, desvio, min, max)."""
-        # Média móvel
-        df['rolling_mean_3m'] = df['y'].rolling(window=3, min_periods=1).mean()
-        df['rolling_mean_6m'] = df['y'].rolling(window=6, min_periods=1).mean()
-
-        # Desvio padrão móvel
-        df['rolling_std_3m'] = df['y'].rolling(window=3, min_periods=1).std()
-
-        # Mínimo e máximo móvel
-        df['rolling_min_3m'] = df['y'].rolling(window=3, min_periods=1).min()
-        df['rolling_max_3m'] = df['y'].rolling(window=3, min_periods=1).max()
-
-        return df
-
-    def _add_seasonality_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Adiciona features de sazonalidade."""
-        # Extrair mês e trimestre
-        df['month'] = pd.to_datetime(df['ds']).dt.month
-        df['quarter'] = pd.to_datetime(df['ds']).dt.quarter
-
-        # Flags de feriados/temporadas
-        df['is_holiday'] = df['month'].map(self.BRAZILIAN_HOLIDAYS)
-        df['is_peak_season'] = df['month'].isin(self.PEAK_SEASON_MONTHS)
-
-        return df
-
-    def _add_trend_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Adiciona features de tendência."""
-        # Tendência linear simples
-        df['linear_trend'] = range(len(df))
-
-        # Momentum (diferença entre média recente e antiga)
-        recent_mean = df['y'].rolling(window=3, min_periods=1).mean()
-        old_mean = df['y'].rolling(window=6, min_periods=1).mean()
-        df['momentum'] = recent_mean - old_mean
-
-        return df
-
     def _add_product_attributes(self, df: pd.DataFrame, product: Dict) -> pd.DataFrame:
         """Adiciona atributos do produto (desnormalizados)."""
         df['category'] = product.get('refined_category', 'Unknown')
@@ -163,28 +263,11 @@ class FeatureEngineer:
                 'product_id': product_id,
                 'feature_date': row['ds'].strftime('%Y-%m-%d'),
 
-                # Lag features
-                'lag_1': float(row['lag_1']) if pd.notna(row['lag_1']) else None,
-                'lag_3': float(row['lag_3']) if pd.notna(row['lag_3']) else None,
-                'lag_6': float(row['lag_6']) if pd.notna(row['lag_6']) else None,
-                'lag_12': float(row['lag_12']) if pd.notna(row['lag_12']) else None,
-
-                # Rolling stats
-                'rolling_mean_3m': float(row['rolling_mean_3m']) if pd.notna(row['rolling_mean_3m']) else None,
-                'rolling_mean_6m': float(row['rolling_mean_6m']) if pd.notna(row['rolling_mean_6m']) else None,
-                'rolling_std_3m': float(row['rolling_std_3m']) if pd.notna(row['rolling_std_3m']) else None,
-                'rolling_min_3m': float(row['rolling_min_3m']) if pd.notna(row['rolling_min_3m']) else None,
-                'rolling_max_3m': float(row['rolling_max_3m']) if pd.notna(row['rolling_max_3m']) else None,
-
-                # Seasonality
-                'month': int(row['month']),
-                'quarter': int(row['quarter']),
-                'is_holiday': bool(row['is_holiday']),
-                'is_peak_season': bool(row['is_peak_season']),
-
-                # Trend
-                'linear_trend': float(row['linear_trend']) if pd.notna(row['linear_trend']) else None,
-                'momentum': float(row['momentum']) if pd.notna(row['momentum']) else None,
+                # Features do registry (não calculadas neste conjunto ficam NULL)
+                **{
+                    name: self._to_store_value(row.get(name), spec.dtype)
+                    for name, spec in FEATURE_REGISTRY.items()
+                },
 
                 # Product attributes
                 'category': str(row['category']),
@@ -197,6 +280,63 @@ class FeatureEngineer:
         logger.info(f"📦 Preparados {len(records)} registros para feature_store")
         return records
 
+    @staticmethod
+    def _to_store_value(value, dtype: str):
+        """Converte valor da feature para tipo nativo do feature_store (None se ausente)."""
+        if value is None or pd.isna(value):
+            return None
+        if dtype == "int":
+            return int(value)
+        if dtype == "bool":
+            return bool(value)
+        return float(value)
+
+
+def _lag(periods: int) -> Callable:
+    return lambda df, fe: df["y"].shift(periods)
+
+
+def _rolling(stat: str, window: int) -> Callable:
+    return lambda df, fe: getattr(df["y"].rolling(window=window, min_periods=1), stat)()
+
+
+def _calendar(column: str) -> Callable:
+    return lambda df, fe: fe.calendar_features(df)[column]
+
+
+# Registry de features: cada uma declara entradas e custo; o plano calcula só o pedido
+FEATURE_REGISTRY: Dict[str, FeatureSpec] = {
+    spec.name: spec
+    for spec in [
+        # Lag features (vendas de meses anteriores)
+        FeatureSpec("lag_1", ("y",), _lag(1), lookback=1, target_scaled=True),     # Mês anterior
+        FeatureSpec("lag_3", ("y",), _lag(3), lookback=3, target_scaled=True),     # 3 meses atrás
+        FeatureSpec("lag_6", ("y",), _lag(6), lookback=6, target_scaled=True),     # 6 meses atrás
+        FeatureSpec("lag_12", ("y",), _lag(12), lookback=12, target_scaled=True),  # 12 meses atrás (ano anterior)
+
+        # Rolling statistics
+        FeatureSpec("rolling_mean_3m", ("y",), _rolling("mean", 3), cost=2, target_scaled=True),
+        FeatureSpec("rolling_mean_6m", ("y",), _rolling("mean", 6), cost=2, target_scaled=True),
+        FeatureSpec("rolling_std_3m", ("y",), _rolling("std", 3), cost=3, target_scaled=True),
+        FeatureSpec("rolling_min_3m", ("y",), _rolling("min", 3), cost=2, target_scaled=True),
+        FeatureSpec("rolling_max_3m", ("y",), _rolling("max", 3), cost=2, target_scaled=True),
+
+        # Seasonality (join na tabela de calendário BR: feriados móveis e datas comerciais reais)
+        FeatureSpec("month", ("ds",), _calendar("month"), dtype="int"),
+        FeatureSpec("quarter", ("ds",), _calendar("quarter"), dtype="int"),
+        FeatureSpec("is_holiday", ("ds",), _calendar("is_holiday"), dtype="bool"),
+        FeatureSpec("is_peak_season", ("ds",), _calendar("is_peak_season"), dtype="bool"),
+
+        # Trend
+        FeatureSpec("linear_trend", ("y",), lambda df, fe: pd.Series(range(len(df)), index=df.index)),
+        FeatureSpec(
+            "momentum", ("rolling_mean_3m", "rolling_mean_6m"),
+            lambda df, fe: df["rolling_mean_3m"] - df["rolling_mean_6m"],
+            target_scaled=True,
+        ),
+    ]
+}
+
 
 # Para testar localmente:
 if __name__ == "__main__":
@@ -0,0 +1,179 @@
+"""
+Fit Profiles
+Perfis nomeados de velocidade/qualidade (fast, balanced, accurate) para os ajustes
+do Prophet e do XGBoost.
+
+Um perfil fixa o teto de iterações do otimizador do Prophet (L-BFGS do Stan), os
+termos de Fourier das sazonalidades, o cálculo dos intervalos, os folds da validação
+cruzada e o número de árvores do XGBoost. 'balanced' reproduz a configuração padrão;
+'fast' serve uploads interativos e 'accurate' os processamentos noturnos em lote.
+
+Os componentes do Prophet também dependem da série (frequência e extensão): termos
+que os dados não identificam (sazonalidade semanal em séries semanais, anual com
+menos de um ano, feriados em séries não diárias ou fora do histórico) ficam de fora.
+"""
+
+import os
+from dataclasses import dataclass, field, replace
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+
+# Intervalos do Prophet: simulação (Monte Carlo), fórmula analítica ou desligados
+UNCERTAINTY_MODES = ("sampled", "analytical", "off")
+
+
+# Sazonalidade anual só com pelo menos um ciclo completo no histórico
+MIN_DAYS_FOR_YEARLY = 365
+
+
+def frequency_from_stats(n_points, span_days):
+    """
+    Frequência pelo intervalo médio entre pontos: 'daily' (≤ 2 dias), 'weekly' (≤ 10),
+    'monthly' (> 25 e ≤ 45 dias, qualquer número de pontos), 'sparse' (demais cadências,
+    ex.: quinzenal ou trimestral) ou 'unknown' (< 2 pontos). Descreve só a cadência dos
+    registros, não a intermitência da demanda (ver series_profiles).
+    Aceita escalares ou arrays (perfis de muitas séries de uma vez).
+    """
+    n_points = np.asarray(n_points)
+    avg_gap = np.asarray(span_days, dtype=float) / np.maximum(1, n_points - 1)
+    return np.select(
+        [n_points < 2, avg_gap <= 2, avg_gap <= 10, (avg_gap > 25) & (avg_gap <= 45)],
+        ["unknown", "daily", "weekly", "monthly"],
+        default="sparse",
+    )
+
+
+def series_frequency(ds: pd.Series) -> str:
+    """Frequência de uma série de datas (ver frequency_from_stats)."""
+    n_points = len(ds)
+    span_days = (ds.max() - ds.min()).days if n_points >= 2 else 0
+    return str(frequency_from_stats(n_points, span_days))
+
+
+@dataclass(frozen=True)
+class ProphetUncertainty:
+    """Como o forecast do Prophet calcula yhat_lower/yhat_upper."""
+    mode: str = "sampled"
+    samples: int = 200  # caminhos simulados no modo 'sampled' (padrão do Prophet: 1000)
+    interval_width: float = 0.8
+
+
+def prophet_uncertainty(default: Optional[ProphetUncertainty] = None) -> ProphetUncertainty:
+    """
+    Intervalos do perfil, sobrescritos por PROPHET_UNCERTAINTY / PROPHET_UNCERTAINTY_SAMPLES
+    quando definidas no ambiente.
+    """
+    default = default or ProphetUncertainty()
+    mode = os.getenv("PROPHET_UNCERTAINTY", default.mode).strip().lower()
+    if mode not in UNCERTAINTY_MODES:
+        logger.warning(f"⚠️ PROPHET_UNCERTAINTY inválido ({mode}), usando '{default.mode}'")
+        mode = default.mode
+    samples = int(os.getenv("PROPHET_UNCERTAINTY_SAMPLES", default.samples))
+    return replace(default, mode=mode, samples=max(1, samples))
+
+
+@dataclass(frozen=True)
+class FitProfile:
+    """Configuração de ajuste compartilhada por ProphetForecaster e XGBoostForecaster."""
+    name: str
+    # Prophet
+    max_iter: Optional[int]  # teto de iterações do otimizador (None = padrão do Prophet, 10000)
+    yearly_fourier_order: int  # termos da sazonalidade anual (padrão do Prophet: 10)
+    weekly_fourier_order: int  # termos da sazonalidade semanal (padrão do Prophet: 3)
+    uncertainty: ProphetUncertainty = field(default_factory=ProphetUncertainty)
+    # XGBoost
+    cv_folds: int = 3
+    n_estimators: int = 100
+
+    def prophet_config(self, ds: Optional[pd.Series] = None, weekly: bool = True) -> Dict:
+        """
+        Argumentos do construtor do Prophet (sem holidays) para a série de datas `ds`.
+
+        Sazonalidade semanal só em séries diárias; anual só com MIN_DAYS_FOR_YEARLY
+        de histórico. Sem `ds`, todos os componentes do perfil ficam ativos.
+        """
+        frequency = series_frequency(ds) if ds is not None else "daily"
+        span_days = (ds.max() - ds.min()).days if ds is not None else MIN_DAYS_FOR_YEARLY
+        return {
+            "yearly_seasonality": self.yearly_fourier_order if span_days >= MIN_DAYS_FOR_YEARLY else False,
+            "weekly_seasonality": self.weekly_fourier_order if weekly and frequency == "daily" else False,
+            "daily_seasonality": False,
+            "changepoint_prior_scale": 0.05,
+            "seasonality_prior_scale": 10.0,
+        }
+
+    @staticmethod
+    def usable_holidays(holidays: Optional[pd.DataFrame], ds: pd.Series) -> Optional[pd.DataFrame]:
+        """
+        Feriados identificáveis na série: só em séries diárias (efeito de um dia) e só os
+        que ocorrem no histórico (os demais virariam regressores sem dados). As datas
+        futuras dos feriados mantidos continuam no frame para o horizonte.
+        """
+        if holidays is None or holidays.empty or series_frequency(ds) != "daily":
+            return None
+        first_day = holidays["ds"] + pd.to_timedelta(holidays["lower_window"], unit="D")
+        last_day = holidays["ds"] + pd.to_timedelta(holidays["upper_window"], unit="D")
+        in_history = (last_day >= ds.min()) & (first_day <= ds.max())
+        names = holidays.loc[in_history, "holiday"].unique()
+        if len(names) == 0:
+            return None
+        return holidays[holidays["holiday"].isin(names)].reset_index(drop=True)
+
+    @property
+    def prophet_fit_kwargs(self) -> Dict:
+        """Argumentos extras do Prophet.fit (repassados ao otimizador do cmdstanpy)."""
+        return {"iter": self.max_iter} if self.max_iter else {}
+
+    def with_env_overrides(self) -> "FitProfile":
+        """Perfil com os intervalos sobrescritos pelo ambiente (ver prophet_uncertainty)."""
+        return replace(self, uncertainty=prophet_uncertainty(self.uncertainty))
+
+    @property
+    def xgboost_settings(self) -> Dict:
+        """Argumentos do XGBoostForecaster definidos pelo perfil."""
+        return {"n_estimators": self.n_estimators, "cv_folds": self.cv_folds}
+
+
+FIT_PROFILES: Dict[str, FitProfile] = {
+    "fast": FitProfile(
+        name="fast",
+        max_iter=200,
+        yearly_fourier_order=5,
+        weekly_fourier_order=3,
+        uncertainty=ProphetUncertainty(mode="analytical"),
+        cv_folds=2,
+        n_estimators=50,
+    ),
+    "balanced": FitProfile(
+        name="balanced",
+        max_iter=None,
+        yearly_fourier_order=10,
+        weekly_fourier_order=3,
+        uncertainty=ProphetUncertainty(mode="sampled", samples=200),
+        cv_folds=3,
+        n_estimators=100,
+    ),
+    "accurate": FitProfile(
+        name="accurate",
+        max_iter=None,
+        yearly_fourier_order=15,
+        weekly_fourier_order=4,
+        uncertainty=ProphetUncertainty(mode="sampled", samples=1000),
+        cv_folds=5,
+        n_estimators=300,
+    ),
+}
+
+DEFAULT_FIT_PROFILE = "balanced"
+
+
+def get_fit_profile(name: Optional[str] = None) -> FitProfile:
+    """Perfil pelo nome (None = 'balanced')."""
+    name = name or DEFAULT_FIT_PROFILE
+    if name not in FIT_PROFILES:
+        raise ValueError(f"Perfil de ajuste desconhecido: {name} (opções: {tuple(FIT_PROFILES)})")
+    return FIT_PROFILES[name]
@@ -0,0 +1,326 @@
+"""
+Model Registry
+Modelos treinados salvos em disco e reaproveitados entre execuções.
+
+XGBoost (formato nativo UBJSON): cada produto tem uma entrada por conjunto de
+hiperparâmetros (hash dos params):
+- modelo (.ubj) + metadados (.json: hash dos dados, linhas, métricas, colunas)
+- mesmo hash de dados → o treino é pulado
+- dados antigos são prefixo dos novos (só períodos acrescentados) → o boosting
+  continua a partir do modelo salvo; os erros fora da amostra (folds da validação e
+  períodos acrescentados, antes de cada extensão) ficam nos metadados e dão as métricas
+- espaço em disco limitado (XGBOOST_REGISTRY_MAX_MB) com remoção LRU, como no
+  cache do Prophet
+
+Prophet (serializador JSON do Prophet): modelos ajustados indexados pelo hash da
+série + configuração. Um modelo salvo gera qualquer horizonte sem novo fit (sem
+cmdstan); o cache é limitado por espaço em disco com remoção LRU. Quando a série
+muda (dias acrescentados), os parâmetros do último fit da mesma série servem de
+ponto de partida (init) para o otimizador do Stan.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from loguru import logger
+
+
+DEFAULT_REGISTRY_DIR = Path(__file__).resolve().parent.parent / ".model_registry" / "xgboost"
+DEFAULT_REGISTRY_MB = 256
+DEFAULT_PROPHET_CACHE_DIR = DEFAULT_REGISTRY_DIR.parent / "prophet"
+DEFAULT_PROPHET_CACHE_MB = 512
+
+# Hiperparâmetros que não alteram o modelo (não entram na chave)
+NON_MODEL_PARAMS = {"n_jobs", "nthread"}
+
+
+def data_hash(X: pd.DataFrame, y: pd.Series) -> str:
+    """Hash do conjunto de treino (colunas, valores das features e target)."""
+    digest = hashlib.sha1()
+    digest.update(",".join(map(str, X.columns)).encode("utf-8"))
+    digest.update(np.ascontiguousarray(X.to_numpy(dtype=np.float64)).tobytes())
+    digest.update(np.ascontiguousarray(np.asarray(y, dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+def params_hash(params: Dict) -> str:
+    """Hash dos hiperparâmetros que definem o modelo."""
+    relevant = {k: v for k, v in params.items() if k not in NON_MODEL_PARAMS}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def prophet_series_hash(df: pd.DataFrame, holidays: Optional[pd.DataFrame], config: Dict) -> str:
+    """
+    Hash de um fit do Prophet: série (ds, y), configuração do modelo e feriados que
+    afetam o histórico. Feriados só do horizonte não entram: mudar o horizonte não
+    invalida o modelo.
+    """
+    digest = hashlib.sha1()
+    digest.update(pd.to_datetime(df["ds"]).to_numpy(dtype="datetime64[ns]").view(np.int64).tobytes())
+    digest.update(np.ascontiguousarray(df["y"].to_numpy(dtype=np.float64)).tobytes())
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+    if holidays is not None and not holidays.empty:
+        first_day = holidays["ds"] + pd.to_timedelta(holidays.get("lower_window", 0), unit="D")
+        relevant = holidays[first_day <= df["ds"].max()].reset_index(drop=True)
+        digest.update(pd.util.hash_pandas_object(relevant, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def evict_lru(paths, max_bytes: int, group=lambda path: path):
+    """
+    Remove os arquivos menos usados (mtime) até o total caber em max_bytes.
+
+    Arquivos com a mesma chave de `group` (ex.: modelo + metadados) são removidos
+    juntos; o uso do grupo é o do arquivo mais recente. Temporários de escrita
+    (nome iniciado por '.') são ignorados.
+
+    Returns:
+        (grupos removidos, bytes restantes)
+    """
+    groups: Dict[Path, List] = {}
+    for path in paths:
+        if path.name.startswith("."):
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:  # removido por outro processo
+            continue
+        entry = groups.setdefault(group(path), [0.0, 0, []])
+        entry[0] = max(entry[0], stat.st_mtime)
+        entry[1] += stat.st_size
+        entry[2].append(path)
+
+    total = sum(size for _, size, _ in groups.values())
+    removed = 0
+    for _, size, files in sorted(groups.values(), key=lambda entry: entry[0]):
+        if total <= max_bytes:
+            break
+        for path in files:
+            path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed, total
+
+
+@dataclass
+class RegistryEntry:
+    """Modelo salvo + metadados."""
+    model: object  # xgb.Booster ou xgb.XGBRegressor
+    data_hash: str
+    n_rows: int
+    feature_cols: List[str]
+    mape: Optional[float]
+    mae: Optional[float]
+    n_estimators: int
+    # Alvos e previsões fora da amostra mais recentes (em ordem temporal)
+    holdout_y: List[float] = field(default_factory=list)
+    holdout_yhat: List[float] = field(default_factory=list)
+
+
+class XGBoostModelRegistry:
+    """
+    Registro em disco de modelos XGBoost por (produto, hiperparâmetros), com limite
+    de espaço e LRU.
+
+    Cada leitura atualiza o mtime da entrada; ao passar do limite, as entradas menos
+    recentes (modelo + metadados) são removidas. XGBOOST_REGISTRY_MAX_MB=0 desliga o registro.
+    """
+
+    def __init__(self, root: Optional[Path] = None, max_mb: Optional[float] = None):
+        self.root = Path(root or os.getenv("XGBOOST_REGISTRY_DIR") or DEFAULT_REGISTRY_DIR)
+        if max_mb is None:
+            max_mb = float(os.getenv("XGBOOST_REGISTRY_MAX_MB", DEFAULT_REGISTRY_MB))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _paths(self, product_id: str, key: str):
+        base = self.root / f"{product_id}-{key}"
+        return base.with_suffix(".ubj"), base.with_suffix(".json")
+
+    def load(self, product_id: str, key: str, engine: str) -> Optional[RegistryEntry]:
+        """Entrada salva para o produto/params, ou None."""
+        model_path, meta_path = self._paths(product_id, key)
+        if not self.enabled or not model_path.exists() or not meta_path.exists():
+            return None
+        try:
+            meta = json.loads(meta_path.read_text())
+            model = xgb.Booster() if engine == "native" else xgb.XGBRegressor()
+            model.load_model(model_path)
+            os.utime(model_path)  # LRU: marca como usado agora
+            os.utime(meta_path)
+        except (OSError, ValueError, xgb.core.XGBoostError) as e:
+            logger.warning(f"⚠️ Registro XGBoost ilegível para {product_id}: {e}")
+            return None
+        return RegistryEntry(
+            model=model,
+            data_hash=meta["data_hash"],
+            n_rows=meta["n_rows"],
+            feature_cols=meta["feature_cols"],
+            mape=meta.get("mape"),
+            mae=meta.get("mae"),
+            n_estimators=meta["n_estimators"],
+            holdout_y=meta.get("holdout_y", []),
+            holdout_yhat=meta.get("holdout_yhat", []),
+        )
+
+    def save(self, product_id: str, key: str, entry: RegistryEntry) -> None:
+        """Salva modelo (UBJSON) e metadados (escrita atômica) e aplica o limite de espaço."""
+        if not self.enabled:
+            return
+        model_path, meta_path = self._paths(product_id, key)
+        meta = {
+            "data_hash": entry.data_hash,
+            "n_rows": entry.n_rows,
+            "feature_cols": entry.feature_cols,
+            "mape": None if entry.mape is None else float(entry.mape),
+            "mae": None if entry.mae is None else float(entry.mae),
+            "n_estimators": int(entry.n_estimators),
+            "holdout_y": [float(v) for v in entry.holdout_y],
+            "holdout_yhat": [float(v) for v in entry.holdout_yhat],
+        }
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp_model = model_path.with_name(f".{model_path.stem}.{os.getpid()}.tmp.ubj")
+            entry.model.save_model(tmp_model)
+            os.replace(tmp_model, model_path)
+            tmp_meta = meta_path.with_name(f".{meta_path.stem}.{os.getpid()}.tmp.json")
+            tmp_meta.write_text(json.dumps(meta))
+            os.replace(tmp_meta, meta_path)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove as entradas (modelo + metadados) menos usadas até caber no limite."""
+        files = [*self.root.glob("*.ubj"), *self.root.glob("*.json")]
+        removed, total = evict_lru(files, self.max_bytes, group=lambda path: path.with_suffix(""))
+        if removed:
+            logger.debug(f"🧹 Registro XGBoost: {removed} modelos removidos (LRU), {total / 1024 / 1024:.0f} MB")
+
+
+class ProphetModelCache:
+    """
+    Cache em disco de modelos Prophet ajustados (JSON), com limite de espaço e LRU.
+
+    Cada acesso atualiza o mtime do arquivo; ao passar do limite, os modelos menos
+    recentes são removidos. PROPHET_CACHE_MAX_MB=0 desliga o cache.
+    """
+
+    def __init__(self, root: Optional[Path] = None, max_mb: Optional[float] = None):
+        self.root = Path(root or os.getenv("PROPHET_CACHE_DIR") or DEFAULT_PROPHET_CACHE_DIR)
+        if max_mb is None:
+            max_mb = float(os.getenv("PROPHET_CACHE_MAX_MB", DEFAULT_PROPHET_CACHE_MB))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def load(self, key: str):
+        """Modelo Prophet salvo para a chave, ou None."""
+        from prophet.serialize import model_from_json
+
+        path = self._path(key)
+        if not self.enabled or not path.exists():
+            return None
+        try:
+            model = model_from_json(path.read_text())
+            os.utime(path)  # LRU: marca como usado agora
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️ Cache Prophet ilegível ({key[:12]}): {e}")
+            return None
+        return model
+
+    def save(self, key: str, model) -> None:
+        """Salva o modelo (escrita atômica) e aplica o limite de espaço."""
+        from prophet.serialize import model_to_json
+
+        if not self.enabled:
+            return
+        path = self._path(key)
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.stem}.{os.getpid()}.tmp.json")
+            tmp.write_text(model_to_json(model))
+            os.replace(tmp, path)
+            self._evict()
+
+    def _params_path(self, series_key: str, config: Dict) -> Path:
+        ident = json.dumps([series_key, config], sort_keys=True, default=str)
+        return self.root / "warm_start" / f"{hashlib.sha1(ident.encode('utf-8')).hexdigest()[:20]}.json"
+
+    def load_params(self, series_key: str, config: Dict, df: pd.DataFrame) -> Optional[Dict]:
+        """
+        Parâmetros do último fit da série, reescalados para `df`, no formato do init do Prophet.
+
+        O Prophet normaliza y por max|y| e o tempo pelo intervalo de datas: k e delta
+        (inclinações) acompanham as duas escalas; m, beta e sigma_obs só a de y.
+        """
+        path = self._params_path(series_key, config)
+        if not self.enabled or not path.exists():
+            return None
+        try:
+            saved = json.loads(path.read_text())
+            os.utime(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Parâmetros Prophet ilegíveis ({series_key}): {e}")
+            return None
+
+        y_scale = float(np.abs(df["y"].to_numpy(dtype=np.float64)).max()) or 1.0
+        t_days = (df["ds"].max() - df["ds"].min()) / pd.Timedelta(days=1)
+        if t_days <= 0:
+            return None
+        y_ratio = saved["y_scale"] / y_scale
+        slope_ratio = y_ratio * t_days / saved["t_scale_days"]
+        return {
+            "k": saved["k"] * slope_ratio,
+            "m": saved["m"] * y_ratio,
+            "sigma_obs": saved["sigma_obs"] * y_ratio,
+            "delta": np.asarray(saved["delta"]) * slope_ratio,
+            "beta": np.asarray(saved["beta"]) * y_ratio,
+        }
+
+    def save_params(self, series_key: str, config: Dict, model) -> None:
+        """Guarda os parâmetros ajustados (MAP) da série para o próximo warm start."""
+        if not self.enabled:
+            return
+        params = {
+            "k": float(np.ravel(model.params["k"])[0]),
+            "m": float(np.ravel(model.params["m"])[0]),
+            "sigma_obs": float(np.ravel(model.params["sigma_obs"])[0]),
+            "delta": np.ravel(model.params["delta"][0]).tolist(),
+            "beta": np.ravel(model.params["beta"][0]).tolist(),
+            "y_scale": float(model.y_scale),
+            "t_scale_days": model.t_scale / pd.Timedelta(days=1),
+        }
+        path = self._params_path(series_key, config)
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.stem}.{os.getpid()}.tmp.json")
+            tmp.write_text(json.dumps(params))
+            os.replace(tmp, path)
+
+    def _evict(self) -> None:
+        """Remove os modelos (e parâmetros de warm start) menos usados até caber no limite."""
+        removed, total = evict_lru(self.root.rglob("*.json"), self.max_bytes)
+        if removed:
+            logger.debug(f"🧹 Cache Prophet: {removed} modelos removidos (LRU), {total / 1024 / 1024:.0f} MB")
+
+
+# Instâncias globais
+xgboost_registry = XGBoostModelRegistry()
+prophet_model_cache = ProphetModelCache()
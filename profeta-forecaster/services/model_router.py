@@ -5,8 +5,11 @@ Selects the best forecasting model based on context and product metrics.
 from typing import Literal, Dict, Any, List, Optional
 from dataclasses import dataclass
 import numpy as np
+import pandas as pd
 
-ModelType = Literal['prophet', 'xgboost', 'ensemble']
+from services.cpu_budget import cpu_budget
+
+ModelType = Literal['prophet', 'prophet_lite', 'xgboost', 'ensemble', 'baseline', 'intermittent']
 TimeHorizon = Literal[30, 60, 90]
 
 
@@ -30,12 +33,26 @@ class ModelRouter:
     XGBOOST_GOOD_THRESHOLD = 60.0       # MAPE < 60% = usable
     PROPHET_UNUSABLE_THRESHOLD = 500.0  # MAPE > 500% = unusable
 
+    # Per-product model plan: which models are worth training for a series
+    PROPHET_MIN_POINTS = 90                  # enough points to capture seasonality
+    PROPHET_FREQUENCIES = ('daily', 'weekly')
+    PROPHET_MIN_BACKTEST_POINTS = 20         # series that also get a backtest fit
+    XGBOOST_MIN_POINTS = 3                   # feature engineering minimum
+    XGBOOST_MIN_SPAN_DAYS = 59               # ~3 monthly feature rows after resampling
+    # Series whose average demand interval (ADI, in periods of their own regular grid) is
+    # above this (> 60% of periods without demand) go to Croston/SBA/TSB instead of the models
+    INTERMITTENT_DEMAND_INTERVAL = 2.5
+    # Worker-seconds per task until the section has been measured by the CPU budget
+    DEFAULT_TASK_SECONDS = {'prophet_products': 1.0, 'xgboost': 0.5}
+
     def select_model(
         self,
         xgboost_mape: Optional[float],
         prophet_mape: Optional[float],
         time_horizon: TimeHorizon,
-        context: str = 'forecast'  # 'forecast', 'action', 'trend', 'seasonality'
+        context: str = 'forecast',  # 'forecast', 'action', 'trend', 'seasonality'
+        prophet_lite_mape: Optional[float] = None,
+        baseline_mape: Optional[float] = None,
     ) -> ModelSelection:
         """
         Select the best model based on context and metrics.
@@ -45,10 +62,26 @@ class ModelRouter:
             prophet_mape: Prophet MAPE (%)
             time_horizon: 30, 60, or 90 days
             context: What we're using the model for
+            prophet_lite_mape: Prophet-lite MAPE (%), if the batched engine ran
+            baseline_mape: MAPE (%) of the best cheap baseline (seasonal naive, MA, SES)
 
         Returns:
             ModelSelection with model, confidence, reason, and weights
         """
+        # Baseline wins outright when no model beats it (or it is the only one evaluated)
+        if baseline_mape is not None:
+            model_mapes = [m for m in (xgboost_mape, prophet_mape, prophet_lite_mape) if m is not None]
+            if not model_mapes or baseline_mape <= min(model_mapes):
+                return ModelSelection(
+                    model='baseline',
+                    confidence=0.7 if model_mapes else 0.6,
+                    reason=f'Baseline com menor MAPE ({baseline_mape:.1f}%)'
+                )
+
+        # Prophet and Prophet-lite share the seasonal role: the more accurate one competes
+        if prophet_lite_mape is not None and (prophet_mape is None or prophet_lite_mape < prophet_mape):
+            selection = self.select_model(xgboost_mape, prophet_lite_mape, time_horizon, context)
+            return self._as_prophet_lite(selection)
 
         # Handle missing data
         if xgboost_mape is None and prophet_mape is None:
@@ -86,6 +119,79 @@ class ModelRouter:
             time_horizon
         )
 
+    def plan_models(self, profiles: pd.DataFrame) -> pd.DataFrame:
+        """
+        Decide per series which models to train, from the vectorized series profiles.
+
+        Args:
+            profiles: One row per series (services.series_profiles.profile_series)
+
+        Returns:
+            DataFrame with the profiles' index and columns prophet, xgboost, intermittent
+            (bool), est_seconds (estimated worker-seconds of the planned fits) and reason.
+            Intermittent series train no model: the vectorized Croston/SBA/TSB engine is
+            their default (its cost is negligible and not estimated)
+        """
+        n_points = profiles['n_points'].to_numpy()
+        frequency = profiles['frequency'].to_numpy().astype(str)
+        demand_interval = profiles['demand_interval'].to_numpy(dtype=float)
+
+        intermittent = (n_points >= 2) & (demand_interval > self.INTERMITTENT_DEMAND_INTERVAL)
+        prophet_frequency = np.isin(frequency, self.PROPHET_FREQUENCIES)
+        enough_points = n_points >= self.PROPHET_MIN_POINTS
+        prophet = prophet_frequency & enough_points & ~intermittent
+        xgboost = (
+            (n_points >= self.XGBOOST_MIN_POINTS)
+            & (profiles['span_days'].to_numpy() >= self.XGBOOST_MIN_SPAN_DAYS)
+            & ~intermittent
+        )
+
+        # Prophet: fit + backtest fit per series; XGBoost: one training (with validation)
+        prophet_tasks = np.where(prophet, 1 + (n_points >= self.PROPHET_MIN_BACKTEST_POINTS), 0)
+        est_seconds = (
+            prophet_tasks * self.task_seconds('prophet_products')
+            + xgboost * self.task_seconds('xgboost')
+        )
+
+        reason = np.select(
+            [intermittent, prophet, ~prophet_frequency, ~enough_points],
+            [
+                'Demanda intermitente (Croston/SBA/TSB)',
+                'Prophet + XGBoost',
+                np.char.add('Dados ', frequency),
+                np.char.add(n_points.astype(str), ' pontos (< 90)'),
+            ],
+            default='',
+        )
+        reason = np.where(prophet | xgboost | intermittent, reason, np.char.add(reason, ', sem XGBoost'))
+        return pd.DataFrame(
+            {
+                'prophet': prophet,
+                'xgboost': xgboost,
+                'intermittent': intermittent,
+                'est_seconds': est_seconds,
+                'reason': reason,
+            },
+            index=profiles.index,
+        )
+
+    def task_seconds(self, section: str) -> float:
+        """Measured worker-seconds per task of a section, or the default prior."""
+        measured = cpu_budget.seconds_per_task(section)
+        return measured if measured is not None else self.DEFAULT_TASK_SECONDS[section]
+
+    def _as_prophet_lite(self, selection: ModelSelection) -> ModelSelection:
+        """Relabel a selection made with Prophet-lite's MAPE in the Prophet slot."""
+        weights = selection.weights
+        if weights and 'prophet' in weights:
+            weights = {('prophet_lite' if name == 'prophet' else name): w for name, w in weights.items()}
+        return ModelSelection(
+            model='prophet_lite' if selection.model == 'prophet' else selection.model,
+            confidence=selection.confidence,
+            reason=selection.reason.replace('Prophet', 'Prophet-lite'),
+            weights=weights,
+        )
+
     def _select_for_forecast(
         self,
         xgboost_mape: float,
@@ -293,3 +399,45 @@ class ModelRouter:
 
 # Global instance
 model_router = ModelRouter()
+
+
+# Routing check (python -m services.model_router)
+if __name__ == "__main__":
+    from services.series_profiles import profile_series, stack_series
+
+    rng = np.random.default_rng(0)
+    daily = pd.date_range('2023-01-01', periods=400, freq='D')
+    sold = rng.random(len(daily)) < 0.15
+    series = {
+        'monthly_48': pd.DataFrame({'ds': pd.date_range('2020-01-01', periods=48, freq='MS'), 'y': rng.poisson(200, 48)}),
+        'biweekly_60': pd.DataFrame({'ds': pd.date_range('2022-01-03', periods=60, freq='14D'), 'y': rng.poisson(40, 60)}),
+        'daily_dense': pd.DataFrame({'ds': daily, 'y': rng.poisson(5, len(daily))}),
+        'daily_sale_days_only': pd.DataFrame({'ds': daily[sold], 'y': rng.poisson(3, sold.sum()) + 1}),
+        'daily_mostly_zero': pd.DataFrame({'ds': daily, 'y': np.where(sold, 3, 0)}),
+    }
+    # Dense series with one record off their grid (2 days after a month start, mid-week)
+    monthly = pd.date_range('2020-01-01', periods=48, freq='MS')
+    series['monthly_48_off_grid'] = pd.DataFrame({
+        'ds': monthly.insert(20, monthly[19] + pd.Timedelta(days=2)), 'y': rng.poisson(200, 49),
+    })
+    weekly = pd.date_range('2022-01-02', periods=104, freq='W')
+    series['weekly_104_off_grid'] = pd.DataFrame({
+        'ds': weekly.insert(51, weekly[50] + pd.Timedelta(days=3)), 'y': rng.poisson(30, 105),
+    })
+    expected = {
+        'monthly_48': (False, True, False),
+        'biweekly_60': (False, True, False),
+        'daily_dense': (True, True, False),
+        'daily_sale_days_only': (False, False, True),
+        'daily_mostly_zero': (False, False, True),
+        'monthly_48_off_grid': (False, True, False),
+        'weekly_104_off_grid': (True, True, False),
+    }
+
+    profiles = profile_series(stack_series(series))
+    plan = model_router.plan_models(profiles)
+    print(profiles[['n_points', 'frequency', 'grid_step', 'demand_interval']].join(plan[['reason']]).to_string())
+    for key, (prophet, xgboost, intermittent) in expected.items():
+        row = plan.loc[key]
+        assert (row['prophet'], row['xgboost'], row['intermittent']) == (prophet, xgboost, intermittent), (key, row.to_dict())
+    print("✅ Plano de modelos conforme esperado")
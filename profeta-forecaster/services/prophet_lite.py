@@ -0,0 +1,299 @@
+"""
+Prophet-lite
+Motor NumPy com o modelo aditivo do Prophet (tendência linear por partes + termos de
+Fourier anual/semanal + dummies de feriados), ajustado para muitas séries de uma vez.
+
+Em vez de uma otimização do Stan por série, o MAP vira mínimos quadrados regularizados
+(priors gaussianos: L2 nos changepoints, sazonalidades e feriados). Séries com a mesma
+grade de datas compartilham a matriz de design X e a matriz de Gram X'X; cada série só
+muda o peso da regularização (ruído estimado), e todos os sistemas p×p de um grupo são
+resolvidos em um único np.linalg.solve em lote.
+
+A configuração (ordens de Fourier, escalas dos priors, feriados identificáveis) vem do
+mesmo FitProfile usado pelo Prophet; os intervalos usam a fórmula analítica do backend.
+"""
+
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from services.fit_profiles import FitProfile, get_fit_profile, series_frequency
+
+
+# Mesmos padrões do Prophet
+N_CHANGEPOINTS = 25
+CHANGEPOINT_RANGE = 0.8
+HOLIDAYS_PRIOR_SCALE = 10.0
+YEARLY_PERIOD = 365.25
+WEEKLY_PERIOD = 7.0
+
+# Ruído (em escala de y / max|y|) da primeira passada, antes de estimar o de cada série
+INITIAL_NOISE = 0.1
+
+_EPOCH = pd.Timestamp("1970-01-01")
+
+
+def _fourier(days: np.ndarray, period: float, order: int) -> np.ndarray:
+    """Termos de Fourier (sin, cos) de ordem 1..order, como em Prophet.fourier_series."""
+    x = 2 * np.pi * np.outer(days, np.arange(1, order + 1)) / period
+    return np.hstack([np.sin(x), np.cos(x)])
+
+
+def _holiday_dummies(dates: pd.DatetimeIndex, holidays: Optional[pd.DataFrame]) -> np.ndarray:
+    """Uma coluna por feriado: 1 nos dias dentro da janela (lower_window..upper_window)."""
+    if holidays is None or holidays.empty:
+        return np.empty((len(dates), 0))
+    columns = []
+    for _, rows in holidays.groupby("holiday", sort=True):
+        days = [
+            rows["ds"] + pd.Timedelta(days=offset)
+            for offset in range(int(rows["lower_window"].min()), int(rows["upper_window"].max()) + 1)
+        ]
+        columns.append(dates.isin(pd.concat(days)).astype(float))
+    return np.column_stack(columns)
+
+
+class _DesignMatrix:
+    """Colunas do modelo para uma grade de datas de histórico (compartilhada entre séries)."""
+
+    def __init__(self, ds: pd.Series, holidays: Optional[pd.DataFrame], profile: FitProfile):
+        config = profile.prophet_config(ds)
+        self.start = ds.min()
+        self.t_scale = max((ds.max() - self.start).days, 1)
+        self.yearly = config["yearly_seasonality"]
+        self.weekly = config["weekly_seasonality"]
+        self.holidays = profile.usable_holidays(holidays, ds)
+
+        # Changepoints uniformes nos primeiros 80% do histórico (Prophet.set_changepoints)
+        t = self.t(ds)
+        hist_size = int(np.floor(len(ds) * CHANGEPOINT_RANGE))
+        n_changepoints = min(N_CHANGEPOINTS, max(hist_size - 1, 0))
+        cp_index = np.linspace(0, hist_size - 1, n_changepoints + 1).round().astype(int)[1:]
+        self.changepoints_t = t[cp_index] if n_changepoints else np.empty(0)
+
+        # Variâncias a priori de cada coluna (np.inf = sem regularização)
+        n_holidays = self.holidays["holiday"].nunique() if self.holidays is not None else 0
+        self.prior_variance = np.concatenate([
+            [np.inf, np.inf],  # m, k
+            np.full(len(self.changepoints_t), 2 * config["changepoint_prior_scale"] ** 2),  # Laplace(b): var 2b²
+            np.full(2 * (self.yearly or 0) + 2 * (self.weekly or 0), config["seasonality_prior_scale"] ** 2),
+            np.full(n_holidays, HOLIDAYS_PRIOR_SCALE ** 2),
+        ])
+        self.X = self.columns(ds)
+
+    def t(self, ds: pd.Series) -> np.ndarray:
+        """Tempo normalizado: 0 no início do histórico, 1 no fim."""
+        return ((ds - self.start).dt.total_seconds() / 86400 / self.t_scale).to_numpy(dtype=float)
+
+    def columns(self, ds: pd.Series) -> np.ndarray:
+        """X para datas quaisquer (histórico ou futuro), com as colunas do ajuste."""
+        t = self.t(ds)
+        days = ((ds - _EPOCH).dt.total_seconds() / 86400).to_numpy(dtype=float)
+        blocks = [np.ones((len(t), 1)), t[:, None], np.maximum(t[:, None] - self.changepoints_t[None, :], 0)]
+        if self.yearly:
+            blocks.append(_fourier(days, YEARLY_PERIOD, self.yearly))
+        if self.weekly:
+            blocks.append(_fourier(days, WEEKLY_PERIOD, self.weekly))
+        blocks.append(_holiday_dummies(pd.DatetimeIndex(ds), self.holidays))
+        return np.hstack(blocks)
+
+    @property
+    def n_trend(self) -> int:
+        """Colunas da tendência (m, k, deltas): o componente 'trend' do forecast."""
+        return 2 + len(self.changepoints_t)
+
+
+class ProphetLite:
+    """Ajuste em lote do modelo aditivo do Prophet para séries diárias/semanais (ds, y)."""
+
+    def _fit_group(self, design: _DesignMatrix, Y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        MAP gaussiano de todas as séries da grade: (X'X + σ²·Λ) β = X'y por série.
+
+        A matriz de Gram é comum ao grupo; σ² (ruído de cada série) entra só na diagonal.
+        Duas passadas: ruído nominal e depois o ruído residual de cada série.
+
+        Returns:
+            (betas (k, p), sigma (k,)) em escala de y / max|y|
+        """
+        X = design.X
+        gram = X.T @ X
+        xty = (X.T @ Y).T[:, :, None]  # (k, p, 1)
+        penalty = np.where(np.isfinite(design.prior_variance), 1 / design.prior_variance, 1e-8)
+
+        sigma2 = np.full(Y.shape[1], INITIAL_NOISE ** 2)
+        for _ in range(2):
+            A = gram[None, :, :] + sigma2[:, None, None] * np.diag(penalty)[None, :, :]
+            betas = np.linalg.solve(A, xty)[:, :, 0]
+            residuals = Y - X @ betas.T
+            sigma2 = np.maximum(np.mean(residuals ** 2, axis=0), 1e-8)
+        return betas, np.sqrt(sigma2)
+
+    def _predict_group(
+        self,
+        design: _DesignMatrix,
+        frames: Dict[str, pd.DataFrame],
+        future_ds: pd.Series,
+        profile: FitProfile,
+    ) -> Dict[str, pd.DataFrame]:
+        """Ajusta as séries da grade e prevê `future_ds` (colunas do forecast do Prophet)."""
+        keys = list(frames)
+        y = np.column_stack([frames[key]["y"].to_numpy(dtype=float) for key in keys])
+        y_scale = np.abs(y).max(axis=0)
+        y_scale[y_scale == 0] = 1.0
+        betas, sigma = self._fit_group(design, y / y_scale)
+
+        Xf = design.columns(future_ds)
+        yhat = (Xf @ betas.T) * y_scale
+        trend = (Xf[:, :design.n_trend] @ betas[:, :design.n_trend].T) * y_scale
+
+        # Intervalos analíticos (como services.executor_backend._analytical_intervals):
+        # ruído de observação + mudanças futuras de tendência à taxa dos changepoints
+        uncertainty = profile.uncertainty
+        if uncertainty.mode == "off":
+            spread = np.zeros_like(yhat)
+        else:
+            t = design.t(future_ds)
+            steps = np.cumsum(t > 1)[:, None]
+            step = 1 / design.t_scale
+            deltas = betas[:, 2:design.n_trend]
+            mean_delta = (np.mean(np.abs(deltas), axis=1) if deltas.size else np.zeros(len(keys))) + 1e-8
+            change_likelihood = len(design.changepoints_t) * step
+            trend_var = step ** 2 * change_likelihood * 2 * mean_delta[None, :] ** 2 * steps * (steps + 1) * (2 * steps + 1) / 6
+            z = NormalDist().inv_cdf(0.5 + uncertainty.interval_width / 2)
+            spread = z * y_scale * np.sqrt(sigma[None, :] ** 2 + trend_var)
+
+        forecasts = {}
+        for i, key in enumerate(keys):
+            forecast = pd.DataFrame({
+                "ds": future_ds.to_numpy(),
+                "yhat": yhat[:, i],
+                "yhat_lower": yhat[:, i] - spread[:, i],
+                "yhat_upper": yhat[:, i] + spread[:, i],
+                "trend": trend[:, i],
+            })
+            forecast.attrs.update(
+                engine="prophet_lite",
+                frequency=series_frequency(frames[key]["ds"]),
+                n_params=design.X.shape[1],
+                n_changepoints=len(design.changepoints_t),
+            )
+            forecasts[key] = forecast
+        return forecasts
+
+    @staticmethod
+    def _grid_groups(frames: Dict[str, pd.DataFrame], extra: Optional[Dict[str, pd.Series]] = None) -> Dict[bytes, List[str]]:
+        """Agrupa as séries pela grade de datas (e pelas datas a prever, se dadas)."""
+        groups: Dict[bytes, List[str]] = {}
+        for key, df in frames.items():
+            grid = df["ds"].to_numpy(dtype="datetime64[ns]").tobytes()
+            if extra is not None:
+                grid += extra[key].to_numpy(dtype="datetime64[ns]").tobytes()
+            groups.setdefault(grid, []).append(key)
+        return groups
+
+    def forecast(
+        self,
+        series: Dict[str, pd.DataFrame],
+        periods: int,
+        holidays: Optional[pd.DataFrame],
+        profile: Optional[FitProfile] = None,
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Ajusta todas as séries e prevê `periods` dias após o fim de cada uma.
+
+        Returns:
+            {chave: forecast com ds, yhat, yhat_lower, yhat_upper, trend (só datas futuras)}
+        """
+        profile = profile or get_fit_profile()
+        frames = {key: df[["ds", "y"]].reset_index(drop=True) for key, df in series.items() if len(df) >= 2}
+        forecasts = {}
+        for keys in self._grid_groups(frames).values():
+            ds = frames[keys[0]]["ds"]
+            future_ds = pd.Series(pd.date_range(ds.max() + pd.Timedelta(days=1), periods=periods, freq="D"))
+            forecasts.update(
+                self._predict_group(_DesignMatrix(ds, holidays, profile), {key: frames[key] for key in keys}, future_ds, profile)
+            )
+        return forecasts
+
+    def backtest(
+        self,
+        series: Dict[str, pd.DataFrame],
+        validation_sizes: Dict[str, int],
+        holidays: Optional[pd.DataFrame],
+        profile: Optional[FitProfile] = None,
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Backtest em lote: ajusta sem os últimos validation_sizes[chave] pontos e prevê esse trecho.
+
+        Returns:
+            {chave: DataFrame com ds, y (real) e yhat (previsto) do período de validação}
+        """
+        profile = profile or get_fit_profile()
+        train, validation = {}, {}
+        for key, df in series.items():
+            size = validation_sizes.get(key, 0)
+            if size <= 0 or len(df) - size < 2:
+                continue
+            train[key] = df.iloc[:-size][["ds", "y"]].reset_index(drop=True)
+            validation[key] = df.iloc[-size:][["ds", "y"]].reset_index(drop=True)
+
+        backtests = {}
+        for keys in self._grid_groups(train, {key: df["ds"] for key, df in validation.items()}).values():
+            future_ds = validation[keys[0]]["ds"]
+            design = _DesignMatrix(train[keys[0]]["ds"], holidays, profile)
+            predicted = self._predict_group(design, {key: train[key] for key in keys}, future_ds, profile)
+            for key in keys:
+                backtests[key] = validation[key].assign(yhat=predicted[key]["yhat"].to_numpy())
+        return backtests
+
+
+# Instância global
+prophet_lite = ProphetLite()
+
+
+if __name__ == "__main__":
+    import time
+
+    from services.calendar_features import BrazilianCalendar
+    from services.executor_backend import backtest_prophet
+
+    # Benchmark: Prophet (Stan, uma série por vez) vs Prophet-lite (lote) no mesmo backtest
+    logger.remove()
+    import logging
+    logging.getLogger("cmdstanpy").disabled = True
+
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2023-01-01", periods=730, freq="D")
+    day = np.arange(len(dates))
+    catalog = {}
+    for i in range(40):
+        level = rng.uniform(5, 50)
+        y = (
+            level * (1 + 0.0005 * rng.normal() * day)
+            + level * 0.3 * np.sin(2 * np.pi * day / 365.25 + rng.uniform(0, 6))
+            + level * 0.2 * (dates.dayofweek >= 5)
+            + rng.normal(0, level * 0.15, len(day))
+        )
+        catalog[f"p{i}"] = pd.DataFrame({"ds": dates, "y": np.maximum(y, 0)})
+    holidays = BrazilianCalendar("2023-01-01", "2025-12-31").prophet_holidays()
+    sizes = {key: max(6, len(df) // 4) for key, df in catalog.items()}
+
+    def mape(frame):
+        mask = frame["y"] > 0
+        return float(np.mean(np.abs(frame["y"][mask] - frame["yhat"][mask]) / frame["y"][mask]) * 100)
+
+    start = time.time()
+    lite = prophet_lite.backtest(catalog, sizes, holidays)
+    lite_sec = time.time() - start
+
+    subset = list(catalog)[:8]  # Stan: amostra (uma otimização por série)
+    start = time.time()
+    stan = {key: backtest_prophet(catalog[key], sizes[key], holidays) for key in subset}
+    stan_sec = (time.time() - start) / len(subset) * len(catalog)
+
+    print(f"Prophet-lite: {lite_sec:6.2f}s para {len(catalog)} séries | MAPE médio={np.mean([mape(lite[k]) for k in subset]):.1f}%")
+    print(f"Prophet/Stan: {stan_sec:6.2f}s (estimado) para {len(catalog)} séries | MAPE médio={np.mean([mape(stan[k]) for k in subset]):.1f}%")
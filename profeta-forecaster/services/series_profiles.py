@@ -0,0 +1,142 @@
+"""
+Series Profiles
+Perfil de todas as séries de uma análise em uma passada vetorizada: pontos, extensão,
+intervalo médio, proporção de zeros, volume, frequência, intervalo médio entre demandas e
+os limites usados pelos clamps e validações (máximo, mínimo, média recente, máximo mensal).
+
+A intermitência é medida na grade regular da própria série (passo = menor intervalo comum
+entre registros, ver GRID_STEP_MIN_SHARE): períodos da grade sem registro contam como sem
+demanda, então séries só com os dias de venda registrados são intermitentes e séries
+mensais, semanais ou quinzenais densas não — mesmo com um registro fora da grade.
+
+As séries são agregadas por um groupby sobre um DataFrame longo (chave, ds, y) — o próprio
+sales_df ou as séries empilhadas. A tabela resultante (uma linha por série) alimenta o plano
+de modelos do router; cada linha vira um SeriesProfile consumido pelos clamps e validações
+do forecaster, sem reler o histórico do produto.
+"""
+
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from services.fit_profiles import frequency_from_stats
+
+
+PROFILE_COLUMNS = (
+    "n_points", "first_date", "last_date", "span_days", "avg_gap", "zero_ratio", "total", "frequency",
+    "max_value", "min_value", "recent_mean", "max_monthly", "grid_step", "demand_interval",
+)
+
+# Pontos finais usados na média recente (mesma janela do histórico exibido)
+RECENT_POINTS = 30
+
+# Passo da grade: menor intervalo com pelo menos esta fração dos intervalos da série (e 2
+# ocorrências), para que registros avulsos fora da grade não a refinem; sem nenhum, o mais comum
+GRID_STEP_MIN_SHARE = 0.05
+
+
+@dataclass(frozen=True)
+class SeriesProfile:
+    """Estatísticas de uma série calculadas uma vez por execução."""
+    n_points: int
+    first_date: pd.Timestamp
+    last_date: pd.Timestamp
+    span_days: int
+    avg_gap: float
+    zero_ratio: float
+    total: float
+    frequency: str
+    max_value: float
+    min_value: float
+    recent_mean: float
+    max_monthly: float
+    grid_step: float
+    demand_interval: float
+
+    @property
+    def is_monthly(self) -> bool:
+        return self.frequency == "monthly"
+
+
+def stack_series(series: Dict[str, pd.DataFrame], key_column: str = "key") -> pd.DataFrame:
+    """DataFrame longo (key_column, ds, y) com todas as séries de {chave: DataFrame ds, y}."""
+    frames = [df for df in series.values()]
+    return pd.DataFrame({
+        key_column: np.repeat(list(series), [len(df) for df in frames]),
+        "ds": np.concatenate([df["ds"].to_numpy(dtype="datetime64[ns]") for df in frames]) if frames else [],
+        "y": np.concatenate([df["y"].to_numpy(dtype=float) for df in frames]) if frames else [],
+    })
+
+
+def profile_series(long_df: pd.DataFrame, key_column: str = "key") -> pd.DataFrame:
+    """
+    Perfil de cada série de um DataFrame longo (key_column, ds, y) em um único groupby.
+
+    Returns:
+        DataFrame indexado pela chave com PROFILE_COLUMNS
+    """
+    if long_df.empty:
+        return pd.DataFrame(columns=list(PROFILE_COLUMNS))
+
+    long_df = long_df[[key_column, "ds", "y"]].sort_values([key_column, "ds"], kind="stable")
+    keys = long_df[key_column]
+    grouped = long_df.groupby(keys, sort=False)
+    profiles = grouped.agg(
+        n_points=("ds", "size"),
+        first_date=("ds", "min"),
+        last_date=("ds", "max"),
+        total=("y", "sum"),
+        max_value=("y", "max"),
+        min_value=("y", "min"),
+    )
+    profiles["zero_ratio"] = long_df["y"].eq(0).groupby(keys, sort=False).mean()
+    profiles["recent_mean"] = grouped.tail(RECENT_POINTS).groupby(key_column, sort=False)["y"].mean()
+    profiles["max_monthly"] = (
+        long_df.groupby([keys, long_df["ds"].dt.to_period("M")], sort=False)["y"].sum()
+        .groupby(level=0, sort=False).max()
+    )
+    profiles["span_days"] = (profiles["last_date"] - profiles["first_date"]).dt.days
+    profiles["avg_gap"] = profiles["span_days"] / np.maximum(1, profiles["n_points"] - 1)
+
+    # Intervalo médio entre demandas (ADI) em períodos da grade regular da série
+    gaps = grouped["ds"].diff().dt.days
+    positive_gaps = gaps > 0
+    gap_counts = (
+        pd.DataFrame({"key": keys[positive_gaps], "gap": gaps[positive_gaps]})
+        .value_counts()
+        .reset_index(name="count")
+    )
+    share = gap_counts["count"] / gap_counts.groupby("key")["count"].transform("sum")
+    common = gap_counts[(gap_counts["count"] >= 2) & (share >= GRID_STEP_MIN_SHARE)]
+    modal = gap_counts.sort_values(["count", "gap"], ascending=[False, True], kind="stable")
+    profiles["grid_step"] = (
+        common.groupby("key")["gap"].min()
+        .combine_first(modal.drop_duplicates("key").set_index("key")["gap"])
+    )
+    grid_step = profiles["grid_step"].to_numpy(dtype=float)
+    grid_periods = np.where(
+        grid_step > 0,
+        np.floor(profiles["span_days"].to_numpy() / np.where(grid_step > 0, grid_step, 1) + 0.5) + 1,
+        profiles["n_points"].to_numpy(),
+    )
+    demand_points = long_df["y"].gt(0).groupby(keys, sort=False).sum().to_numpy()
+    profiles["demand_interval"] = np.where(
+        demand_points > 0, grid_periods / np.maximum(demand_points, 1), np.inf
+    )
+    profiles["frequency"] = frequency_from_stats(profiles["n_points"].to_numpy(), profiles["span_days"].to_numpy())
+    return profiles[list(PROFILE_COLUMNS)]
+
+
+def series_profiles(profiles: pd.DataFrame) -> Dict[str, SeriesProfile]:
+    """{chave: SeriesProfile} a partir da tabela de profile_series."""
+    return {
+        key: SeriesProfile(*row)
+        for key, row in zip(profiles.index, profiles[list(PROFILE_COLUMNS)].itertuples(index=False, name=None))
+    }
+
+
+def profile_frame(df: pd.DataFrame) -> SeriesProfile:
+    """SeriesProfile de uma única série (ex.: agregado de categoria)."""
+    return series_profiles(profile_series(stack_series({"series": df})))["series"]
@@ -5,7 +5,7 @@ Treina modelos por produto usando features engineered
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
 import xgboost as xgb
 from sklearn.model_selection import TimeSeriesSplit
@@ -14,18 +14,79 @@ from loguru import logger
 import pickle
 import base64
 
+from services.feature_engineer import FEATURE_REGISTRY, FeatureEngineer
+from services.model_registry import RegistryEntry, XGBoostModelRegistry, data_hash, params_hash
+
+
+# Features na escala do target (lags, médias móveis): normalizadas por produto no modelo global
+TARGET_SCALED_COLUMNS = {name for name, spec in FEATURE_REGISTRY.items() if spec.target_scaled}
+
+# Modelo treinado: Booster (engine nativo) ou XGBRegressor (engine sklearn)
+XGBModel = Union[xgb.Booster, xgb.XGBRegressor]
+
+# Feature do horizonte (em meses) na estratégia direta
+HORIZON_COLUMN = "horizon"
+
 
 class XGBoostForecaster:
     """Serviço de forecasting com XGBoost."""
 
-    def __init__(self):
-        """Inicializa o forecaster XGBoost."""
+    # 'native': xgboost.train + DMatrix (hist), matriz montada uma vez e fatiada por fold
+    # 'sklearn': wrapper XGBRegressor com DataFrames (modo de compatibilidade)
+    ENGINES = ("native", "sklearn")
+
+    # Árvores acrescentadas ao continuar o boosting de um modelo do registro
+    EXTEND_ROUNDS = 10
+    # Linhas fora da amostra mais recentes guardadas no registro para as métricas das extensões
+    EXTEND_SCORE_WINDOW = 12
+
+    # 'recursive': cada previsão realimenta lag_1/lag_3 e médias móveis
+    # 'direct': um modelo com o horizonte como feature, todos os horizontes em um predict
+    STRATEGIES = ("recursive", "direct")
+
+    # Horizontes treinados na estratégia direta (3 meses = 30/60/90 dias)
+    DIRECT_HORIZONS = 3
+
+    def __init__(
+        self,
+        feature_set: str = "full",
+        engine: str = "native",
+        nthread: Optional[int] = None,
+        early_stopping_rounds: Optional[int] = 10,
+        strategy: str = "recursive",
+        n_estimators: int = 100,
+        cv_folds: int = 3,
+    ):
+        """
+        Inicializa o forecaster XGBoost.
+
+        Args:
+            feature_set: Conjunto de features do modelo (FeatureEngineer.FEATURE_SETS)
+            engine: 'native' (xgboost.train/DMatrix) ou 'sklearn' (XGBRegressor)
+            nthread: Threads OpenMP por modelo (None = todas as CPUs; ver services.cpu_budget)
+            early_stopping_rounds: Paciência do early stopping no último fold da validação
+                (None = sempre n_estimators árvores)
+            strategy: 'recursive' ou 'direct' (multi-horizonte, ver STRATEGIES)
+            n_estimators: Máximo de árvores (ver services.fit_profiles)
+            cv_folds: Folds da validação cruzada temporal
+        """
+        if engine not in self.ENGINES:
+            raise ValueError(f"Engine XGBoost desconhecido: {engine} (opções: {self.ENGINES})")
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Estratégia XGBoost desconhecida: {strategy} (opções: {self.STRATEGIES})")
+        self.strategy = strategy
+        self.feature_set = feature_set
+        self.engine = engine
+        self.early_stopping_rounds = early_stopping_rounds
+        self.cv_folds = cv_folds
+        self.feature_columns = FeatureEngineer.feature_names(feature_set)
+
         # Hiperparâmetros otimizados para forecasting
         self.params = {
             "objective": "reg:squarederror",
             "max_depth": 4,
             "learning_rate": 0.1,
-            "n_estimators": 100,
+            "n_estimators": n_estimators,
             "min_child_weight": 3,
             "subsample": 0.8,
             "colsample_bytree": 0.8,
@@ -33,8 +94,117 @@ class XGBoostForecaster:
             "reg_alpha": 0.1,
             "reg_lambda": 1.0,
             "random_state": 42,
+            "n_jobs": nthread,
         }
 
+    @property
+    def native_params(self) -> Dict:
+        """Hiperparâmetros no formato do xgboost.train (sem n_estimators, que vira num_boost_round)."""
+        return {
+            "objective": self.params["objective"],
+            "tree_method": "hist",
+            "max_depth": self.params["max_depth"],
+            "eta": self.params["learning_rate"],
+            "min_child_weight": self.params["min_child_weight"],
+            "subsample": self.params["subsample"],
+            "colsample_bytree": self.params["colsample_bytree"],
+            "gamma": self.params["gamma"],
+            "alpha": self.params["reg_alpha"],
+            "lambda": self.params["reg_lambda"],
+            "seed": self.params["random_state"],
+            **({"nthread": self.params["n_jobs"]} if self.params["n_jobs"] else {}),
+        }
+
+    def _build_matrix(self, X: pd.DataFrame, y: pd.Series, sliceable: bool = True) -> Optional[xgb.DMatrix]:
+        """
+        Monta a matriz do engine nativo uma vez por conjunto de treino.
+
+        DMatrix quando os folds serão fatiados por índice; QuantileDMatrix (já quantizada
+        para o hist, menos memória) quando há um único ajuste. None no engine sklearn.
+        """
+        if self.engine != "native":
+            return None
+        values = X.to_numpy(dtype=np.float32)
+        label = np.asarray(y, dtype=np.float32)
+        matrix_cls = xgb.DMatrix if sliceable else xgb.QuantileDMatrix
+        return matrix_cls(values, label=label, feature_names=list(X.columns))
+
+    def _fit(
+        self,
+        X: pd.DataFrame,
+        y: pd.Series,
+        matrix: Optional[xgb.DMatrix] = None,
+        rows: Optional[np.ndarray] = None,
+        rounds: Optional[int] = None,
+        eval_rows: Optional[np.ndarray] = None,
+    ) -> XGBModel:
+        """
+        Ajusta um modelo nas linhas `rows` (None = todas) com o engine configurado.
+
+        Com `eval_rows`, usa essas linhas como conjunto de early stopping e devolve o
+        modelo truncado na melhor iteração.
+        """
+        rounds = rounds or self.params["n_estimators"]
+        early_stopping = eval_rows is not None and self.early_stopping_rounds
+
+        if self.engine == "native":
+            dtrain = matrix if rows is None else matrix.slice(rows)
+            if not early_stopping:
+                return xgb.train(self.native_params, dtrain, num_boost_round=rounds)
+            booster = xgb.train(
+                self.native_params,
+                dtrain,
+                num_boost_round=rounds,
+                evals=[(matrix.slice(eval_rows), "val")],
+                early_stopping_rounds=self.early_stopping_rounds,
+                verbose_eval=False,
+            )
+            best_iteration = booster.best_iteration
+            booster = booster[: best_iteration + 1]
+            booster.set_attr(best_iteration=str(best_iteration))
+            return booster
+
+        X_fit, y_fit = (X, y) if rows is None else (X.iloc[rows], y.iloc[rows])
+        if not early_stopping:
+            model = xgb.XGBRegressor(**{**self.params, "n_estimators": rounds})
+            model.fit(X_fit, y_fit, verbose=False)
+            return model
+        model = xgb.XGBRegressor(**{**self.params, "n_estimators": rounds}, early_stopping_rounds=self.early_stopping_rounds)
+        model.fit(X_fit, y_fit, eval_set=[(X.iloc[eval_rows], y.iloc[eval_rows])], verbose=False)
+        return model
+
+    @staticmethod
+    def _best_iteration(model: XGBModel) -> int:
+        """Melhor iteração de um modelo treinado com early stopping."""
+        if isinstance(model, xgb.Booster):
+            return int(model.attr("best_iteration"))
+        return int(model.best_iteration)
+
+    @staticmethod
+    def _predict_array(model: XGBModel, values: np.ndarray) -> np.ndarray:
+        """Predição sobre matriz numpy (inplace_predict no Booster, sem montar DMatrix)."""
+        if isinstance(model, xgb.Booster):
+            return model.inplace_predict(values)
+        return model.predict(values)
+
+    @staticmethod
+    def _model_feature_names(model: XGBModel) -> Optional[List[str]]:
+        """Colunas de treino do modelo, nos dois engines."""
+        if isinstance(model, xgb.Booster):
+            return model.feature_names
+        names = getattr(model, "feature_names_in_", None)
+        return list(names) if names is not None else None
+
+    @staticmethod
+    def _feature_importance(model: XGBModel, feature_cols: List[str]) -> Dict[str, float]:
+        """Importância por ganho normalizada (mesma escala de XGBRegressor.feature_importances_)."""
+        if not isinstance(model, xgb.Booster):
+            return dict(zip(feature_cols, model.feature_importances_))
+
+        gain = model.get_score(importance_type="gain")
+        total = sum(gain.values())
+        return {col: float(gain.get(col, 0.0) / total) if total else 0.0 for col in feature_cols}
+
     def prepare_training_data(
         self,
         features_df: pd.DataFrame,
@@ -74,18 +244,69 @@ class XGBoostForecaster:
             "created_at",
             "updated_at",  # Timestamps do Supabase
         ]
-        feature_cols = [col for col in features_df.columns if col not in exclude_cols]
+        feature_cols = [
+            col for col in features_df.columns
+            if col not in exclude_cols and col in self.feature_columns
+        ]
 
         X = features_df[feature_cols].copy()
 
+        # Lags não suportados pelo tamanho da série chegam inteiramente nulos do feature_store
+        X = X.dropna(axis=1, how="all")
+        feature_cols = list(X.columns)
+
         # One-hot encoding para categorias (se quiser usar)
         # Por enquanto, excluímos categorias textuais
 
+        if self.strategy == "direct":
+            # Índice de X = posição do período-alvo (usado nos cortes temporais da validação)
+            stacked = self._stack_horizons(X.assign(y=y.to_numpy()).reset_index(drop=True))
+            X = stacked[feature_cols + [HORIZON_COLUMN]].set_axis(stacked["_target"].to_numpy())
+            y = stacked["y"].set_axis(stacked["_target"].to_numpy())
+            feature_cols = list(X.columns)
+
         logger.info(f"📊 Dados preparados: {len(X)} amostras, {len(feature_cols)} features")
         logger.info(f"   Features: {feature_cols}")
 
         return X, y
 
+    def _stack_horizons(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Empilha o frame (features + 'y', índice posicional) uma vez por horizonte h:
+        as features do período t passam a ter como alvo y[t+h].
+
+        Ordenado pelo período-alvo ('_target'), de modo que acrescentar períodos novos
+        só acrescenta linhas no fim (prefixo estável para o registro de modelos).
+        '_ds', se presente, passa a ser a data do alvo.
+        """
+        positions = np.arange(len(frame))
+        blocks = []
+        for h in range(1, self.DIRECT_HORIZONS + 1):
+            block = frame.copy()
+            block["y"] = frame["y"].shift(-h)
+            block[HORIZON_COLUMN] = h
+            block["_target"] = positions + h
+            if "_ds" in frame.columns:
+                block["_ds"] = frame["_ds"].shift(-h)
+            blocks.append(block)
+        stacked = pd.concat(blocks, ignore_index=True).dropna(subset=["y"])
+        return stacked.sort_values("_target", kind="stable").reset_index(drop=True)
+
+    def _time_splits(self, n_times: int, row_time: Optional[np.ndarray], n_rows: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Folds de TimeSeriesSplit. Com `row_time` (estratégia direta), corta sobre os
+        períodos-alvo: treino = alvos até o corte, validação = alvos do bloco seguinte.
+        """
+        tscv = TimeSeriesSplit(n_splits=min(self.cv_folds, n_times // 2))
+        if row_time is None:
+            return list(tscv.split(np.arange(n_rows)))
+
+        times = np.unique(row_time)
+        return [
+            (np.flatnonzero(row_time <= times[train[-1]]), np.flatnonzero(np.isin(row_time, times[val])))
+            for train, val in tscv.split(times)
+        ]
+
     def train_model(
         self,
         X: pd.DataFrame,
@@ -98,37 +319,56 @@ class XGBoostForecaster:
         Args:
             X: Features
             y: Target
-            validate: Se True, faz validação com TimeSeriesSplit
+            validate: Se True, faz validação com TimeSeriesSplit (com early stopping
+                no último fold, se configurado)
 
         Returns:
-            Dict com modelo e métricas
+            Dict com modelo, métricas, best_iteration, n_estimators do modelo final e
+            holdout (alvos e previsões dos folds, em ordem temporal)
         """
         logger.info("🤖 Treinando modelo XGBoost...")
 
-        if validate and len(X) >= 6:
+        best_iteration = None
+        rounds = self.params["n_estimators"]
+
+        # Estratégia direta: várias linhas por período-alvo; cortes pelo alvo (índice de X)
+        row_time = X.index.to_numpy() if HORIZON_COLUMN in X.columns else None
+        n_times = len(X) if row_time is None else len(np.unique(row_time))
+
+        if validate and n_times >= 6:
             # Validação com TimeSeriesSplit
             mape_scores = []
             mae_scores = []
+            holdout_y, holdout_yhat = [], []
 
-            tscv = TimeSeriesSplit(n_splits=min(3, len(X) // 2))
+            matrix = self._build_matrix(X, y)
+            values = X.to_numpy(dtype=np.float32)
+            splits = self._time_splits(n_times, row_time, len(X))
 
-            for train_idx, val_idx in tscv.split(X):
-                X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
-                y_train, y_val = y.iloc[train_idx], y.iloc[val_idx]
+            fold_models = {}
+            if self.early_stopping_rounds:
+                # Último fold primeiro, com early stopping no seu conjunto de validação:
+                # a melhor iteração define o número de árvores dos outros folds e do modelo final
+                train_idx, val_idx = splits[-1]
+                fold_models[len(splits) - 1] = self._fit(X, y, matrix, train_idx, eval_rows=val_idx)
+                best_iteration = self._best_iteration(fold_models[len(splits) - 1])
+                rounds = best_iteration + 1
+                logger.info(f"⏱️ Early stopping: melhor iteração {best_iteration} ({rounds}/{self.params['n_estimators']} árvores)")
 
-                model = xgb.XGBRegressor(**self.params)
-                model.fit(X_train, y_train, verbose=False)
+            for fold, (train_idx, val_idx) in enumerate(splits):
+                y_val = y.iloc[val_idx]
 
-                y_pred = model.predict(X_val)
+                # Previsões dos modelos de fold = métricas de backtest
+                model = fold_models.get(fold) or self._fit(X, y, matrix, train_idx, rounds=rounds)
 
-                # Remover zeros para MAPE
-                mask = y_val > 0
-                if mask.sum() > 0:
-                    mape = mean_absolute_percentage_error(y_val[mask], y_pred[mask]) * 100
-                    mape_scores.append(mape)
+                y_pred = self._predict_array(model, values[val_idx])
 
-                mae = mean_absolute_error(y_val, y_pred)
+                mape, mae = self._scores(y_val, y_pred)
+                if mape is not None:
+                    mape_scores.append(mape)
                 mae_scores.append(mae)
+                holdout_y.extend(y_val.tolist())
+                holdout_yhat.extend(y_pred.tolist())
 
             avg_mape = np.mean(mape_scores) if mape_scores else None
             avg_mae = np.mean(mae_scores)
@@ -137,14 +377,15 @@ class XGBoostForecaster:
         else:
             avg_mape = None
             avg_mae = None
+            holdout_y, holdout_yhat = [], []
+            matrix = self._build_matrix(X, y, sliceable=False)
             logger.info("⏭️ Validação pulada (poucos dados)")
 
-        # Treinar modelo final com todos os dados
-        model = xgb.XGBRegressor(**self.params)
-        model.fit(X, y, verbose=False)
+        # Treinar modelo final com todos os dados (mesma matriz dos folds)
+        model = self._fit(X, y, matrix, rounds=rounds)
 
         # Feature importance
-        feature_importance = dict(zip(X.columns, model.feature_importances_))
+        feature_importance = self._feature_importance(model, list(X.columns))
         top_features = sorted(feature_importance.items(), key=lambda x: x[1], reverse=True)[:5]
 
         logger.info(f"🎯 Top 5 features: {[f[0] for f in top_features]}")
@@ -155,11 +396,130 @@ class XGBoostForecaster:
             "mae": avg_mae,
             "feature_importance": feature_importance,
             "feature_cols": list(X.columns),
+            "best_iteration": best_iteration,
+            "n_estimators": rounds,
+            "holdout": (holdout_y, holdout_yhat),
+        }
+
+    @staticmethod
+    def _scores(y_true: pd.Series, y_pred: np.ndarray) -> Tuple[Optional[float], float]:
+        """MAPE (%) só nos alvos > 0 (None sem nenhum) e MAE de um bloco de validação."""
+        mask = y_true > 0
+        mape = mean_absolute_percentage_error(y_true[mask], y_pred[mask]) * 100 if mask.sum() > 0 else None
+        return mape, mean_absolute_error(y_true, y_pred)
+
+    @property
+    def registry_key(self) -> str:
+        """Chave do registro: hiperparâmetros + features + engine + early stopping + estratégia + folds."""
+        return params_hash({
+            **self.params,
+            "feature_set": self.feature_set,
+            "engine": self.engine,
+            "early_stopping_rounds": self.early_stopping_rounds,
+            "strategy": self.strategy,
+            "cv_folds": self.cv_folds,
+        })
+
+    def train_model_cached(
+        self,
+        X: pd.DataFrame,
+        y: pd.Series,
+        product_id: str,
+        registry: XGBoostModelRegistry,
+    ) -> Dict:
+        """
+        train_model com reaproveitamento do registro de modelos.
+
+        - mesmos dados: usa o modelo salvo sem treinar ('hit')
+        - dados salvos são prefixo dos atuais: o modelo salvo prevê os períodos novos
+          (que ele não viu) e continua o boosting com EXTEND_ROUNDS árvores sobre todos os
+          dados ('extend'); MAPE/MAE são os das EXTEND_SCORE_WINDOW linhas fora da amostra
+          mais recentes (folds da validação + períodos novos de cada extensão)
+        - caso contrário, ou sem erros fora da amostra no registro: treino completo ('miss')
+
+        Returns:
+            Dict de train_model + "registry" com o status acima
+        """
+        key = self.registry_key
+        current_hash = data_hash(X, y)
+        entry = registry.load(product_id, key, self.engine)
+        same_columns = entry is not None and entry.feature_cols == list(X.columns)
+
+        if same_columns and entry.data_hash == current_hash:
+            logger.info(f"♻️ Modelo XGBoost reaproveitado do registro ({product_id})")
+            return self._registry_result(entry, X, "hit")
+
+        if (
+            same_columns
+            and len(X) > entry.n_rows
+            and data_hash(X.iloc[: entry.n_rows], y.iloc[: entry.n_rows]) == entry.data_hash
+        ):
+            if entry.holdout_y:
+                new_X, new_y = X.iloc[entry.n_rows:], y.iloc[entry.n_rows:]
+                new_pred = self._predict_array(entry.model, new_X.to_numpy(dtype=np.float32))
+                holdout_y = (entry.holdout_y + new_y.tolist())[-self.EXTEND_SCORE_WINDOW:]
+                holdout_yhat = (entry.holdout_yhat + new_pred.tolist())[-self.EXTEND_SCORE_WINDOW:]
+                mape, mae = self._scores(pd.Series(holdout_y), np.asarray(holdout_yhat))
+                logger.info(
+                    f"➕ Continuando boosting do registro ({product_id}): {len(new_X)} linhas novas, "
+                    f"+{self.EXTEND_ROUNDS} árvores (MAE {mae:.1f} fora da amostra)"
+                )
+                entry = RegistryEntry(
+                    model=self._continue_boosting(entry.model, X, y),
+                    data_hash=current_hash,
+                    n_rows=len(X),
+                    feature_cols=list(X.columns),
+                    mape=mape,
+                    mae=mae,
+                    n_estimators=entry.n_estimators + self.EXTEND_ROUNDS,
+                    holdout_y=holdout_y,
+                    holdout_yhat=holdout_yhat,
+                )
+                registry.save(product_id, key, entry)
+                return self._registry_result(entry, X, "extend")
+            logger.info(f"🔁 Registro sem erros fora da amostra ({product_id}): treino completo")
+
+        result = self.train_model(X, y, validate=True)
+        holdout_y, holdout_yhat = result["holdout"]
+        registry.save(product_id, key, RegistryEntry(
+            model=result["model"],
+            data_hash=current_hash,
+            n_rows=len(X),
+            feature_cols=list(X.columns),
+            mape=result["mape"],
+            mae=result["mae"],
+            n_estimators=result["n_estimators"],
+            holdout_y=holdout_y[-self.EXTEND_SCORE_WINDOW:],
+            holdout_yhat=holdout_yhat[-self.EXTEND_SCORE_WINDOW:],
+        ))
+        return {**result, "registry": "miss"}
+
+    def _continue_boosting(self, model: XGBModel, X: pd.DataFrame, y: pd.Series) -> XGBModel:
+        """Acrescenta EXTEND_ROUNDS árvores ao modelo salvo, treinadas com todos os dados."""
+        if self.engine == "native":
+            matrix = self._build_matrix(X, y, sliceable=False)
+            return xgb.train(self.native_params, matrix, num_boost_round=self.EXTEND_ROUNDS, xgb_model=model)
+
+        extended = xgb.XGBRegressor(**{**self.params, "n_estimators": self.EXTEND_ROUNDS})
+        extended.fit(X, y, xgb_model=model.get_booster(), verbose=False)
+        return extended
+
+    def _registry_result(self, entry: RegistryEntry, X: pd.DataFrame, status: str) -> Dict:
+        """Resultado no formato de train_model para um modelo vindo do registro."""
+        return {
+            "model": entry.model,
+            "mape": entry.mape,
+            "mae": entry.mae,
+            "feature_importance": self._feature_importance(entry.model, list(X.columns)),
+            "feature_cols": list(X.columns),
+            "best_iteration": None,
+            "n_estimators": entry.n_estimators,
+            "registry": status,
         }
 
     def predict(
         self,
-        model: xgb.XGBRegressor,
+        model: XGBModel,
         last_features: pd.DataFrame,
         n_periods: int = 30,
     ) -> pd.DataFrame:
@@ -177,67 +537,519 @@ class XGBoostForecaster:
         logger.info(f"🔮 Gerando previsões para {n_periods} períodos...")
 
         # Usar apenas colunas numéricas (XGBoost não aceita datetime)
+        model_cols = self._model_feature_names(model)
         feature_cols = (
-            model.feature_names_in_
-            if hasattr(model, "feature_names_in_")
+            [c for c in model_cols if c != HORIZON_COLUMN] if model_cols
             else [c for c in last_features.columns if c not in ("ds", "y") and pd.api.types.is_numeric_dtype(last_features[c]) or (last_features[c].dtype == bool)]
         )
         last_date = pd.to_datetime(last_features["ds"].iloc[-1])
-        predictions = []
-        current_features = last_features[feature_cols].iloc[-1:].copy()
-
-        for i in range(n_periods):
-            # Prever próximo valor
-            pred = model.predict(current_features)[0]
-            predictions.append(pred)
-
-            # Atualizar features para próxima previsão (apenas colunas que existem)
-            if "lag_12" in current_features.columns and "lag_6" in current_features.columns:
-                current_features["lag_12"] = current_features["lag_6"].values[0]
-            if "lag_6" in current_features.columns and "lag_3" in current_features.columns:
-                current_features["lag_6"] = current_features["lag_3"].values[0]
-            if "lag_3" in current_features.columns and "lag_1" in current_features.columns:
-                current_features["lag_3"] = current_features["lag_1"].values[0]
-            if "lag_1" in current_features.columns:
-                current_features["lag_1"] = pred
-
-            # Atualizar rolling means (simplificado), se existirem
-            if "rolling_mean_3m" in current_features.columns:
-                l1 = current_features["lag_1"].values[0] if "lag_1" in current_features.columns else 0.0
-                l3 = current_features["lag_3"].values[0] if "lag_3" in current_features.columns else 0.0
-                l6 = current_features["lag_6"].values[0] if "lag_6" in current_features.columns else 0.0
-                n = sum(1 for v in [l1, l3, l6] if v != 0) or 1
-                current_features["rolling_mean_3m"] = (float(l1) + float(l3) + float(l6)) / max(n, 1)
-            if "rolling_mean_6m" in current_features.columns:
-                current_features["rolling_mean_6m"] = current_features["rolling_mean_3m"].values[0]
-
-        # Criar DataFrame de previsões
-        forecast_dates = [last_date + timedelta(days=30 * (i + 1)) for i in range(n_periods)]
-
-        forecast_df = pd.DataFrame(
+        predictions = self.predict_batch(model, last_features[feature_cols].iloc[-1:], n_periods)[0]
+
+        forecast_df = self._forecast_frame(last_date, predictions)
+
+        logger.info(f"✅ Previsões geradas: média={np.mean(predictions):.1f}")
+
+        return forecast_df
+
+    def predict_batch(
+        self,
+        model: XGBModel,
+        last_rows: pd.DataFrame,
+        n_periods: int,
+    ) -> np.ndarray:
+        """
+        Previsão vetorizada para várias séries de uma vez.
+
+        Recursiva: o estado (lags e médias móveis) de todas as séries é uma matriz 2-D
+        (séries × features) avançada com numpy; o modelo é chamado uma vez por passo
+        do horizonte, não uma vez por série por passo.
+        Direta: todas as séries × horizontes em uma única chamada ao modelo.
+
+        Args:
+            model: Modelo treinado (um modelo compartilhado pelas séries)
+            last_rows: Uma linha de features por série, nas colunas do modelo
+            n_periods: Número de períodos para prever
+
+        Returns:
+            Matriz (séries × n_periods) com as previsões
+        """
+        if self.strategy == "direct":
+            return self._predict_direct(model, last_rows, n_periods)
+
+        col_index = {col: i for i, col in enumerate(last_rows.columns)}
+        state = last_rows.to_numpy(dtype=np.float32, copy=True)
+        predictions = np.empty((state.shape[0], n_periods))
+
+        for step in range(n_periods):
+            preds = self._predict_array(model, state)
+            predictions[:, step] = preds
+            self._advance_recursive_state(state, preds, col_index)
+
+        return predictions
+
+    def _predict_direct(self, model: XGBModel, last_rows: pd.DataFrame, n_periods: int) -> np.ndarray:
+        """Estratégia direta: linha de origem repetida por horizonte (1..n_periods), um predict."""
+        origin = last_rows.drop(columns=[HORIZON_COLUMN], errors="ignore").to_numpy(dtype=np.float32)
+        n_series = len(origin)
+        horizons = np.tile(np.arange(1, n_periods + 1, dtype=np.float32), n_series)
+        # Horizonte é a última coluna, como no treino
+        stacked = np.column_stack([np.repeat(origin, n_periods, axis=0), horizons])
+        return self._predict_array(model, stacked).reshape(n_series, n_periods)
+
+    @staticmethod
+    def _advance_recursive_state(state: np.ndarray, preds: np.ndarray, col_index: Dict[str, int]) -> None:
+        """Desloca os lags e atualiza as médias móveis (simplificado) com a previsão do passo."""
+        # Atualizar lags (apenas colunas que existem)
+        for newer, older in (("lag_6", "lag_12"), ("lag_3", "lag_6"), ("lag_1", "lag_3")):
+            if newer in col_index and older in col_index:
+                state[:, col_index[older]] = state[:, col_index[newer]]
+        if "lag_1" in col_index:
+            state[:, col_index["lag_1"]] = preds
+
+        # Atualizar rolling means (média dos lags recentes não nulos), se existirem
+        if "rolling_mean_3m" in col_index:
+            recent = np.column_stack([
+                state[:, col_index[lag]] if lag in col_index else np.zeros(len(state))
+                for lag in ("lag_1", "lag_3", "lag_6")
+            ])
+            recent = np.nan_to_num(recent, nan=0.0)
+            n = np.maximum((recent != 0).sum(axis=1), 1)
+            state[:, col_index["rolling_mean_3m"]] = recent.sum(axis=1) / n
+        if "rolling_mean_6m" in col_index and "rolling_mean_3m" in col_index:
+            state[:, col_index["rolling_mean_6m"]] = state[:, col_index["rolling_mean_3m"]]
+
+    @staticmethod
+    def _forecast_frame(last_date: pd.Timestamp, predictions: np.ndarray) -> pd.DataFrame:
+        """DataFrame de previsões mensais (passos de 30 dias) com intervalo simplificado."""
+        forecast_dates = [last_date + timedelta(days=30 * (i + 1)) for i in range(len(predictions))]
+        return pd.DataFrame(
             {
                 "ds": forecast_dates,
                 "yhat": predictions,
-                "yhat_lower": [p * 0.8 for p in predictions],  # Intervalo simplificado
-                "yhat_upper": [p * 1.2 for p in predictions],
+                "yhat_lower": predictions * 0.8,  # Intervalo simplificado
+                "yhat_upper": predictions * 1.2,
             }
         )
 
-        logger.info(f"✅ Previsões geradas: média={np.mean(predictions):.1f}")
+    # Colunas de identificação do modelo global (códigos inteiros)
+    GLOBAL_ID_COLUMNS = ["product_code", "category_code"]
 
-        return forecast_df
+    def prepare_global_training_data(
+        self,
+        features_by_product: Dict[str, pd.DataFrame],
+        categories: Dict[str, str],
+        scales: Optional[Dict[str, float]] = None,
+    ) -> Tuple[pd.DataFrame, pd.Series, Dict]:
+        """
+        Monta a tabela longa (todos os produtos) para o modelo global.
+
+        Target e features na escala do target são divididos pela média histórica do
+        produto, para que produtos de volumes diferentes compartilhem o mesmo modelo.
+
+        Args:
+            features_by_product: {product_id: DataFrame com features + 'y'}
+            categories: {product_id: categoria}
+            scales: Escala por produto (None = média de todo o histórico, ver _product_scales)
+
+        Returns:
+            X (features escaladas + códigos), y (escalado), meta (escalas, códigos, ids/datas por linha)
+        """
+        product_ids = sorted(features_by_product)
+        product_codes = {pid: code for code, pid in enumerate(product_ids)}
+        category_names = sorted({categories.get(pid, "Sem Categoria") for pid in product_ids})
+        category_codes = {cat: code for code, cat in enumerate(category_names)}
+
+        if scales is None:
+            scales = self._product_scales(features_by_product)
+
+        frames = []
+        for pid in product_ids:
+            features_df = features_by_product[pid]
+            frame = self._scaled_feature_frame(features_df, scales[pid])
+            frame["y"] = features_df["y"].to_numpy(dtype=float) / scales[pid]
+            frame["product_code"] = product_codes[pid]
+            frame["category_code"] = category_codes[categories.get(pid, "Sem Categoria")]
+            frame["_product_id"] = pid
+            frame["_ds"] = features_df["ds"].to_numpy()
+            if self.strategy == "direct":
+                # '_ds' passa a ser a data do alvo: cortes temporais da validação sem vazamento
+                frame = self._stack_horizons(frame)
+            frames.append(frame)
+
+        long_df = pd.concat(frames, ignore_index=True).sort_values("_ds", kind="stable").reset_index(drop=True)
+
+        feature_cols = [
+            col for col in self.feature_columns if col in long_df.columns and long_df[col].notna().any()
+        ] + self.GLOBAL_ID_COLUMNS
+        if self.strategy == "direct":
+            feature_cols.append(HORIZON_COLUMN)
+        X = long_df[feature_cols]
+        y = long_df["y"]
+
+        meta = {
+            "scales": scales,
+            "product_codes": product_codes,
+            "category_codes": category_codes,
+            "row_product": long_df["_product_id"],
+            "row_ds": long_df["_ds"],
+        }
+
+        logger.info(
+            f"📊 Dados globais: {len(X)} amostras de {len(product_ids)} produtos, {len(feature_cols)} features"
+        )
+        return X, y, meta
+
+    @staticmethod
+    def _product_scales(
+        features_by_product: Dict[str, pd.DataFrame],
+        cutoff: Optional[np.datetime64] = None,
+    ) -> Dict[str, float]:
+        """
+        Escala de cada produto: média do target até `cutoff` (None = todo o histórico),
+        1.0 quando não positiva. Produtos sem períodos até o corte ficam de fora.
+        """
+        scales = {}
+        for pid, features_df in features_by_product.items():
+            y = features_df["y"]
+            if cutoff is not None:
+                y = y[pd.to_datetime(features_df["ds"]).to_numpy() <= cutoff]
+                if y.empty:
+                    continue
+            y_mean = float(y.mean())
+            scales[pid] = y_mean if y_mean > 0 else 1.0
+        return scales
+
+    @staticmethod
+    def _rescaled_rows(X: pd.DataFrame, y: pd.Series, ratio: np.ndarray) -> Tuple[pd.DataFrame, pd.Series]:
+        """X e y com target e features na escala do target multiplicados por `ratio` (por linha)."""
+        X = X.copy()
+        scaled = [col for col in X.columns if col in TARGET_SCALED_COLUMNS]
+        X[scaled] = X[scaled].to_numpy(dtype=float) * ratio[:, None]
+        return X, y * ratio
+
+    def _scaled_feature_frame(self, features_df: pd.DataFrame, scale: float) -> pd.DataFrame:
+        """Features numéricas do conjunto do modelo, com as de escala do target divididas por `scale`."""
+        cols = [col for col in self.feature_columns if col in features_df.columns]
+        frame = features_df[cols].apply(pd.to_numeric, errors="coerce").astype(float)
+        scaled = [col for col in cols if col in TARGET_SCALED_COLUMNS]
+        frame[scaled] = frame[scaled] / scale
+        return frame.reset_index(drop=True)
+
+    def train_global_model(
+        self,
+        features_by_product: Dict[str, pd.DataFrame],
+        categories: Dict[str, str],
+        validate: bool = True,
+    ) -> Dict:
+        """
+        Treina UM modelo XGBoost para todos os produtos da análise (modo global).
+
+        Substitui 4×N ajustes pequenos (3 folds + final por produto) por 4 ajustes grandes.
+        A validação usa cortes temporais por data (TimeSeriesSplit sobre datas únicas) e
+        as métricas são reportadas por produto, na escala original. Em cada fold a escala
+        dos produtos vem só dos períodos de treino (sem os alvos da validação); produtos
+        sem histórico antes do corte não são avaliados nesse fold.
+
+        Args:
+            features_by_product: {product_id: DataFrame com features + 'y'}
+            categories: {product_id: categoria}
+            validate: Se True, faz validação temporal
+
+        Returns:
+            Dict com modelo, métricas por produto, importância e metadados de escala
+        """
+        logger.info(f"🤖 Treinando modelo XGBoost GLOBAL ({len(features_by_product)} produtos)...")
+
+        X, y, meta = self.prepare_global_training_data(features_by_product, categories)
+        row_product = meta["row_product"].to_numpy()
+        row_scale = meta["row_product"].map(meta["scales"]).to_numpy(dtype=float)
+
+        errors: Dict[str, Dict[str, List[float]]] = {pid: {"mape": [], "mae": []} for pid in features_by_product}
+        unique_dates = np.sort(meta["row_ds"].unique())
+
+        if validate and len(unique_dates) >= 6:
+            row_ds = meta["row_ds"].to_numpy()
+            tscv = TimeSeriesSplit(n_splits=min(self.cv_folds, len(unique_dates) // 2))
+
+            for train_date_idx, val_date_idx in tscv.split(unique_dates):
+                cutoff = unique_dates[train_date_idx[-1]]
+                fold_scale = meta["row_product"].map(
+                    self._product_scales(features_by_product, cutoff)
+                ).to_numpy(dtype=float)
+                X_fold, y_fold = self._rescaled_rows(X, y, row_scale / fold_scale)
+                train_rows = np.flatnonzero(row_ds <= cutoff)
+                val_mask = np.isin(row_ds, unique_dates[val_date_idx]) & np.isfinite(fold_scale)
+
+                X_train, y_train = X_fold.iloc[train_rows], y_fold.iloc[train_rows]
+                model = self._fit(X_train, y_train, self._build_matrix(X_train, y_train, sliceable=False))
+
+                values = X_fold[val_mask].to_numpy(dtype=np.float32)
+                y_pred = self._predict_array(model, values) * fold_scale[val_mask]
+                y_val = y[val_mask].to_numpy() * row_scale[val_mask]
+                val_products = row_product[val_mask]
+
+                for pid in np.unique(val_products):
+                    sel = val_products == pid
+                    actual, pred = y_val[sel], y_pred[sel]
+                    # Remover zeros para MAPE
+                    mask = actual > 0
+                    if mask.sum() > 0:
+                        errors[pid]["mape"].append(mean_absolute_percentage_error(actual[mask], pred[mask]) * 100)
+                    errors[pid]["mae"].append(mean_absolute_error(actual, pred))
+        else:
+            logger.info("⏭️ Validação global pulada (poucas datas)")
+
+        product_metrics = {
+            pid: {
+                "mape": float(np.mean(e["mape"])) if e["mape"] else None,
+                "mae": float(np.mean(e["mae"])) if e["mae"] else None,
+                "training_samples": int((row_product == pid).sum()),
+            }
+            for pid, e in errors.items()
+        }
+
+        # Treinar modelo final com todos os dados (escala de todo o histórico)
+        model = self._fit(X, y, self._build_matrix(X, y, sliceable=False))
+
+        feature_importance = self._feature_importance(model, list(X.columns))
+        top_features = sorted(feature_importance.items(), key=lambda x: x[1], reverse=True)[:5]
+        logger.info(f"🎯 Top 5 features (global): {[f[0] for f in top_features]}")
+
+        return {
+            "model": model,
+            "product_metrics": product_metrics,
+            "feature_importance": feature_importance,
+            "feature_cols": list(X.columns),
+            "scales": meta["scales"],
+            "product_codes": meta["product_codes"],
+            "category_codes": meta["category_codes"],
+        }
+
+    def predict_global(
+        self,
+        global_result: Dict,
+        features_by_product: Dict[str, pd.DataFrame],
+        categories: Dict[str, str],
+        n_periods: int = 3,
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Gera previsões de todos os produtos com o modelo global.
+
+        Args:
+            global_result: Retorno de train_global_model
+            features_by_product: {product_id: DataFrame com features + 'y'}
+            categories: {product_id: categoria}
+            n_periods: Número de períodos para prever
 
-    def serialize_model(self, model: xgb.XGBRegressor) -> str:
+        Returns:
+            {product_id: DataFrame com previsões na escala original}
+        """
+        product_ids = list(features_by_product)
+        feature_cols = global_result["feature_cols"]
+
+        # Estado inicial: última linha de cada produto (escalada) empilhada em uma matriz
+        last_rows = []
+        for pid in product_ids:
+            row = self._scaled_feature_frame(features_by_product[pid].tail(1), global_result["scales"][pid])
+            row["product_code"] = global_result["product_codes"][pid]
+            row["category_code"] = global_result["category_codes"][categories.get(pid, "Sem Categoria")]
+            last_rows.append(row.reindex(columns=feature_cols))
+        last_rows_df = pd.concat(last_rows, ignore_index=True)
+
+        # Um predict por passo do horizonte para todos os produtos
+        scales = np.array([global_result["scales"][pid] for pid in product_ids])
+        predictions = self.predict_batch(global_result["model"], last_rows_df, n_periods) * scales[:, None]
+
+        forecasts = {
+            pid: self._forecast_frame(pd.to_datetime(features_by_product[pid]["ds"].iloc[-1]), predictions[i])
+            for i, pid in enumerate(product_ids)
+        }
+        logger.info(f"✅ Previsões globais geradas: {len(forecasts)} produtos × {n_periods} períodos")
+
+        return forecasts
+
+    def serialize_model(self, model: XGBModel) -> str:
         """Serializa modelo para salvar no banco."""
         model_bytes = pickle.dumps(model)
         return base64.b64encode(model_bytes).decode("utf-8")
 
-    def deserialize_model(self, model_str: str) -> xgb.XGBRegressor:
+    def deserialize_model(self, model_str: str) -> XGBModel:
         """Deserializa modelo do banco."""
         model_bytes = base64.b64decode(model_str.encode("utf-8"))
         return pickle.loads(model_bytes)
 
 
+def synthetic_catalog(
+    n_products: int = 50,
+    n_months: int = 36,
+    seed: int = 42,
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+    """
+    Catálogo sintético com features calculadas (para benchmarks manuais).
+
+    Returns:
+        ({product_id: DataFrame com features + 'y'}, {product_id: categoria})
+    """
+    rng = np.random.default_rng(seed)
+    feature_engineer = FeatureEngineer()
+    dates = pd.date_range("2022-01-01", periods=n_months, freq="MS")
+    features_by_product, categories = {}, {}
+
+    for i in range(n_products):
+        pid = f"bench-{i}"
+        base = rng.uniform(20, 2000)
+        seasonal = 1 + 0.3 * np.sin(2 * np.pi * np.arange(n_months) / 12 + rng.uniform(0, 2 * np.pi))
+        trend = 1 + rng.uniform(-0.01, 0.02) * np.arange(n_months)
+        y = np.maximum(0, base * seasonal * trend * rng.normal(1, 0.1, n_months))
+        product = {"id": pid, "refined_category": f"cat-{i % 5}"}
+
+        features = feature_engineer.calculate_features(pd.DataFrame({"ds": dates, "y": y}), product)
+        features_by_product[pid] = features
+        categories[pid] = product["refined_category"]
+
+    return features_by_product, categories
+
+
+def benchmark_modes(n_products: int = 50, n_months: int = 36) -> Dict[str, Dict]:
+    """
+    Compara modo por produto (4 ajustes por produto) com modo global (4 ajustes no total).
+
+    Returns:
+        {modo: {"seconds": float, "mean_mape": float}}
+    """
+    import time
+
+    features_by_product, categories = synthetic_catalog(n_products, n_months)
+    forecaster = XGBoostForecaster()
+    results = {}
+
+    start = time.time()
+    mapes = []
+    for features_df in features_by_product.values():
+        X, y = forecaster.prepare_training_data(features_df)
+        result = forecaster.train_model(X, y, validate=True)
+        forecaster.predict(result["model"], features_df, n_periods=3)
+        if result["mape"] is not None:
+            mapes.append(result["mape"])
+    results["per_product"] = {"seconds": time.time() - start, "mean_mape": float(np.mean(mapes))}
+
+    start = time.time()
+    global_result = forecaster.train_global_model(features_by_product, categories)
+    forecaster.predict_global(global_result, features_by_product, categories, n_periods=3)
+    mapes = [m["mape"] for m in global_result["product_metrics"].values() if m["mape"] is not None]
+    results["global"] = {"seconds": time.time() - start, "mean_mape": float(np.mean(mapes))}
+
+    return results
+
+
+def benchmark_engines(n_products: int = 50, n_months: int = 36) -> Dict[str, Dict]:
+    """
+    Compara engine nativo (xgboost.train/DMatrix) com o wrapper sklearn no modo por produto.
+
+    Returns:
+        {engine: {"seconds": float, "mean_mape": float}}
+    """
+    import time
+
+    features_by_product, _ = synthetic_catalog(n_products, n_months)
+    results = {}
+
+    for engine in XGBoostForecaster.ENGINES:
+        forecaster = XGBoostForecaster(engine=engine)
+        start = time.time()
+        mapes = []
+        for features_df in features_by_product.values():
+            X, y = forecaster.prepare_training_data(features_df)
+            result = forecaster.train_model(X, y, validate=True)
+            forecaster.predict(result["model"], features_df, n_periods=3)
+            if result["mape"] is not None:
+                mapes.append(result["mape"])
+        results[engine] = {"seconds": time.time() - start, "mean_mape": float(np.mean(mapes))}
+
+    return results
+
+
+def benchmark_early_stopping(n_products: int = 50, n_months: int = 36) -> Dict[str, Dict]:
+    """
+    Compara treino com 100 árvores fixas (CV clássica) e com early stopping no último fold.
+
+    Returns:
+        {modo: {"seconds": float, "mean_mape": float, "mean_trees": float}}
+    """
+    import time
+
+    features_by_product, _ = synthetic_catalog(n_products, n_months)
+    results = {}
+
+    for label, rounds in (("fixed_100", None), ("early_stop", 10)):
+        forecaster = XGBoostForecaster(early_stopping_rounds=rounds)
+        start = time.time()
+        mapes, trees = [], []
+        for features_df in features_by_product.values():
+            X, y = forecaster.prepare_training_data(features_df)
+            result = forecaster.train_model(X, y, validate=True)
+            trees.append(result["n_estimators"])
+            if result["mape"] is not None:
+                mapes.append(result["mape"])
+        results[label] = {
+            "seconds": time.time() - start,
+            "mean_mape": float(np.mean(mapes)),
+            "mean_trees": float(np.mean(trees)),
+        }
+
+    return results
+
+
+def benchmark_strategies(n_products: int = 50, n_months: int = 36) -> Dict[str, Dict]:
+    """
+    Compara estratégia recursiva e direta (multi-horizonte), por produto e global.
+
+    Returns:
+        {"<modo>/<estratégia>": {"train_seconds", "predict_seconds", "mean_mape"}}
+    """
+    import time
+
+    features_by_product, categories = synthetic_catalog(n_products, n_months)
+    results = {}
+
+    for strategy in XGBoostForecaster.STRATEGIES:
+        forecaster = XGBoostForecaster(strategy=strategy)
+
+        train_seconds = predict_seconds = 0.0
+        mapes = []
+        for features_df in features_by_product.values():
+            start = time.time()
+            X, y = forecaster.prepare_training_data(features_df)
+            result = forecaster.train_model(X, y, validate=True)
+            train_seconds += time.time() - start
+
+            start = time.time()
+            forecaster.predict(result["model"], features_df, n_periods=3)
+            predict_seconds += time.time() - start
+            if result["mape"] is not None:
+                mapes.append(result["mape"])
+        results[f"per_product/{strategy}"] = {
+            "train_seconds": train_seconds,
+            "predict_seconds": predict_seconds,
+            "mean_mape": float(np.mean(mapes)),
+        }
+
+        start = time.time()
+        global_result = forecaster.train_global_model(features_by_product, categories)
+        train_seconds = time.time() - start
+        start = time.time()
+        forecaster.predict_global(global_result, features_by_product, categories, n_periods=3)
+        predict_seconds = time.time() - start
+        mapes = [m["mape"] for m in global_result["product_metrics"].values() if m["mape"] is not None]
+        results[f"global/{strategy}"] = {
+            "train_seconds": train_seconds,
+            "predict_seconds": predict_seconds,
+            "mean_mape": float(np.mean(mapes)),
+        }
+
+    return results
+
+
 # Teste manual (opcional)
 if __name__ == "__main__":
     # Dados de teste
@@ -380,3 +1192,29 @@ if __name__ == "__main__":
     forecast = forecaster.predict(result["model"], features_df, n_periods=3)
     print("\n🔮 Previsões:")
     print(forecast)
+
+    # Benchmark: por produto vs global
+    import sys
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    print("\n⏱️ Benchmark XGBoost (50 produtos × 36 meses):")
+    for mode, stats in benchmark_modes().items():
+        print(f"  {mode:12s} {stats['seconds']:6.2f}s  MAPE médio={stats['mean_mape']:.1f}%")
+
+    print("\n⏱️ Benchmark engines XGBoost (50 produtos × 36 meses, por produto):")
+    for engine, stats in benchmark_engines().items():
+        print(f"  {engine:12s} {stats['seconds']:6.2f}s  MAPE médio={stats['mean_mape']:.1f}%")
+
+    print("\n⏱️ Benchmark early stopping (50 produtos × 36 meses, por produto):")
+    for label, stats in benchmark_early_stopping().items():
+        print(
+            f"  {label:12s} {stats['seconds']:6.2f}s  MAPE médio={stats['mean_mape']:.1f}%  "
+            f"árvores médias={stats['mean_trees']:.0f}"
+        )
+
+    print("\n⏱️ Benchmark estratégias (50 produtos × 36 meses):")
+    for label, stats in benchmark_strategies().items():
+        print(
+            f"  {label:22s} treino={stats['train_seconds']:6.2f}s  predict={stats['predict_seconds'] * 1000:7.1f}ms  "
+            f"MAPE médio={stats['mean_mape']:.1f}%"
+        )